@@ -0,0 +1,3 @@
+"""
+Outils en ligne de commande (à lancer depuis backend/ avec python -m app.cli.<outil>)
+"""
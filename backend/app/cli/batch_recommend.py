@@ -0,0 +1,92 @@
+"""
+Génère des recommandations pour un fichier de profils (NDJSON), avec reprise
+
+Chaque ligne d'entrée est un objet {"id", "profile", "custom_query"?}. Les
+résultats sont ajoutés au fichier de sortie (une ligne par profil) au fur et à
+mesure ; relancer la même commande reprend là où elle s'était arrêtée en
+ignorant les identifiants déjà présents (sauf les erreurs avec --retry-errors).
+
+Depuis backend/ :
+    python -m app.cli.batch_recommend --input profiles.ndjson --output results.ndjson
+    python -m app.cli.batch_recommend --input profiles.ndjson --output results.ndjson --concurrency 8 --retry-errors
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Iterator
+
+from app.config.settings import settings
+from app.core.batch_recommender import BatchRecommender
+from app.models.batch import BatchItem
+
+
+def read_items(path: Path) -> Iterator[BatchItem]:
+    """Lit les profils ligne par ligne (les lignes invalides sont signalées et ignorées)"""
+    with path.open(encoding="utf-8") as input_file:
+        for line_number, line in enumerate(input_file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield BatchItem.model_validate_json(line)
+            except ValueError as e:
+                print(f"⚠️ Line {line_number} ignored: {e}")
+
+
+def read_done_ids(path: Path, retry_errors: bool) -> set[str]:
+    """Identifiants déjà traités d'après le fichier de sortie (lignes tronquées ignorées)"""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get("status") == "ok" or not retry_errors:
+                done.add(result["id"])
+    return done
+
+
+def ends_with_newline(path: Path) -> bool:
+    """Indique si le fichier se termine par un saut de ligne (lecture du dernier octet seulement)"""
+    with path.open("rb") as output_file:
+        output_file.seek(-1, 2)
+        return output_file.read(1) == b"\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, type=Path, help="Profils NDJSON ({id, profile, custom_query})")
+    parser.add_argument("--output", required=True, type=Path, help="Résultats NDJSON (complété en cas de reprise)")
+    parser.add_argument("--concurrency", type=int, default=settings.BATCH_MAX_CONCURRENCY,
+                        help="Nombre de runs d'agent simultanés")
+    parser.add_argument("--retry-errors", action="store_true", help="Retraiter les profils en erreur")
+    args = parser.parse_args()
+
+    done_ids = read_done_ids(args.output, args.retry_errors)
+    if done_ids:
+        print(f"↩️ Resuming: {len(done_ids)} profiles already processed")
+
+    start = time.perf_counter()
+    counts = {"ok": 0, "error": 0}
+    recommender = BatchRecommender(max_concurrency=args.concurrency)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with args.output.open("a", encoding="utf-8") as output_file:
+        # Une interruption peut laisser une ligne tronquée : repartir sur une nouvelle ligne
+        if output_file.tell() and not ends_with_newline(args.output):
+            output_file.write("\n")
+        for result in recommender.run(read_items(args.input), done_ids):
+            output_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output_file.flush()
+            counts[result["status"]] += 1
+            if sum(counts.values()) % 50 == 0:
+                print(f"⏳ {sum(counts.values())} profiles processed...")
+
+    print(f"✅ {counts['ok']} ok, {counts['error']} errors in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Précalcule les recommandations des listes de favoris les plus fréquentes
+
+Les listes de favoris (journal des favoris) et les profils (fichier de
+/profile/export, optionnel) sont regroupés par ensemble de titres canoniques ;
+les plus fréquents passent par MovieRecommender hors ligne, avec une
+concurrence bornée, et les films obtenus (affiches comprises) sont écrits dans
+le fichier lu par le serveur (rechargé automatiquement). Les entrées récentes
+de la même version sont réutilisées, sauf avec --force.
+
+Depuis backend/ :
+    python -m app.cli.precompute_recommendations
+    python -m app.cli.precompute_recommendations --profiles profiles.ndjson --top 1000 --concurrency 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator
+
+from app.config.settings import settings
+from app.core.precomputed import (
+    FAVORITES, PROFILE, PrecomputedEntry, cache_version, favorites_key, load_precomputed,
+    mine_favorite_sets, mine_profile_archetypes, save_precomputed,
+)
+from app.core.recommender import movie_recommender
+from app.models.profile import Profile, ProfileRecord
+from app.services.favorites_store import FavoritesStore
+
+
+def read_profiles(path: Path) -> Iterator[Profile]:
+    """Lit les profils d'un export NDJSON (les lignes invalides sont ignorées)"""
+    with path.open(encoding="utf-8") as input_file:
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                yield ProfileRecord.model_validate_json(line).profile
+            except ValueError:
+                continue
+
+
+def read_reusable_entries(path: str) -> dict[tuple[str, str], PrecomputedEntry]:
+    """Entrées existantes de la version courante et encore valides"""
+    try:
+        version, entries = load_precomputed(path)
+    except (OSError, ValueError, KeyError):
+        return {}
+    if version != cache_version():
+        print(f"♻️ Existing file has version {version}, expected {cache_version()}: everything is recomputed")
+        return {}
+    # Marge d'un quart de la durée de vie : une entrée réutilisée reste servie jusqu'au prochain passage
+    min_generated_at = time.time() - settings.PRECOMPUTED_MAX_AGE * 0.75
+    return {(entry.kind, entry.key): entry for entry in entries if entry.generated_at >= min_generated_at}
+
+
+def compute_entry(kind: str, titles: list[str], count: int, profile: Profile | None) -> PrecomputedEntry:
+    """Calcule les recommandations d'un ensemble de favoris ou d'un archétype de profil"""
+    if kind == PROFILE:
+        movies = movie_recommender.get_recommendations_from_profile(profile)
+    else:
+        movies = movie_recommender.get_recommendations_legacy(titles)
+    return PrecomputedEntry(
+        kind=kind, key=favorites_key(titles), titles=titles, movies=movies.movies,
+        count=count, generated_at=time.time(), profile=profile,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--favorites", default=settings.FAVORITES_LOG_PATH, help="Journal JSONL des favoris")
+    parser.add_argument("--profiles", type=Path, help="Profils NDJSON (export de /profile/export), optionnel")
+    parser.add_argument("--output", default=settings.PRECOMPUTED_PATH, help="Fichier des recommandations précalculées")
+    parser.add_argument("--top", type=int, default=settings.PRECOMPUTED_TOP_SETS,
+                        help="Nombre maximum d'ensembles précalculés par type")
+    parser.add_argument("--min-count", type=int, default=settings.PRECOMPUTED_MIN_COUNT,
+                        help="Nombre minimum de soumissions d'un ensemble")
+    parser.add_argument("--concurrency", type=int, default=settings.BATCH_MAX_CONCURRENCY,
+                        help="Nombre de runs d'agent simultanés")
+    parser.add_argument("--force", action="store_true", help="Tout recalculer, même les entrées récentes")
+    args = parser.parse_args()
+
+    # Le précalcul ne doit pas se servir de ses propres résultats
+    settings.PRECOMPUTED_ENABLED = False
+
+    jobs = [(FAVORITES, titles, count, None)
+            for titles, count in mine_favorite_sets(FavoritesStore(args.favorites).iter_favorite_sets(), args.top, args.min_count)]
+    if args.profiles:
+        jobs += [(PROFILE, profile.movies_watched, count, profile)
+                 for profile, count in mine_profile_archetypes(read_profiles(args.profiles), args.top, args.min_count)]
+    if not jobs:
+        print(f"❌ No favorites set submitted at least {args.min_count} times")
+        raise SystemExit(1)
+
+    reusable = {} if args.force else read_reusable_entries(args.output)
+    entries = [reusable[(kind, favorites_key(titles))] for kind, titles, _, _ in jobs if (kind, favorites_key(titles)) in reusable]
+    pending = [job for job in jobs if (job[0], favorites_key(job[1])) not in reusable]
+    print(f"🎬 {len(jobs)} sets ({sum(job[0] == PROFILE for job in jobs)} profile archetypes): "
+          f"{len(entries)} reused, {len(pending)} to compute (version {cache_version()})")
+
+    start = time.perf_counter()
+    errors = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {executor.submit(compute_entry, *job): job for job in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            kind, titles, _, _ = futures[future]
+            try:
+                entries.append(future.result())
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ {kind} {', '.join(titles[:3])}...: {e}")
+            if done % 20 == 0:
+                print(f"⏳ {done}/{len(pending)} computed...")
+
+    written = save_precomputed(args.output, entries)
+    print(f"✅ {written} entries written in {time.perf_counter() - start:.1f}s ({errors} errors) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Exporte ou importe les profils d'un serveur en NDJSON (flux, mémoire constante)
+
+Les profils vivent dans la mémoire des workers : l'export et l'import passent
+par les endpoints /profile/export et /profile/import, protégés par ADMIN_TOKEN
+(lu dans l'environnement ou passé avec --token).
+
+Depuis backend/ :
+    python -m app.cli.profile_transfer export --output profiles.ndjson
+    python -m app.cli.profile_transfer import --input profiles.ndjson --url http://other-worker:8000 --overwrite
+"""
+import argparse
+import time
+from pathlib import Path
+
+import requests
+
+from app.config.settings import settings
+
+# Connexion rapide, mais un transfert complet peut être long
+TIMEOUT = (10, 600)
+
+
+def export_profiles(url: str, token: str, output: Path) -> None:
+    """Télécharge l'export NDJSON dans un fichier, morceau par morceau"""
+    start = time.perf_counter()
+    lines = 0
+    with requests.get(f"{url}/profile/export", headers={"X-Admin-Token": token}, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with output.open("wb") as output_file:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                output_file.write(chunk)
+                lines += chunk.count(b"\n")
+    print(f"✅ {lines} profiles exported in {time.perf_counter() - start:.1f}s -> {output}")
+
+
+def import_profiles(url: str, token: str, input_path: Path, overwrite: bool) -> None:
+    """Envoie un fichier NDJSON en flux (le fichier n'est pas chargé en mémoire)"""
+    start = time.perf_counter()
+    with input_path.open("rb") as input_file:
+        response = requests.post(
+            f"{url}/profile/import",
+            params={"overwrite": str(overwrite).lower()},
+            headers={"X-Admin-Token": token, "Content-Type": "application/x-ndjson"},
+            data=input_file,
+            timeout=TIMEOUT,
+        )
+    if response.status_code >= 400:
+        print(f"❌ Import failed ({response.status_code}): {response.text}")
+        raise SystemExit(1)
+    result = response.json()
+    print(f"✅ {result['imported']} imported, {result['skipped']} skipped, {result['invalid']} invalid "
+          f"in {time.perf_counter() - start:.1f}s")
+    for error in result["errors"]:
+        print(f"⚠️ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.API_BASE_URL, help="URL du serveur")
+    parser.add_argument("--token", default=settings.ADMIN_TOKEN, help="Jeton d'administration (ADMIN_TOKEN par défaut)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Exporter les profils du serveur")
+    export_parser.add_argument("--output", required=True, type=Path, help="Fichier NDJSON de sortie")
+
+    import_parser = commands.add_parser("import", help="Importer des profils sur le serveur")
+    import_parser.add_argument("--input", required=True, type=Path, help="Fichier NDJSON (format de l'export)")
+    import_parser.add_argument("--overwrite", action="store_true", help="Remplacer les profils existants")
+    args = parser.parse_args()
+
+    if not args.token:
+        print("❌ Admin token required (--token or ADMIN_TOKEN)")
+        raise SystemExit(1)
+
+    url = args.url.rstrip("/")
+    try:
+        if args.command == "export":
+            export_profiles(url, args.token, args.output)
+        else:
+            import_profiles(url, args.token, args.input, args.overwrite)
+    except requests.RequestException as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
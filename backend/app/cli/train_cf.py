@@ -0,0 +1,40 @@
+"""
+Entraîne le modèle item-item du filtrage collaboratif à partir des favoris enregistrés
+
+Depuis backend/ :
+    python -m app.cli.train_cf
+    python -m app.cli.train_cf --input data/favorites.jsonl --output data/cf_model.npz --min-support 3
+"""
+import argparse
+import time
+
+from app.config.settings import settings
+from app.core.collaborative import train_item_item_model
+from app.services.favorites_store import FavoritesStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=settings.FAVORITES_LOG_PATH, help="Journal JSONL des favoris")
+    parser.add_argument("--output", default=settings.CF_MODEL_PATH, help="Fichier du modèle (.npz)")
+    parser.add_argument("--min-support", type=int, default=settings.CF_MIN_SUPPORT,
+                        help="Nombre minimum de listes communes pour relier deux films")
+    parser.add_argument("--neighbours", type=int, default=settings.CF_NEIGHBOURS,
+                        help="Nombre de voisins conservés par film")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = FavoritesStore(args.input)
+    model = train_item_item_model(store.iter_favorite_sets(), args.min_support, args.neighbours)
+
+    if not model.titles:
+        print(f"❌ No favorites sets found in {args.input}")
+        raise SystemExit(1)
+
+    model.save(args.output)
+    print(f"✅ Trained on {model.favorite_sets} favorites sets in {time.perf_counter() - start:.2f}s")
+    print(f"🎬 {len(model.titles)} movies, {len(model.scores)} similarity pairs -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,6 +20,48 @@ class Settings:
         self.API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000')
         self.FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
         
+        # Lean agent output: the agent only returns title/year/why, TMDB fills the rest
+        self.LEAN_AGENT_OUTPUT = os.getenv('LEAN_AGENT_OUTPUT', 'true').lower() == 'true'
+        
+        # Local coercion and targeted repair of invalid structured outputs (instead of full reruns)
+        self.OUTPUT_REPAIR_ENABLED = os.getenv('OUTPUT_REPAIR_ENABLED', 'true').lower() == 'true'
+        
+        # Tracing export: "" (disabled), "console" or "file"
+        self.OTEL_EXPORTER = os.getenv('OTEL_EXPORTER', '').lower()
+        self.OTEL_FILE_PATH = os.getenv('OTEL_FILE_PATH', 'traces.jsonl')
+        
+        # LLM cost accounting (USD per million tokens) and per-session budget (0 = unlimited)
+        self.AI_INPUT_COST_PER_MTOK = float(os.getenv('AI_INPUT_COST_PER_MTOK', '0.5'))
+        self.AI_OUTPUT_COST_PER_MTOK = float(os.getenv('AI_OUTPUT_COST_PER_MTOK', '3.0'))
+        self.SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', '0'))
+        
+        # Provider-side context caching (GEMINI_BASE_URL allows a local stub). Off by default: the
+        # stable prefixes (~400-700 tokens) stay under CONTEXT_CACHE_MIN_TOKENS except for large profiles
+        self.CONTEXT_CACHE_ENABLED = os.getenv('CONTEXT_CACHE_ENABLED', 'false').lower() == 'true'
+        self.GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', '')
+        
+        # Local data (favorites log, offline-trained models)
+        self.DATA_DIR = os.getenv('DATA_DIR', str(Path(__file__).resolve().parents[2] / 'data'))
+        self.FAVORITES_LOG_PATH = os.getenv('FAVORITES_LOG_PATH', os.path.join(self.DATA_DIR, 'favorites.jsonl'))
+        self.CF_MODEL_PATH = os.getenv('CF_MODEL_PATH', os.path.join(self.DATA_DIR, 'cf_model.npz'))
+        self.CF_ENABLED = os.getenv('CF_ENABLED', 'true').lower() == 'true'
+        
+        # Recommendations precomputed offline for popular favorites sets (bump the version to invalidate them)
+        self.PRECOMPUTED_PATH = os.getenv('PRECOMPUTED_PATH', os.path.join(self.DATA_DIR, 'precomputed_recommendations.json.gz'))
+        self.PRECOMPUTED_ENABLED = os.getenv('PRECOMPUTED_ENABLED', 'true').lower() == 'true'
+        self.RECOMMENDATION_CACHE_VERSION = os.getenv('RECOMMENDATION_CACHE_VERSION', '1')
+        
+        # Reuse of recommendations across similar profiles (cosine similarity thresholds)
+        self.PROFILE_ANN_ENABLED = os.getenv('PROFILE_ANN_ENABLED', 'true').lower() == 'true'
+        self.PROFILE_ANN_SERVE_THRESHOLD = float(os.getenv('PROFILE_ANN_SERVE_THRESHOLD', '0.8'))
+        self.PROFILE_ANN_SEED_THRESHOLD = float(os.getenv('PROFILE_ANN_SEED_THRESHOLD', '0.6'))
+        
+        # Compact in-memory profile storage (interned lists, zstd-compressed texts)
+        self.PROFILE_COMPACT_STORAGE = os.getenv('PROFILE_COMPACT_STORAGE', 'true').lower() == 'true'
+        
+        # Token for admin endpoints (profile export/import, memory diagnostics), sent as X-Admin-Token; empty = disabled
+        self.ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+        
         # Validate required environment variables
         self._validate_required_vars()
     
@@ -34,6 +77,7 @@ class Settings:
     # API Endpoints
     TMDB_BASE_URL = "https://api.themoviedb.org/3"
     TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+    TMDB_LANGUAGE = "fr-FR"
     LANGSEARCH_ENDPOINT = "https://api.langsearch.com/v1/web-search"
     
     # AI Model Configuration
@@ -43,6 +87,141 @@ class Settings:
     DEFAULT_SEARCH_COUNT = 5
     DEFAULT_SEARCH_FRESHNESS = "noLimit"
     API_TIMEOUT = 10
+    
+    # LangSearch rate limit: one call per interval on average, BURST calls at once
+    LANGSEARCH_MIN_INTERVAL = 2.0
+    LANGSEARCH_BURST = 3
+    
+    # Search tool output sent to the agents: token budget per call, near-duplicate cutoff (Jaccard)
+    SEARCH_TOOL_MAX_TOKENS = 600
+    SEARCH_DUPLICATE_THRESHOLD = 0.6
+    
+    # Per-run budget of the agents' search tool (calls and seconds since the run started)
+    AGENT_TOOL_CALL_BUDGET = 4
+    AGENT_TOOL_TIME_BUDGET = 20.0
+    
+    # Recommendation post-processing
+    MIN_PROFILE_RECOMMENDATIONS = 5
+    MIN_LEGACY_RECOMMENDATIONS = 3
+    MAX_BACKFILL_ROUNDS = 1
+    
+    # Per-session recommendation history (two rotating Bloom generations of CAPACITY titles each),
+    # evicted after TTL seconds without recommendations or beyond MAX_SESSIONS sessions
+    RECOMMENDATION_HISTORY_CAPACITY = 2000
+    RECOMMENDATION_HISTORY_ERROR_RATE = 0.01
+    RECOMMENDATION_HISTORY_RECENT = 15
+    RECOMMENDATION_HISTORY_MAX_SESSIONS = 10000
+    RECOMMENDATION_HISTORY_TTL = 7 * 24 * 3600
+    
+    # TMDB enrichment
+    TMDB_CACHE_SIZE = 5000
+    TMDB_CACHE_TTL = 24 * 3600
+    # Title -> TMDB id index (ids are stable: no expiry), fed by /search, searches and details
+    TMDB_ID_INDEX_SIZE = 50000
+    TMDB_CAST_SIZE = 5
+    TMDB_MAX_WORKERS = 8
+    # Adaptive TMDB concurrency (AIMD): starts at INITIAL, grows while latency stays
+    # within TOLERANCE x baseline, backs off on 429/503 and honours Retry-After
+    TMDB_INITIAL_CONCURRENCY = 4
+    TMDB_MIN_CONCURRENCY = 1
+    TMDB_MAX_CONCURRENCY = 16
+    TMDB_LATENCY_TOLERANCE = 2.0
+    TMDB_MAX_RETRIES = 2
+    TMDB_DEFAULT_RETRY_AFTER = 1.0
+    TMDB_MAX_RETRY_AFTER = 30.0
+    
+    # Agent conversation continuation (follow-up queries, "more results")
+    CONVERSATION_MAX_ENTRIES = 1000
+    CONVERSATION_TTL = 30 * 60
+    CONVERSATION_MAX_MESSAGES = 12
+    
+    # LLM usage accounting
+    SESSION_TOKEN_BUDGET_WINDOW = 24 * 3600
+    
+    # Context caching (Gemini cached content)
+    CONTEXT_CACHE_TTL = 3600
+    CONTEXT_CACHE_REFRESH_MARGIN = 120
+    CONTEXT_CACHE_MIN_TOKENS = 1024
+    CONTEXT_CACHE_COOLDOWN = 300
+    CONTEXT_CACHE_MAX_ENTRIES = 500
+    
+    # Collaborative-filtering fast path (item-item model)
+    CF_MIN_SUPPORT = 2
+    CF_NEIGHBOURS = 50
+    CF_MIN_SEEDS = 2
+    CF_MIN_COVERAGE = 0.6
+    CF_MIN_SCORE = 0.15
+    CF_RELOAD_INTERVAL = 60
+    
+    # Favorites log (written off the request path, rotated by size, archives kept for training);
+    # a session's list is logged once per DEDUP_TTL (create then recommend, paging, retries)
+    FAVORITES_LOG_QUEUE_SIZE = 10000
+    FAVORITES_LOG_MAX_BYTES = 50 * 1024 * 1024
+    FAVORITES_LOG_BACKUPS = 3
+    FAVORITES_LOG_DEDUP_SIZE = 100000
+    FAVORITES_LOG_DEDUP_TTL = 24 * 3600
+    
+    # Offline precomputation (app.cli.precompute_recommendations) and serving of its results
+    PRECOMPUTED_TOP_SETS = 500
+    PRECOMPUTED_MIN_COUNT = 3
+    PRECOMPUTED_MAX_AGE = 7 * 24 * 3600
+    PRECOMPUTED_RELOAD_INTERVAL = 60
+    
+    # Legacy /recommendations result cache (canonical favorites set + normalized query)
+    LEGACY_CACHE_SIZE = 1000
+    LEGACY_CACHE_TTL = 3600
+    
+    # Memory diagnostics (admin endpoints): tracemalloc traceback depth, snapshots kept,
+    # and maximum number of objects walked when sizing a subsystem
+    MEMORY_TRACEMALLOC_FRAMES = 10
+    MEMORY_MAX_SNAPSHOTS = 5
+    MEMORY_SIZEOF_MAX_OBJECTS = 1_000_000
+    
+    # Profile nearest-neighbour index (random-hyperplane LSH)
+    PROFILE_ANN_DIM = 512
+    PROFILE_ANN_TABLES = 16
+    PROFILE_ANN_BITS = 10
+    PROFILE_ANN_MAX_ENTRIES = 10000
+    PROFILE_ANN_TTL = 7 * 24 * 3600
+    PROFILE_ANN_SEED_TITLES = 8
+    
+    # Incremental profile update (maximum size of the merged list fields)
+    PROFILE_LIST_MAX_ITEMS = 12
+    PROFILE_MAX_WATCHED = 100
+    
+    # /profile/list pagination
+    PROFILE_LIST_PAGE_SIZE = 50
+    PROFILE_LIST_MAX_PAGE_SIZE = 200
+    
+    # Profile NDJSON export/import (lines per streamed chunk, lines validated per chunk)
+    PROFILE_EXPORT_CHUNK_SIZE = 500
+    PROFILE_IMPORT_CHUNK_SIZE = 1000
+    PROFILE_IMPORT_MAX_LINE_BYTES = 1024 * 1024
+    PROFILE_IMPORT_MAX_ERRORS = 20
+    
+    # Compact profile storage: zstd level, shared dictionary trained on the first profiles, and
+    # bound of the shared list vocabulary (items seen after it is full are stored inline)
+    PROFILE_ZSTD_LEVEL = 3
+    PROFILE_ZSTD_DICT_SAMPLES = 1000
+    PROFILE_ZSTD_DICT_SIZE = 16 * 1024
+    PROFILE_VOCABULARY_MAX_ITEMS = 200_000
+    
+    # Admission control: concurrent requests, wait queue and per-session cap per route class
+    ADMISSION_QUEUE_TIMEOUT = 15
+    ADMISSION_BULKHEADS = {
+        "batch": {"paths": [r"^/recommendations/batch$", r"^/profile/(export|import)$"], "limit": 1, "max_queue": 0},
+        "llm": {
+            "paths": [r"^/recommendations", r"^/profile/create(-and-recommend)?$", r"^/profile/[^/]+/favorites$"],
+            "limit": 8, "max_queue": 16, "session_limit": 2,
+        },
+        "search": {"paths": [r"^/search$"], "limit": 16, "max_queue": 32, "timeout": 5},
+    }
+    
+    # Batch recommendations (concurrent agent runs, items per HTTP request, reused results);
+    # larger runs go through app.cli.batch_recommend
+    BATCH_MAX_CONCURRENCY = 4
+    BATCH_MAX_ITEMS = 200
+    BATCH_DEDUP_CACHE_SIZE = 1000
 
 # Instance globale des settings
 settings = Settings()
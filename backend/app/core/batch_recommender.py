@@ -0,0 +1,103 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator
+
+from app.config.settings import settings
+from app.core.recommender import MovieRecommender, movie_recommender
+from app.models.batch import BatchItem
+from app.utils.hashing import content_hash
+from app.utils.lru_cache import LRUCache
+from app.utils.telemetry import submit_with_context
+
+logger = logging.getLogger(__name__)
+
+
+class BatchRecommender:
+    """
+    Generates recommendations for many profiles with bounded concurrency
+
+    At most `max_concurrency` agent runs are in flight at once (TMDB calls are
+    bounded globally by TMDBService). Items with the same profile and query as
+    a pending or recently finished item reuse its result. Results are yielded
+    as soon as they are ready, one dict per item, so callers can stream them
+    and resume by skipping finished ids.
+    """
+
+    def __init__(self, recommender: MovieRecommender | None = None, max_concurrency: int | None = None):
+        self.recommender = recommender or movie_recommender
+        self.max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+
+    def _recommend(self, item: BatchItem) -> list[dict]:
+        """Runs one item and returns its serialized movies"""
+        movies = self.recommender.get_recommendations_from_profile(item.profile, item.custom_query)
+        return [movie.model_dump() for movie in movies.movies]
+
+    def run(self, items: Iterable[BatchItem], skip_ids: Iterable[str] = ()) -> Iterator[dict]:
+        """
+        Processes the items and yields one result per item, in completion order
+
+        Each result is {"id", "status": "ok", "movies"} or {"id", "status": "error", "error"};
+        items sharing the result of an identical earlier item carry "deduplicated": true.
+
+        Args:
+            items: Items to process (consumed lazily)
+            skip_ids: Ids already processed (resume), not yielded again
+
+        Yields:
+            dict: Result of an item
+        """
+        skip_ids = set(skip_ids)
+        # Structure: {profile/query hash: [future, ids waiting for it]}
+        pending: dict[str, list] = {}
+        futures: dict[Future, str] = {}
+        finished = LRUCache(maxsize=settings.BATCH_DEDUP_CACHE_SIZE)
+        processed = deduplicated = failed = 0
+
+        def drain(block_until_room: bool) -> Iterator[dict]:
+            nonlocal processed, failed
+            while futures and (not block_until_room or len(futures) >= self.max_concurrency):
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    _, ids = pending.pop(key)
+                    try:
+                        result = {"status": "ok", "movies": future.result()}
+                    except Exception as e:
+                        logger.warning(f"⚠️ Batch item {ids[0]} failed: {e}")
+                        result = {"status": "error", "error": str(e)}
+                        failed += len(ids)
+                    else:
+                        finished.set(key, result)
+                    processed += len(ids)
+                    for position, item_id in enumerate(ids):
+                        yield {"id": item_id, **result, **({"deduplicated": True} if position else {})}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for item in items:
+                if item.id in skip_ids:
+                    continue
+                skip_ids.add(item.id)
+
+                key = content_hash({"profile": item.profile.model_dump(mode="json"), "query": item.custom_query or ""})
+                if key in pending:
+                    pending[key][1].append(item.id)
+                    deduplicated += 1
+                    continue
+                result = finished.get(key)
+                if result is not None:
+                    deduplicated += 1
+                    processed += 1
+                    yield {"id": item.id, **result, "deduplicated": True}
+                    continue
+
+                yield from drain(block_until_room=True)
+                future = submit_with_context(executor, self._recommend, item)
+                pending[key] = [future, [item.id]]
+                futures[future] = key
+
+            yield from drain(block_until_room=False)
+
+        logger.info(f"📦 Batch done: {processed} items, {deduplicated} deduplicated, {failed} failed")
+
+# Global instance of the batch recommender
+batch_recommender = BatchRecommender()
@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+import numpy as np
+from scipy import sparse
+
+from app.config.settings import settings
+from app.utils.title_utils import canonicalize_title
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CollaborativeMatch:
+    """A movie suggested by the item-item model"""
+    title: str
+    score: float
+    because_of: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ItemItemModel:
+    """Top-K item-item cosine similarities stored as CSR arrays"""
+    titles: list[str]
+    counts: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    scores: np.ndarray
+    trained_at: float = 0.0
+    favorite_sets: int = 0
+    index: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.index:
+            self.index = {canonicalize_title(title): i for i, title in enumerate(self.titles)}
+
+    def save(self, path: str) -> None:
+        """
+        Saves the model as a compressed .npz file (no pickle)
+
+        Args:
+            path: Destination path
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        metadata = {"titles": self.titles, "trained_at": self.trained_at, "favorite_sets": self.favorite_sets}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            counts=self.counts, indptr=self.indptr, indices=self.indices, scores=self.scores,
+            metadata=np.array(json.dumps(metadata, ensure_ascii=False))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ItemItemModel":
+        """
+        Loads a model saved with save()
+
+        Args:
+            path: Model path
+
+        Returns:
+            ItemItemModel: Loaded model
+        """
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return cls(
+                titles=metadata["titles"],
+                counts=data["counts"], indptr=data["indptr"], indices=data["indices"], scores=data["scores"],
+                trained_at=metadata["trained_at"], favorite_sets=metadata["favorite_sets"]
+            )
+
+
+def train_item_item_model(favorite_sets: Iterable[list[str]], min_support: int | None = None,
+                          neighbours: int | None = None) -> ItemItemModel:
+    """
+    Trains an item-item model from favorites lists (implicit feedback)
+
+    Each list is a set of canonical titles; two movies are similar when they
+    often appear in the same lists (cosine over co-occurrences). Only pairs seen
+    together at least min_support times are kept, and the top neighbours per movie.
+
+    Args:
+        favorite_sets: Iterable of favorites lists
+        min_support: Minimum co-occurrence count for a pair
+        neighbours: Number of neighbours kept per movie
+
+    Returns:
+        ItemItemModel: Trained model
+    """
+    min_support = min_support or settings.CF_MIN_SUPPORT
+    neighbours = neighbours or settings.CF_NEIGHBOURS
+
+    index: dict[str, int] = {}
+    titles: list[str] = []
+    rows: list[int] = []
+    cols: list[int] = []
+    n_sets = 0
+
+    for favorites in favorite_sets:
+        items = set()
+        for title in favorites:
+            key = canonicalize_title(title)
+            if not key:
+                continue
+            if key not in index:
+                index[key] = len(titles)
+                titles.append(title.strip())
+            items.add(index[key])
+        if len(items) < 2:
+            continue
+        rows.extend([n_sets] * len(items))
+        cols.extend(items)
+        n_sets += 1
+
+    n_items = len(titles)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n_sets, n_items))
+    counts = np.asarray(matrix.sum(axis=0)).ravel().astype(np.float32)
+
+    cooccurrences = (matrix.T @ matrix).tocsr()
+    cooccurrences.setdiag(0)
+    cooccurrences.data[cooccurrences.data < min_support] = 0
+    cooccurrences.eliminate_zeros()
+
+    inverse_norms = sparse.diags(1.0 / np.sqrt(np.maximum(counts, 1.0)))
+    similarities = (inverse_norms @ cooccurrences @ inverse_norms).tocsr()
+
+    indptr = [0]
+    indices: list[np.ndarray] = []
+    scores: list[np.ndarray] = []
+    for i in range(n_items):
+        start, end = similarities.indptr[i], similarities.indptr[i + 1]
+        row_indices = similarities.indices[start:end]
+        row_scores = similarities.data[start:end]
+        if len(row_scores) > neighbours:
+            top = np.argpartition(-row_scores, neighbours)[:neighbours]
+            row_indices, row_scores = row_indices[top], row_scores[top]
+        order = np.argsort(-row_scores)
+        indices.append(row_indices[order])
+        scores.append(row_scores[order])
+        indptr.append(indptr[-1] + len(order))
+
+    return ItemItemModel(
+        titles=titles,
+        counts=counts,
+        indptr=np.asarray(indptr, dtype=np.int64),
+        indices=np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32),
+        scores=np.concatenate(scores).astype(np.float32) if scores else np.zeros(0, dtype=np.float32),
+        trained_at=time.time(),
+        favorite_sets=n_sets,
+        index=index
+    )
+
+
+class CollaborativeRecommender:
+    """Serves recommendations from the offline-trained item-item model"""
+
+    def __init__(self, model_path: str | None = None):
+        self.model_path = model_path or settings.CF_MODEL_PATH
+        self.model: ItemItemModel | None = None
+        self._model_mtime = 0.0
+        self._checked_at = 0.0
+        self.stats = {"served": 0, "declined": 0}
+
+    def _refresh_model(self) -> None:
+        """Loads the model, or reloads it when the file changed (checked periodically)"""
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < settings.CF_RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return
+        if mtime == self._model_mtime:
+            return
+
+        try:
+            self.model = ItemItemModel.load(self.model_path)
+            self._model_mtime = mtime
+            logger.info(f"🧩 CF model loaded: {len(self.model.titles)} movies, {self.model.favorite_sets} favorites sets")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load CF model {self.model_path}: {e}")
+
+    def recommend(self, favorites: list[str], count: int,
+                  excluded: Callable[[str], bool] | None = None) -> list[CollaborativeMatch] | None:
+        """
+        Recommends movies if the model covers the favorites well enough
+
+        Args:
+            favorites: Favorite movie titles (seeds)
+            count: Number of movies wanted
+            excluded: Optional predicate for titles that must not be recommended
+
+        Returns:
+            list[CollaborativeMatch] | None: Matches, or None when the input is cold or unusual
+        """
+        if not settings.CF_ENABLED:
+            return None
+        self._refresh_model()
+        model = self.model
+        if model is None or not favorites:
+            return None
+
+        seed_keys = {canonicalize_title(title) for title in favorites} - {""}
+        seeds = [model.index[key] for key in seed_keys if key in model.index]
+        if len(seeds) < settings.CF_MIN_SEEDS or len(seeds) / max(len(seed_keys), 1) < settings.CF_MIN_COVERAGE:
+            self.stats["declined"] += 1
+            return None
+
+        seed_set = set(seeds)
+        scores: dict[int, float] = {}
+        reasons: dict[int, list[int]] = {}
+        for seed in seeds:
+            start, end = model.indptr[seed], model.indptr[seed + 1]
+            for neighbour, score in zip(model.indices[start:end], model.scores[start:end]):
+                if neighbour in seed_set:
+                    continue
+                scores[neighbour] = scores.get(neighbour, 0.0) + float(score)
+                reasons.setdefault(neighbour, []).append(seed)
+
+        matches = []
+        for item, score in sorted(scores.items(), key=lambda entry: entry[1], reverse=True):
+            # Normalize by the number of seeds so the threshold does not depend on the list size
+            normalized = score / len(seeds) ** 0.5
+            if normalized < settings.CF_MIN_SCORE:
+                break
+            title = model.titles[item]
+            if excluded and excluded(title):
+                continue
+            because_of = sorted(reasons[item], key=lambda seed: -model.counts[seed])[:2]
+            matches.append(CollaborativeMatch(title=title, score=normalized, because_of=[model.titles[s] for s in because_of]))
+            if len(matches) == count:
+                break
+
+        if len(matches) < count:
+            self.stats["declined"] += 1
+            return None
+
+        self.stats["served"] += 1
+        return matches
+
+    def get_stats(self) -> dict:
+        """
+        Returns fast-path statistics and model information
+
+        Returns:
+            dict: Served/declined counters and model size
+        """
+        model = self.model
+        return {
+            **self.stats,
+            "model_loaded": model is not None,
+            "movies": len(model.titles) if model else 0,
+            "favorite_sets": model.favorite_sets if model else 0,
+            "trained_at": model.trained_at if model else None,
+        }
+
+# Global instance of the collaborative recommender
+collaborative_recommender = CollaborativeRecommender()
@@ -0,0 +1,238 @@
+import gzip
+import json
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+
+from app.config.settings import settings
+from app.core.profile_index import vectorize_profile
+from app.models.movie import Movie
+from app.models.profile import Profile
+from app.utils.title_utils import canonical_title_set
+
+logger = logging.getLogger(__name__)
+
+# Kinds of precomputed entries: favorites sets (legacy route) and profile archetypes
+FAVORITES = "favorites"
+PROFILE = "profile"
+
+
+def favorites_key(titles: Iterable[str]) -> str:
+    """
+    Order-independent key of a favorites set
+
+    Args:
+        titles: Favorite movie titles
+
+    Returns:
+        str: Sorted canonical titles joined with "|" (empty if no usable title)
+    """
+    return "|".join(canonical_title_set(titles))
+
+
+def cache_version() -> str:
+    """Version of the precomputed recommendations: bumped setting + model (a new model invalidates them)"""
+    return f"{settings.RECOMMENDATION_CACHE_VERSION}:{settings.AI_MODEL}"
+
+
+@dataclass
+class PrecomputedEntry:
+    """Recommendations computed offline for a favorites set or a profile archetype"""
+    kind: str
+    key: str
+    titles: list[str]
+    movies: list[Movie]
+    count: int = 0
+    generated_at: float = 0.0
+    profile: Profile | None = None
+    vector: np.ndarray | None = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        data = {
+            "kind": self.kind, "key": self.key, "titles": self.titles, "count": self.count,
+            "generated_at": self.generated_at, "movies": [movie.model_dump(mode="json") for movie in self.movies],
+        }
+        if self.profile is not None:
+            data["profile"] = self.profile.model_dump(mode="json")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PrecomputedEntry":
+        profile = Profile.model_validate(data["profile"]) if data.get("profile") else None
+        return cls(
+            kind=data["kind"], key=data["key"], titles=data["titles"], count=data.get("count", 0),
+            generated_at=data.get("generated_at", 0.0), movies=[Movie.model_validate(movie) for movie in data["movies"]],
+            profile=profile, vector=vectorize_profile(profile) if profile is not None else None,
+        )
+
+
+def save_precomputed(path: str, entries: Iterable[PrecomputedEntry], version: str | None = None) -> int:
+    """
+    Writes precomputed entries as gzipped JSON, atomically
+
+    Args:
+        path: Destination path
+        entries: Entries to write
+        version: Cache version (current one by default)
+
+    Returns:
+        int: Number of entries written
+    """
+    data = {
+        "version": version or cache_version(),
+        "generated_at": time.time(),
+        "entries": [entry.to_dict() for entry in entries],
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as output_file:
+        json.dump(data, output_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return len(data["entries"])
+
+
+def load_precomputed(path: str) -> tuple[str, list[PrecomputedEntry]]:
+    """
+    Reads a file written by save_precomputed()
+
+    Args:
+        path: File path
+
+    Returns:
+        tuple: (version, entries)
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as input_file:
+        data = json.load(input_file)
+    return data["version"], [PrecomputedEntry.from_dict(entry) for entry in data["entries"]]
+
+
+def mine_favorite_sets(favorite_sets: Iterable[list[str]], top: int, min_count: int) -> list[tuple[list[str], int]]:
+    """
+    Finds the most frequently submitted favorites sets
+
+    Args:
+        favorite_sets: Recorded favorites lists (e.g. the favorites log)
+        top: Maximum number of sets returned
+        min_count: Minimum number of submissions
+
+    Returns:
+        list: (titles as first submitted, submission count), most frequent first
+    """
+    counts: Counter = Counter()
+    first_titles: dict[str, list[str]] = {}
+    for titles in favorite_sets:
+        key = favorites_key(titles)
+        if key:
+            counts[key] += 1
+            first_titles.setdefault(key, titles)
+    return [(first_titles[key], count) for key, count in counts.most_common(top) if count >= min_count]
+
+
+def mine_profile_archetypes(profiles: Iterable[Profile], top: int, min_count: int) -> list[tuple[Profile, int]]:
+    """
+    Finds the most common profile archetypes (profiles built from the same watched movies)
+
+    Args:
+        profiles: Stored profiles (e.g. a /profile/export file)
+        top: Maximum number of archetypes returned
+        min_count: Minimum number of profiles per archetype
+
+    Returns:
+        list: (most recent profile of the archetype, profile count), most frequent first
+    """
+    counts: Counter = Counter()
+    latest: dict[str, Profile] = {}
+    for profile in profiles:
+        key = favorites_key(profile.movies_watched)
+        if key:
+            counts[key] += 1
+            latest[key] = profile
+    return [(latest[key], count) for key, count in counts.most_common(top) if count >= min_count]
+
+
+class PrecomputedRecommender:
+    """Serves recommendations precomputed offline (see app.cli.precompute_recommendations)"""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.PRECOMPUTED_PATH
+        self.entries: dict[tuple[str, str], PrecomputedEntry] = {}
+        self._mtime = 0.0
+        self._checked_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _refresh(self) -> None:
+        """Loads the file, or reloads it when it changed (checked periodically); other versions are ignored"""
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < settings.PRECOMPUTED_RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+
+        try:
+            version, entries = load_precomputed(self.path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load precomputed recommendations {self.path}: {e}")
+            return
+        if version != cache_version():
+            logger.warning(f"⚠️ Precomputed recommendations ignored: version {version}, expected {cache_version()}")
+            self.entries = {}
+            return
+        self.entries = {(entry.kind, entry.key): entry for entry in entries}
+        logger.info(f"📦 Precomputed recommendations loaded: {len(self.entries)} entries (version {version})")
+
+    def lookup(self, kind: str, titles: list[str], profile: Profile | None = None) -> list[Movie] | None:
+        """
+        Returns the precomputed movies for a favorites set or a profile
+
+        A profile matches an archetype with the same watched movies only if it
+        was not edited away from it (cosine similarity >= PROFILE_ANN_SERVE_THRESHOLD).
+
+        Args:
+            kind: FAVORITES or PROFILE
+            titles: Favorite (or watched) movie titles
+            profile: Profile to compare with the archetype (PROFILE kind)
+
+        Returns:
+            list[Movie] | None: Precomputed movies, or None when there is no fresh entry
+        """
+        if not settings.PRECOMPUTED_ENABLED:
+            return None
+        self._refresh()
+        entry = self.entries.get((kind, favorites_key(titles)))
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if time.time() - entry.generated_at > settings.PRECOMPUTED_MAX_AGE:
+            self.stats["stale"] += 1
+            return None
+        if profile is not None and entry.vector is not None:
+            similarity = float(np.dot(vectorize_profile(profile), entry.vector))
+            if similarity < settings.PROFILE_ANN_SERVE_THRESHOLD:
+                self.stats["misses"] += 1
+                return None
+        self.stats["hits"] += 1
+        return entry.movies
+
+    def get_stats(self) -> dict:
+        """
+        Returns lookup statistics and cache information
+
+        Returns:
+            dict: Hits/misses/stale counters, entries and version
+        """
+        return {**self.stats, "entries": len(self.entries), "version": cache_version()}
+
+# Global instance of the precomputed recommender
+precomputed_recommender = PrecomputedRecommender()
@@ -1,28 +1,110 @@
-from app.models.profile import Profile
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from app.config.settings import settings
+from app.models.movie import FavoriteMovie
+from app.models.profile import Profile, ProfileDelta
 from app.services.ai_service import ai_service
+from app.services.context_cache_service import context_cache_service
+from app.services.output_repair_service import output_repair_service
+from app.services.tmdb_service import tmdb_service
+from app.services.usage_service import usage_service
+from app.utils.telemetry import stage, submit_with_context
+from app.utils.title_utils import canonicalize_title
+from app.utils.tool_budget import ToolBudget
+
+logger = logging.getLogger(__name__)
+
+# Profile list fields and the delta field that extends each of them
+_DELTA_LIST_FIELDS = {
+    "favorite_genres": "new_genres",
+    "favorite_directors": "new_directors",
+    "favorite_actors": "new_actors",
+    "preferred_decades": "new_decades",
+    "recommended_genres_to_explore": "new_genres_to_explore",
+    "viewing_mood_preferences": "new_mood_preferences",
+}
+_DELTA_TEXT_FIELDS = ("movie_preferences", "personality_traits", "cinematic_taste_description")
+
+
+def _item_key(item: str) -> str:
+    """Comparison key of a list item (titles, names, genres)"""
+    return canonicalize_title(item) or item.strip().lower()
+
+
+def _as_favorites(movies: list[str | FavoriteMovie]) -> list[FavoriteMovie]:
+    """Wraps bare titles (older clients) as favorites without a TMDB id"""
+    return [movie if isinstance(movie, FavoriteMovie) else FavoriteMovie(title=movie) for movie in movies]
+
+
+def _profile_posters(profile: Profile) -> dict[str, str]:
+    """Known posters of a profile, by title key"""
+    return {_item_key(title): poster for title, poster in zip(profile.movies_watched, profile.watched_posters) if poster}
+
+
+def align_posters(movies_watched: list[str], posters: dict[str, str]) -> list[str]:
+    """Posters in movies_watched order ("" when unknown)"""
+    return [posters.get(_item_key(title), "") for title in movies_watched]
+
+
+def _profile_tmdb_ids(profile: Profile) -> dict[str, int]:
+    """Known TMDB ids of a profile, by title key (none for profiles saved before the ids were aligned)"""
+    if len(profile.watched_tmdb_ids) != len(profile.movies_watched):
+        return {}
+    return {_item_key(title): tmdb_id for title, tmdb_id in zip(profile.movies_watched, profile.watched_tmdb_ids) if tmdb_id}
+
+
+def align_tmdb_ids(movies_watched: list[str], tmdb_ids: dict[str, int]) -> list[int]:
+    """TMDB ids in movies_watched order (0 when unknown, e.g. TV shows and bare titles)"""
+    return [tmdb_ids.get(_item_key(title), 0) for title in movies_watched]
+
+
+def _merge_list(existing: list[str], added: list[str], removed_keys: set[str], limit: int) -> list[str]:
+    """
+    Merges list items deterministically
+
+    Existing items keep their order, removed ones are dropped, new ones are
+    appended in order without duplicates; additions stop at the limit (existing
+    items are never cut).
+    """
+    merged, seen = [], set(removed_keys)
+    for item in [*existing, *added]:
+        key = _item_key(item)
+        if key and key not in seen:
+            seen.add(key)
+            merged.append(item.strip())
+    return merged[:max(limit, len(existing))]
+
 
 class ProfileCreator:
     """Class responsible for user profile creation"""
     
     def __init__(self):
         self.ai_service = ai_service
+        self.tmdb_service = tmdb_service
     
-    def create_user_profile(self, favorite_movies: list[str], ) -> Profile:
+    def create_user_profile(self, favorite_movies: list[str | FavoriteMovie]) -> Profile:
         """
         Analyzes user's favorite movies to create a detailed cinematic profile
         
+        The posters of the favorites are resolved on TMDB while the agent runs
+        and stored in the profile, so profile views need no further lookups.
+        movies_watched is the favorites list itself (the agent may rename or
+        drop titles), so posters and TMDB ids stay aligned on it.
+        
         Args:
-            favorite_movies: List of user's favorite movie titles
-
+            favorite_movies: User's favorite movie titles (or /search movies with their TMDB id)
         
         Returns:
             Profile: Detailed cinematic profile of the user
         """
+        favorites = _as_favorites(favorite_movies)
+        
         # Use AI service to create the agent
-        profile_agent = self.ai_service.create_profile_agent(Profile)
+        profile_agent = self.ai_service.create_profile_agent(output_repair_service.lenient(Profile))
         
         # Build the analysis query
-        user_query = f"""Analyze my favorite movies to create my cinematic profile: {', '.join(favorite_movies)}.
+        user_query = f"""Analyze my favorite movies to create my cinematic profile: {', '.join(movie.title for movie in favorites)}.
         
         Create a detailed profile that includes:
         - Favorite genres
@@ -35,9 +117,181 @@ class ProfileCreator:
         - Viewing mood preferences
         """
         
-        # Run the agent and retrieve the profile
-        result = profile_agent.run_sync(user_query)
-        return result.output
+        with ThreadPoolExecutor(max_workers=min(settings.TMDB_MAX_WORKERS, max(1, len(favorites)))) as executor:
+            # Poster lookups overlap with the agent run
+            poster_futures = {
+                _item_key(movie.title): submit_with_context(
+                    executor, self.tmdb_service.search_movie_poster, movie.title, "", movie.tmdb_id
+                )
+                for movie in favorites
+            }
+            
+            # Run the agent and retrieve the profile
+            with stage("agent_run", "agent run profile") as span, context_cache_service.scope("profile"):
+                result = profile_agent.run_sync(user_query, deps=ToolBudget.from_settings())
+                usage = result.usage()
+                span.set_attribute("gen_ai.usage.input_tokens", usage.input_tokens)
+                span.set_attribute("gen_ai.usage.output_tokens", usage.output_tokens)
+            usage_service.record_run("profile", result)
+            profile = output_repair_service.finalize(result, "profile")
+            
+            with stage("poster_prefetch", movies=len(poster_futures)):
+                posters = {key: future.result() for key, future in poster_futures.items()}
+        
+        profile.movies_watched = _merge_list([], [movie.title for movie in favorites], set(), settings.PROFILE_MAX_WATCHED)
+        profile.watched_posters = align_posters(profile.movies_watched, posters)
+        profile.watched_tmdb_ids = align_tmdb_ids(
+            profile.movies_watched, {_item_key(movie.title): movie.tmdb_id for movie in favorites if movie.tmdb_id}
+        )
+        return profile
+    
+    def carry_posters(self, existing: Profile, updated: Profile) -> list[str]:
+        """
+        Posters of an edited profile, realigned on its movies_watched
+        
+        Args:
+            existing: Stored profile
+            updated: Profile sent by the client (posters missing or out of order)
+        
+        Returns:
+            list[str]: Posters in updated.movies_watched order
+        """
+        return align_posters(updated.movies_watched, {**_profile_posters(existing), **_profile_posters(updated)})
+    
+    def carry_tmdb_ids(self, existing: Profile, updated: Profile) -> list[int]:
+        """
+        TMDB ids of an edited profile, realigned on its movies_watched
+        
+        Args:
+            existing: Stored profile
+            updated: Profile sent by the client (ids missing or out of order)
+        
+        Returns:
+            list[int]: TMDB ids in updated.movies_watched order, removed titles' ids dropped
+        """
+        return align_tmdb_ids(updated.movies_watched, {**_profile_tmdb_ids(existing), **_profile_tmdb_ids(updated)})
+    
+    def _describe_movie(self, movie: FavoriteMovie) -> str:
+        """
+        Describes an added movie from its TMDB details (cached lookups, no LLM tool call)
+        
+        Args:
+            movie: Added favorite movie
+        
+        Returns:
+            str: One-line description, or the bare title if TMDB does not know it
+        """
+        if movie.tmdb_id:
+            details = self.tmdb_service.get_movie_details(movie.tmdb_id)
+        else:
+            details = self.tmdb_service.get_movie_details_by_title(movie.title)
+        if not details:
+            return movie.title
+        
+        fields = self.tmdb_service.extract_movie_fields(details)
+        facts = [value for value in (
+            fields["genre"],
+            f"directed by {fields['director']}" if fields["director"] else "",
+            f"starring {', '.join(fields['cast'][:3])}" if fields["cast"] else "",
+        ) if value]
+        year = f" ({fields['year']})" if fields["year"] else ""
+        return f"{movie.title}{year}: {'; '.join(facts)}" if facts else f"{movie.title}{year}"
+    
+    def _apply_delta(self, profile: Profile, delta: ProfileDelta | None, added: list[FavoriteMovie],
+                     removed: list[FavoriteMovie], added_posters: dict[str, str] | None = None) -> Profile:
+        """
+        Applies added/removed favorites and the agent's delta to a profile
+        
+        Args:
+            profile: Existing profile
+            delta: Changes returned by the update agent, None for removals only
+            added: Movies added to the favorites
+            removed: Movies removed from the favorites
+            added_posters: Posters of the added movies, by title key
+        
+        Returns:
+            Profile: Updated copy of the profile
+        """
+        limit = settings.PROFILE_LIST_MAX_ITEMS
+        outdated = {_item_key(item) for item in delta.outdated_items} if delta else set()
+        
+        movies_watched = _merge_list(
+            profile.movies_watched, [movie.title for movie in added],
+            {_item_key(movie.title) for movie in removed}, settings.PROFILE_MAX_WATCHED
+        )
+        # Ids and posters follow the titles: a removed title (with or without its id) takes both along
+        added_ids = {_item_key(movie.title): movie.tmdb_id for movie in added if movie.tmdb_id}
+        update = {
+            "movies_watched": movies_watched,
+            "watched_tmdb_ids": align_tmdb_ids(movies_watched, {**_profile_tmdb_ids(profile), **added_ids}),
+            "watched_posters": align_posters(movies_watched, {**_profile_posters(profile), **(added_posters or {})}),
+        }
+        for field_name, delta_field in _DELTA_LIST_FIELDS.items():
+            new_items = getattr(delta, delta_field) if delta else []
+            update[field_name] = _merge_list(getattr(profile, field_name), new_items, outdated, limit)
+        if delta:
+            for field_name in _DELTA_TEXT_FIELDS:
+                text = (getattr(delta, field_name) or "").strip()
+                if text:
+                    update[field_name] = text
+        
+        return profile.model_copy(update=update)
+    
+    def update_user_profile(self, profile: Profile, added_movies: list[str | FavoriteMovie],
+                            removed_movies: list[str | FavoriteMovie]) -> Profile:
+        """
+        Updates a profile incrementally when favorites are added or removed
+        
+        Only the delta is sent to a small tool-less agent, grounded with TMDB
+        facts about the added movies; list fields are merged deterministically.
+        Removals alone do not call the LLM.
+        
+        Args:
+            profile: Existing profile
+            added_movies: Titles (or /search movies) added to the favorites
+            removed_movies: Titles (or /search movies) removed from the favorites
+        
+        Returns:
+            Profile: Updated profile
+        """
+        watched = {_item_key(title) for title in profile.movies_watched}
+        added = [movie for movie in _as_favorites(added_movies) if _item_key(movie.title) not in watched]
+        removed = [movie for movie in _as_favorites(removed_movies) if _item_key(movie.title) in watched]
+        
+        if not added:
+            logger.info(f"✂️ Profile update without LLM call: {len(removed)} movies removed")
+            return self._apply_delta(profile, None, added, removed)
+        
+        with stage("tmdb_enrichment", movies=len(added)):
+            with ThreadPoolExecutor(max_workers=min(settings.TMDB_MAX_WORKERS, len(added))) as executor:
+                futures = [submit_with_context(executor, self._describe_movie, movie) for movie in added]
+                descriptions = [future.result() for future in futures]
+        # Lookups cached by the descriptions above
+        added_posters = {
+            _item_key(movie.title): self.tmdb_service.search_movie_poster(movie.title, tmdb_id=movie.tmdb_id)
+            for movie in added
+        }
+        
+        current = profile.model_dump(exclude={"watched_tmdb_ids", "watched_posters"})
+        user_query = f"""Current profile:
+{json.dumps(current, ensure_ascii=False)}
+
+Movies added to favorites:
+{chr(10).join(f'- {description}' for description in descriptions)}
+"""
+        if removed:
+            user_query += f"\nMovies removed from favorites: {', '.join(movie.title for movie in removed)}\n"
+        
+        update_agent = self.ai_service.create_profile_update_agent(output_repair_service.lenient(ProfileDelta))
+        with stage("agent_run", "agent run profile_update") as span, context_cache_service.scope("profile_update"):
+            result = update_agent.run_sync(user_query)
+            usage = result.usage()
+            span.set_attribute("gen_ai.usage.input_tokens", usage.input_tokens)
+            span.set_attribute("gen_ai.usage.output_tokens", usage.output_tokens)
+        usage_service.record_run("profile_update", result)
+        delta = output_repair_service.finalize(result, "profile_update")
+        
+        return self._apply_delta(profile, delta, added, removed, added_posters)
 
 # Global instance of the profile creator
 profile_creator = ProfileCreator()
@@ -0,0 +1,189 @@
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+import numpy as np
+
+from app.config.settings import settings
+from app.models.movie import Movie
+from app.models.profile import Profile
+from app.utils.title_utils import canonicalize_title
+
+# (field, weight) of the list fields used to vectorize a profile
+_LIST_FIELDS = (
+    ("favorite_genres", 2.0),
+    ("favorite_directors", 2.0),
+    ("favorite_actors", 1.0),
+    ("preferred_decades", 1.0),
+    ("movies_watched", 1.5),
+    ("recommended_genres_to_explore", 0.5),
+    ("viewing_mood_preferences", 0.5),
+)
+_TEXT_FIELDS = ("movie_preferences", "personality_traits", "cinematic_taste_description")
+_TEXT_WEIGHT = 0.3
+_WORD = re.compile(r"[a-zà-ÿ]{4,}")
+
+
+def _hash_feature(feature: str, dim: int) -> tuple[int, float]:
+    """Signed feature hashing: returns (bucket, sign)"""
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def vectorize_profile(profile: Profile, dim: int | None = None) -> np.ndarray:
+    """
+    Turns a profile into a normalized hashed bag-of-features vector
+
+    List fields (genres, directors, watched movies...) are weighted features
+    prefixed by their field; free-text fields contribute their words with a
+    lower weight.
+
+    Args:
+        profile: User profile
+        dim: Vector dimension
+
+    Returns:
+        np.ndarray: L2-normalized float32 vector
+    """
+    dim = dim or settings.PROFILE_ANN_DIM
+    vector = np.zeros(dim, dtype=np.float32)
+
+    for field_name, weight in _LIST_FIELDS:
+        for value in getattr(profile, field_name):
+            key = canonicalize_title(value)
+            if key:
+                bucket, sign = _hash_feature(f"{field_name}:{key}", dim)
+                vector[bucket] += sign * weight
+
+    for field_name in _TEXT_FIELDS:
+        for word in set(_WORD.findall(getattr(profile, field_name).lower())):
+            bucket, sign = _hash_feature(f"text:{word}", dim)
+            vector[bucket] += sign * _TEXT_WEIGHT
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class ProfileNeighbour:
+    """A cached profile close to the query, with its past recommendations"""
+    similarity: float
+    movies: list[Movie]
+
+
+class ProfileANNIndex:
+    """
+    Approximate nearest-neighbour index of profiles (random-hyperplane LSH)
+
+    Each of the `tables` hash tables buckets vectors by the signs of `bits`
+    random projections; candidates from the matching buckets are re-ranked
+    by exact cosine similarity. Entries expire after a TTL and the oldest are
+    evicted once the index is full.
+    """
+
+    def __init__(self, dim: int | None = None, tables: int | None = None, bits: int | None = None,
+                 max_entries: int | None = None, ttl: float | None = None, seed: int = 42):
+        self.dim = dim or settings.PROFILE_ANN_DIM
+        self.tables = tables or settings.PROFILE_ANN_TABLES
+        self.bits = bits or settings.PROFILE_ANN_BITS
+        self.max_entries = max_entries or settings.PROFILE_ANN_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else settings.PROFILE_ANN_TTL
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((self.tables, self.bits, self.dim)).astype(np.float32)
+        self.powers = (1 << np.arange(self.bits)).astype(np.int64)
+
+        self.vectors = np.zeros((self.max_entries, self.dim), dtype=np.float32)
+        self.signatures = np.zeros((self.max_entries, self.tables), dtype=np.int64)
+        self.movies: list[list[Movie] | None] = [None] * self.max_entries
+        self.created_at = np.zeros(self.max_entries, dtype=np.float64)
+        self.buckets: list[dict[int, set[int]]] = [{} for _ in range(self.tables)]
+        self.next_slot = 0
+        self.size = 0
+        self.lock = Lock()
+        self.stats = {"served": 0, "seeded": 0, "misses": 0}
+
+    def _signatures(self, vector: np.ndarray) -> np.ndarray:
+        """Computes the bucket signature of a vector in every table"""
+        bits = (self.planes @ vector) > 0
+        return bits.astype(np.int64) @ self.powers
+
+    def add(self, vector: np.ndarray, movies: list[Movie]) -> None:
+        """
+        Stores a profile vector with its recommendations (evicting the oldest if full)
+
+        Args:
+            vector: Normalized profile vector
+            movies: Recommendations generated for that profile
+        """
+        signatures = self._signatures(vector)
+        with self.lock:
+            slot = self.next_slot
+            if self.movies[slot] is not None:
+                self._remove(slot)
+            self.vectors[slot] = vector
+            self.signatures[slot] = signatures
+            self.movies[slot] = movies
+            self.created_at[slot] = time.time()
+            for table, signature in enumerate(signatures):
+                self.buckets[table].setdefault(int(signature), set()).add(slot)
+            self.next_slot = (slot + 1) % self.max_entries
+            self.size = min(self.size + 1, self.max_entries)
+
+    def _remove(self, slot: int) -> None:
+        """Removes an entry from the buckets (lock held)"""
+        for table, signature in enumerate(self.signatures[slot]):
+            bucket = self.buckets[table].get(int(signature))
+            if bucket is not None:
+                bucket.discard(slot)
+                if not bucket:
+                    del self.buckets[table][int(signature)]
+        self.movies[slot] = None
+        self.size -= 1
+
+    def query(self, vector: np.ndarray) -> ProfileNeighbour | None:
+        """
+        Finds the most similar cached profile
+
+        Args:
+            vector: Normalized profile vector
+
+        Returns:
+            ProfileNeighbour | None: Best neighbour, None if no candidate
+        """
+        signatures = self._signatures(vector)
+        now = time.time()
+        with self.lock:
+            candidates = set()
+            for table, signature in enumerate(signatures):
+                candidates |= self.buckets[table].get(int(signature), set())
+            candidates = [slot for slot in candidates if not self.ttl or now - self.created_at[slot] < self.ttl]
+            if not candidates:
+                return None
+            similarities = self.vectors[candidates] @ vector
+            best = int(np.argmax(similarities))
+            return ProfileNeighbour(similarity=float(similarities[best]), movies=self.movies[candidates[best]])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get_stats(self) -> dict:
+        """
+        Returns index statistics
+
+        Returns:
+            dict: Size, parameters and served/seeded/miss counters
+        """
+        return {
+            **self.stats,
+            "entries": self.size,
+            "tables": self.tables,
+            "bits": self.bits,
+            "serve_threshold": settings.PROFILE_ANN_SERVE_THRESHOLD,
+            "seed_threshold": settings.PROFILE_ANN_SEED_THRESHOLD,
+        }
+
+# Global index of recommended profiles
+profile_index = ProfileANNIndex()
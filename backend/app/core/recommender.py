@@ -1,7 +1,31 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from threading import Lock
+from typing import Callable
+import numpy as np
+from pydantic import ValidationError
+from app.config.settings import settings
+from app.core.collaborative import collaborative_recommender
+from app.core.precomputed import FAVORITES, PROFILE, precomputed_recommender
+from app.core.profile_index import profile_index, vectorize_profile
 from app.models.profile import Profile
-from app.models.movie import AgentMovies, Movies, Movie
+from app.models.movie import AgentMovie, AgentMovies, LeanAgentMovie, LeanAgentMovies, Movies, Movie
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
 from app.services.ai_service import ai_service
+from app.services.context_cache_service import context_cache_service
+from app.services.conversation_service import conversation_service
+from app.services.output_repair_service import output_repair_service
+from app.services.usage_service import usage_service
 from app.services.tmdb_service import tmdb_service
+from app.utils.telemetry import stage, submit_with_context
+from app.utils.lru_cache import LRUCache
+from app.utils.title_utils import canonical_title_set, canonicalize_title, dedupe_titles, normalize_query
+from app.utils.tool_budget import ToolBudget
+
+logger = logging.getLogger(__name__)
 
 class MovieRecommender:
     """Class responsible for generating movie recommendations"""
@@ -9,53 +33,435 @@ class MovieRecommender:
     def __init__(self):
         self.ai_service = ai_service
         self.tmdb_service = tmdb_service
+        self.conversation_service = conversation_service
+        self.context_cache_service = context_cache_service
+        self.collaborative_recommender = collaborative_recommender
+        self.profile_index = profile_index
+        self.precomputed_recommender = precomputed_recommender
+        # Legacy results keyed on (canonical favorites set, normalized query)
+        self.legacy_cache = LRUCache(maxsize=settings.LEGACY_CACHE_SIZE, ttl=settings.LEGACY_CACHE_TTL)
+        self.legacy_cache_stats = {"served": 0, "insufficient": 0}
+    
+    def _enrich_agent_movie(self, agent_movie: AgentMovie | LeanAgentMovie) -> Movie:
+        """
+        Enriches a single agent movie with TMDB data
+        
+        The TMDB id is resolved once per title (index of titles already seen in
+        /search, searches and details; a search only for unknown titles), then
+        the details are read by id (with credits in one cached call). Lean agent
+        movies only carry title, year and explanation: the other fields come
+        from these details.
+        
+        Args:
+            agent_movie: Movie returned by the agent
+        
+        Returns:
+            Movie: Enriched movie
+        """
+        details = self.tmdb_service.get_movie_details_by_title(agent_movie.title, agent_movie.year)
+        if isinstance(agent_movie, LeanAgentMovie):
+            fields = self.tmdb_service.extract_movie_fields(details) if details else {}
+            return Movie(
+                title=agent_movie.title,
+                why_recommended=agent_movie.why_recommended,
+                **{**fields, "year": fields.get("year") or agent_movie.year}
+            )
+        
+        movie = details or {}
+        poster_path = movie.get("poster_path")
+        
+        return Movie(
+            title=agent_movie.title,
+            year=agent_movie.year,
+            genre=agent_movie.genre,
+            director=agent_movie.director,
+            description=agent_movie.description,
+            why_recommended=agent_movie.why_recommended,
+            rating=agent_movie.rating,
+            cast=agent_movie.cast,
+            poster_path=f"{self.tmdb_service.image_base_url}{poster_path}" if poster_path else "",
+            tmdb_id=movie.get("id")
+        )
+    
+    def _make_movie_streamer(self, pool: ThreadPoolExecutor, excluded_titles: list[str],
+                             already_recommended: Callable[[str], bool] | None,
+                             excluded_ids: set[int] | None,
+                             on_result: Callable[[Movie], None]) -> tuple[Callable[[dict], None], list[Movie]]:
+        """
+        Builds the agent callback that enriches and delivers each movie while the agent writes the next ones
+        
+        Each movie reported by the agent stream is filtered on its title (watched,
+        already recommended, reported before), enriched in the pool and handed to
+        on_result unless its TMDB id is excluded. Leaving the pool waits for the
+        deliveries in flight.
+        
+        Args:
+            pool: Thread pool running the TMDB lookups
+            excluded_titles: Titles that must not be recommended (watched movies)
+            already_recommended: Optional predicate for titles recommended earlier in the session
+            excluded_ids: Optional TMDB ids that must not be recommended
+            on_result: Called with each enriched movie, from the pool threads
+        
+        Returns:
+            tuple: (callback for the agent stream, movies delivered so far, in delivery order)
+        """
+        agent_model = LeanAgentMovie if settings.LEAN_AGENT_OUTPUT else AgentMovie
+        reported = {canonicalize_title(title) for title in excluded_titles}
+        delivered: list[Movie] = []
+        lock = Lock()
+        
+        def deliver(agent_movie: AgentMovie | LeanAgentMovie) -> None:
+            movie = self._enrich_agent_movie(agent_movie)
+            if excluded_ids and movie.tmdb_id in excluded_ids:
+                return
+            with lock:
+                delivered.append(movie)
+                on_result(movie)
+        
+        def on_movie(data: dict) -> None:
+            key = canonicalize_title(str(data.get("title") or ""))
+            if not key or key in reported:
+                return
+            reported.add(key)
+            if already_recommended and already_recommended(data["title"]):
+                return
+            try:
+                agent_movie = agent_model.model_validate(data)
+            except ValidationError:
+                return
+            submit_with_context(pool, deliver, agent_movie)
+        
+        return on_movie, delivered
     
-    def _convert_agent_movies_to_movies(self, agent_movies: AgentMovies) -> Movies:
+    def _convert_agent_movies_to_movies(self, agent_movies: AgentMovies | LeanAgentMovies,
+                                        excluded_ids: set[int] | None = None) -> Movies:
         """
         Converts agent movies to enriched movies with TMDB posters
         
+        TMDB lookups for all movies run concurrently. Once resolved, movies whose
+        TMDB id is excluded (e.g. a favorite under another title) are dropped.
+        
         Args:
             agent_movies: Agent results without posters
+            excluded_ids: Optional TMDB ids that must not be recommended
         
         Returns:
-            Movies: Movies enriched with TMDB posters
+            Movies: Movies enriched with TMDB data and posters
+        """
+        if not agent_movies.movies:
+            return Movies(movies=[])
+        
+        max_workers = min(settings.TMDB_MAX_WORKERS, len(agent_movies.movies))
+        with stage("tmdb_enrichment", movies=len(agent_movies.movies)):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [submit_with_context(executor, self._enrich_agent_movie, movie) for movie in agent_movies.movies]
+                enriched_movies = [future.result() for future in futures]
+        
+        if excluded_ids:
+            enriched_movies = [movie for movie in enriched_movies if movie.tmdb_id not in excluded_ids]
+        
+        return Movies(movies=enriched_movies)
+    
+    def _output_type(self):
+        """Returns the agent output type according to the lean output setting"""
+        return output_repair_service.lenient(LeanAgentMovies if settings.LEAN_AGENT_OUTPUT else AgentMovies)
+    
+    def _filter_agent_movies(self, agent_movies: list[AgentMovie | LeanAgentMovie], excluded: set[str],
+                             already_recommended: Callable[[str], bool] | None = None,
+                             seen_before: list | None = None) -> tuple[list, list]:
+        """
+        Drops movies that are excluded (already watched, favorites) or duplicated
+        
+        Args:
+            agent_movies: Movies returned by the agent
+            excluded: Canonical titles to exclude; kept titles are added to it
+            already_recommended: Optional predicate for titles recommended earlier in the session
+            seen_before: Optional list collecting the movies rejected only because the session got them earlier
+        
+        Returns:
+            tuple: (kept movies, rejected movies)
+        """
+        kept, rejected = [], []
+        
+        for agent_movie in agent_movies:
+            key = canonicalize_title(agent_movie.title)
+            if not key or key in excluded:
+                rejected.append(agent_movie)
+                continue
+            if already_recommended and already_recommended(agent_movie.title):
+                rejected.append(agent_movie)
+                if seen_before is not None:
+                    excluded.add(key)
+                    seen_before.append(agent_movie)
+                continue
+            excluded.add(key)
+            kept.append(agent_movie)
+        
+        return kept, rejected
+    
+    async def _stream_agent(self, agent, user_query: str | list[str], message_history: list[ModelMessage] | None,
+                            on_movie: Callable[[str, str], None]):
         """
-        enriched_movies = []
+        Runs the agent with streamed model responses, reporting each movie once written
         
-        for agent_movie in agent_movies.movies:
-            poster_url = self.tmdb_service.search_movie_poster(agent_movie.title, agent_movie.year)
+        A movie is reported when the model starts writing the next one (the last
+        one when the run ends). Reports are hints: a movie may be reported again
+        or later rejected by validation.
+        
+        Args:
+            agent: Agent to run
+            user_query: Prompt
+            message_history: Optional previous conversation
+            on_movie: Called with the fields of each movie (dict) as soon as it is complete
+        
+        Returns:
+            The agent run result
+        """
+        def report(movies: list) -> None:
+            for movie in movies:
+                # Partial outputs that fail validation keep their movies as raw dicts
+                data = movie if isinstance(movie, dict) else movie.model_dump()
+                if data.get("title"):
+                    on_movie(data)
+        
+        reported = 0
+        async with agent.iter(user_query, message_history=message_history, deps=ToolBudget.from_settings()) as run:
+            async for node in run:
+                if not Agent.is_model_request_node(node):
+                    continue
+                reported = 0
+                async with node.stream(run.ctx) as response_stream:
+                    async for partial in response_stream.stream_output(debounce_by=None):
+                        movies = getattr(partial, "movies", None) or []
+                        report(movies[reported:len(movies) - 1])
+                        reported = max(reported, len(movies) - 1)
+        report(run.result.output.movies[reported:])
+        return run.result
+    
+    def _run_agent(self, agent, agent_kind: str, user_query: str | list[str], message_history: list[ModelMessage] | None = None,
+                   on_movie: Callable[[dict], None] | None = None):
+        """
+        Runs the agent synchronously, timed, traced and accounted
+        
+        Args:
+            agent: Agent to run
+            agent_kind: Agent kind for usage accounting
+            user_query: Prompt
+            message_history: Optional previous conversation
+            on_movie: Optional callback receiving the fields of each movie while the agent writes the next ones
+        
+        Returns:
+            The agent run result, its output validated (and repaired if needed)
+        """
+        with stage("agent_run", f"agent run {agent_kind}") as span:
+            if on_movie is None:
+                # Each run gets its own search tool budget (ignored by tool-less agents)
+                result = agent.run_sync(user_query, message_history=message_history, deps=ToolBudget.from_settings())
+            else:
+                result = asyncio.run(self._stream_agent(agent, user_query, message_history, on_movie))
+            usage = result.usage()
+            span.set_attribute("gen_ai.usage.input_tokens", usage.input_tokens)
+            span.set_attribute("gen_ai.usage.output_tokens", usage.output_tokens)
+        usage_service.record_run(agent_kind, result)
+        result.output = output_repair_service.finalize(result, agent_kind)
+        return result
+    
+    def _run_with_backfill(self, agent, agent_kind: str, user_query: str | list[str], excluded_titles: list[str], min_count: int,
+                           already_recommended: Callable[[str], bool] | None = None,
+                           message_history: list[ModelMessage] | None = None,
+                           on_movie: Callable[[dict], None] | None = None,
+                           seen_before: list | None = None) -> tuple[AgentMovies | LeanAgentMovies, list[ModelMessage]]:
+        """
+        Runs the agent, filters its output and asks only for the missing replacements
+        
+        The backfill continues the same conversation, so the model only generates
+        the missing movies instead of answering the whole prompt again.
+        
+        Args:
+            agent: Recommendation agent
+            agent_kind: Agent kind for usage accounting
+            user_query: Initial query (a list keeps a stable first part cacheable)
+            excluded_titles: Titles that must not be recommended
+            min_count: Minimum number of movies expected
+            already_recommended: Optional predicate for titles recommended earlier in the session
+            message_history: Optional previous conversation to continue
+            on_movie: Optional callback receiving each movie (fields) during generation, backfills included
+            seen_before: Optional list collecting the movies suppressed only by the session history
+        
+        Returns:
+            tuple: Filtered movies (completed if needed) and the full conversation messages
+        """
+        excluded = {canonicalize_title(title) for title in excluded_titles}
+        excluded.discard("")
+        
+        result = self._run_agent(agent, agent_kind, user_query, message_history, on_movie)
+        kept, rejected = self._filter_agent_movies(result.output.movies, excluded, already_recommended, seen_before)
+        
+        rounds = 0
+        while rejected and len(kept) < min_count and rounds < settings.MAX_BACKFILL_ROUNDS:
+            missing = min_count - len(kept)
+            logger.info(f"🔁 Backfill: {len(rejected)} rejected, requesting {missing} replacement(s)")
             
-            enriched_movie = Movie(
-                title=agent_movie.title,
-                year=agent_movie.year,
-                genre=agent_movie.genre,
-                director=agent_movie.director,
-                description=agent_movie.description,
-                why_recommended=agent_movie.why_recommended,
-                rating=agent_movie.rating,
-                cast=agent_movie.cast,
-                poster_path=poster_url
+            backfill_query = (
+                f"These suggestions were rejected because they were already watched, recommended or duplicated: "
+                f"{', '.join(movie.title for movie in rejected)}. "
+                f"Recommend exactly {missing} other movie(s), different from every movie mentioned so far."
             )
-            enriched_movies.append(enriched_movie)
+            result = self._run_agent(agent, agent_kind, backfill_query, result.all_messages(), on_movie)
+            new_movies, rejected = self._filter_agent_movies(result.output.movies, excluded, already_recommended, seen_before)
+            kept.extend(new_movies[:missing])
+            rounds += 1
         
-        return Movies(movies=enriched_movies)
+        return type(result.output)(movies=kept), result.all_messages()
     
-    def get_recommendations_from_profile(self, user_profile: Profile, query: str | None = None) -> Movies:
+    def _try_precomputed(self, kind: str, titles: list[str], min_count: int, profile: Profile | None = None,
+                         already_recommended: Callable[[str], bool] | None = None,
+                         excluded_ids: set[int] | None = None) -> Movies | None:
         """
-        Generates movie recommendations based on a user profile
+        Serves recommendations precomputed offline for popular favorites sets and profile archetypes
         
         Args:
-            user_profile: User's cinematic profile
-            query: Optional query to customize the search
+            kind: FAVORITES (legacy route) or PROFILE
+            titles: Favorite (or watched) movie titles
+            min_count: Minimum number of movies left after filtering
+            profile: Profile compared with the archetype (PROFILE kind)
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            excluded_ids: Optional TMDB ids that must not be recommended
         
         Returns:
-            Movies: Recommended movies with posters
+            Movies | None: Precomputed movies (posters included), or None to fall back
         """
-        # Use AI service to create the agent
-        agent = self.ai_service.create_recommendation_agent(AgentMovies)
+        with stage("precomputed_lookup") as span:
+            movies = self.precomputed_recommender.lookup(kind, titles, profile)
+            span.set_attribute("precomputed.served", movies is not None)
+        if movies is None:
+            return None
+        
+        movies = [
+            movie for movie in movies
+            if not (excluded_ids and movie.tmdb_id in excluded_ids)
+            and not (already_recommended and already_recommended(movie.title))
+        ]
+        if len(movies) < min_count:
+            return None
+        
+        logger.info(f"📦 Precomputed fast path served {len(movies)} movies ({kind})")
+        return Movies(movies=movies)
+    
+    def _try_collaborative(self, favorites: list[str], count: int,
+                           already_recommended: Callable[[str], bool] | None = None,
+                           excluded_ids: set[int] | None = None) -> Movies | None:
+        """
+        Serves recommendations from the item-item model when it covers the favorites well
+        
+        Args:
+            favorites: Favorite movie titles
+            count: Number of movies wanted
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            excluded_ids: Optional TMDB ids that must not be recommended
+        
+        Returns:
+            Movies | None: Enriched movies, or None to fall back to the LLM
+        """
+        with stage("cf_lookup") as span:
+            matches = self.collaborative_recommender.recommend(favorites, count, already_recommended)
+            span.set_attribute("cf.served", matches is not None)
+        
+        if matches is None:
+            return None
         
-        # Build the query based on the profile
-        profile_summary = f"""
+        logger.info(f"🧩 Collaborative fast path served {len(matches)} movies")
+        agent_movies = LeanAgentMovies(movies=[
+            LeanAgentMovie(
+                title=match.title,
+                why_recommended=f"Often loved by viewers who also liked {' and '.join(match.because_of)}."
+            )
+            for match in matches
+        ])
+        return self._convert_agent_movies_to_movies(agent_movies, excluded_ids)
+    
+    def _try_profile_neighbour(self, vector: np.ndarray, excluded_titles: list[str],
+                               already_recommended: Callable[[str], bool] | None = None,
+                               excluded_ids: set[int] | None = None) -> tuple[Movies | None, list[str]]:
+        """
+        Reuses the recommendations of the most similar profile seen recently
+        
+        Above the serve threshold the neighbour's movies are returned directly
+        (minus watched/already recommended ones); above the seed threshold their
+        titles are only suggested to the agent as candidates.
+        
+        Args:
+            vector: Profile vector
+            excluded_titles: Titles that must not be recommended (watched movies)
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            excluded_ids: Optional TMDB ids that must not be recommended
+        
+        Returns:
+            tuple: (Movies to serve or None, candidate titles to seed the agent with)
+        """
+        with stage("profile_ann_lookup") as span:
+            neighbour = self.profile_index.query(vector)
+            span.set_attribute("profile_ann.similarity", neighbour.similarity if neighbour else 0.0)
+        
+        if neighbour is None or neighbour.similarity < settings.PROFILE_ANN_SEED_THRESHOLD:
+            self.profile_index.stats["misses"] += 1
+            return None, []
+        
+        excluded = {canonicalize_title(title) for title in excluded_titles}
+        movies = [
+            movie for movie in neighbour.movies
+            if canonicalize_title(movie.title) not in excluded
+            and not (excluded_ids and movie.tmdb_id in excluded_ids)
+            and not (already_recommended and already_recommended(movie.title))
+        ]
+        
+        if neighbour.similarity >= settings.PROFILE_ANN_SERVE_THRESHOLD and len(movies) >= settings.MIN_PROFILE_RECOMMENDATIONS:
+            self.profile_index.stats["served"] += 1
+            logger.info(f"🧭 Served {len(movies)} movies from a similar profile (similarity {neighbour.similarity:.2f})")
+            return Movies(movies=movies), []
+        
+        self.profile_index.stats["seeded"] += 1
+        return None, [movie.title for movie in movies[:settings.PROFILE_ANN_SEED_TITLES]]
+    
+    def _build_seed_hint(self, seed_titles: list[str]) -> str:
+        """
+        Builds a prompt hint listing movies enjoyed by a very similar profile
+        
+        Args:
+            seed_titles: Candidate titles from the nearest profile
+        
+        Returns:
+            str: Hint to append to the query, or empty string
+        """
+        if not seed_titles:
+            return ""
+        return f"\n\nA very similar profile was recommended: {', '.join(seed_titles)}. Keep those that fit this profile and complete the list."
+    
+    def _build_avoid_hint(self, avoid_titles: list[str] | None) -> str:
+        """
+        Builds a short prompt hint listing recently recommended movies
+        
+        Args:
+            avoid_titles: Bounded list of recently recommended titles
+        
+        Returns:
+            str: Hint to append to the query, or empty string
+        """
+        if not avoid_titles:
+            return ""
+        return f"\n\nAlready recommended recently, do not suggest again: {', '.join(avoid_titles)}."
+    
+    def _build_profile_summary(self, user_profile: Profile) -> str:
+        """
+        Builds the profile block sent to the recommendation agent
+        
+        Args:
+            user_profile: User's cinematic profile
+        
+        Returns:
+            str: Profile summary
+        """
+        return f"""
 Profile:
 - Movies watched: {', '.join(user_profile.movies_watched) if user_profile.favorite_genres else 'Not specified'}
 - Favorite genres: {', '.join(user_profile.favorite_genres) if user_profile.favorite_genres else 'Not specified'}
@@ -68,43 +474,238 @@ Profile:
 - Genres to explore: {', '.join(user_profile.recommended_genres_to_explore) if user_profile.recommended_genres_to_explore else 'Not specified'}
 - Mood preferences: {', '.join(user_profile.viewing_mood_preferences) if user_profile.viewing_mood_preferences else 'Not specified'}
 """
+    
+    def get_recommendations_from_profile(self, user_profile: Profile, query: str | None = None,
+                                         already_recommended: Callable[[str], bool] | None = None,
+                                         avoid_titles: list[str] | None = None,
+                                         conversation_key: str | None = None,
+                                         page: int = 1,
+                                         on_result: Callable[[Movie], None] | None = None) -> Movies:
+        """
+        Generates movie recommendations based on a user profile
         
-        if query:
-            user_query = f"{profile_summary}\n\nSpecific query: {query}\n\nBased on this detailed profile, recommend perfectly suited movies."
+        When a conversation key is given and a conversation exists, follow-up
+        queries and pages > 1 continue it: the profile and previous suggestions
+        are already in the history, only a short follow-up prompt is added.
+        
+        Args:
+            user_profile: User's cinematic profile
+            query: Optional query to customize the search
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            avoid_titles: Optional bounded list of recent titles hinted to the agent
+            conversation_key: Optional key of the conversation to continue/store
+            page: Results page, pages > 1 ask for more movies like the previous ones
+            on_result: Optional callback receiving each movie as soon as it is enriched and passes the
+                filters, while the agent writes the next ones (fast-path results are only returned)
+        
+        Returns:
+            Movies: Recommended movies with posters (those given to on_result first, in delivery order)
+        """
+        # Fast paths: well-covered watched lists are served by the collaborative model,
+        # near-identical profiles reuse the recommendations of their neighbour
+        vector = None
+        seed_titles: list[str] = []
+        watched_ids = {tmdb_id for tmdb_id in user_profile.watched_tmdb_ids if tmdb_id}
+        if not query and page == 1:
+            movies = self._try_precomputed(PROFILE, user_profile.movies_watched, settings.MIN_PROFILE_RECOMMENDATIONS,
+                                           user_profile, already_recommended, watched_ids)
+            if movies is not None:
+                return movies
+            
+            movies = self._try_collaborative(user_profile.movies_watched, settings.MIN_PROFILE_RECOMMENDATIONS,
+                                             already_recommended, watched_ids)
+            if movies is not None:
+                return movies
+            
+            if settings.PROFILE_ANN_ENABLED:
+                vector = vectorize_profile(user_profile)
+                movies, seed_titles = self._try_profile_neighbour(vector, user_profile.movies_watched,
+                                                                  already_recommended, watched_ids)
+                if movies is not None:
+                    return movies
+        
+        # Use AI service to create the agent
+        agent = self.ai_service.create_recommendation_agent(self._output_type())
+        
+        history = None
+        if conversation_key and (query or page > 1):
+            history = self.conversation_service.get_history(conversation_key)
+        
+        # The profile block is sent as a separate first part so it can be context-cached
+        profile_summary = self._build_profile_summary(user_profile)
+        
+        if history:
+            # Continue the existing conversation with a short follow-up prompt
+            if query:
+                user_query = f"Follow-up request: {query}\n\nRecommend movies matching this request for the same profile, different from all movies suggested so far."
+            else:
+                user_query = "More like this: recommend other movies in the same spirit, different from all movies suggested so far."
+            user_query += self._build_avoid_hint(avoid_titles)
         else:
-            user_query = f"{profile_summary}\n\nBased on this detailed cinematic profile, recommend movies that perfectly match this user's tastes and personality."
+            if query:
+                request_part = f"Specific query: {query}\n\nBased on this detailed profile, recommend perfectly suited movies."
+            else:
+                request_part = "Based on this detailed cinematic profile, recommend movies that perfectly match this user's tastes and personality."
+            user_query = [profile_summary, request_part + self._build_seed_hint(seed_titles) + self._build_avoid_hint(avoid_titles)]
+        
+        # Run the agent, drop watched/duplicated movies and backfill; when streaming, movies are
+        # delivered as they are written and leaving the pool waits for the deliveries in flight
+        with ThreadPoolExecutor(max_workers=settings.TMDB_MAX_WORKERS) if on_result else nullcontext() as stream_pool:
+            on_movie, delivered = None, []
+            if stream_pool is not None:
+                on_movie, delivered = self._make_movie_streamer(
+                    stream_pool, user_profile.movies_watched, already_recommended, watched_ids, on_result
+                )
+            with self.context_cache_service.scope("recommendation", profile_summary):
+                agent_movies, messages = self._run_with_backfill(
+                    agent, "recommendation", user_query, user_profile.movies_watched, settings.MIN_PROFILE_RECOMMENDATIONS,
+                    already_recommended, history, on_movie
+                )
+        
+        if conversation_key:
+            self.conversation_service.save_history(conversation_key, messages)
         
-        # Run the agent and retrieve results
-        result = agent.run_sync(user_query)
+        # Convert and enrich with TMDB posters (cache hits for the movies already delivered)
+        movies = self._convert_agent_movies_to_movies(agent_movies, watched_ids)
+        if delivered:
+            # Delivered movies stay (the client has them); validation may have added others
+            delivered_keys = {canonicalize_title(movie.title) for movie in delivered}
+            movies = Movies(movies=delivered + [
+                movie for movie in movies.movies if canonicalize_title(movie.title) not in delivered_keys
+            ])
         
-        # Convert and enrich with TMDB posters
-        return self._convert_agent_movies_to_movies(result.output)
+        # Index default recommendations so similar profiles can reuse them
+        if vector is not None and len(movies.movies) >= settings.MIN_PROFILE_RECOMMENDATIONS:
+            self.profile_index.add(vector, movies.movies)
+        
+        return movies
     
-    def get_recommendations_legacy(self, liked_movies: list[str], query: str | None = None) -> Movies:
+    def get_recommendations_legacy(self, liked_movies: list[str], query: str | None = None,
+                                   already_recommended: Callable[[str], bool] | None = None,
+                                   avoid_titles: list[str] | None = None,
+                                   liked_movie_ids: list[int] | None = None) -> Movies:
         """
         Compatibility method for the old approach based on a movie list
         
         Args:
             liked_movies: List of movies liked by the user
             query: Optional query
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            avoid_titles: Optional bounded list of recent titles hinted to the agent
+            liked_movie_ids: Optional TMDB ids of the liked movies (selected via /search)
         
         Returns:
             Movies: Recommended movies with posters
         """
+        liked_ids = set(liked_movie_ids or [])
+        # "Inception", "inception (2010)" and "  Inception " are the same favorite
+        liked_movies = dedupe_titles(liked_movies)
+        cache_key = (canonical_title_set(liked_movies), normalize_query(query))
+        
+        movies = self._try_legacy_cache(cache_key, already_recommended, liked_ids)
+        if movies is not None:
+            return movies
+        
+        # Fast paths: popular favorites sets are precomputed, well-covered ones are served by the collaborative model
+        if not query:
+            movies = self._try_precomputed(FAVORITES, liked_movies, settings.MIN_LEGACY_RECOMMENDATIONS,
+                                           already_recommended=already_recommended, excluded_ids=liked_ids)
+            if movies is not None:
+                return movies
+            
+            # Computed without this session's history so the cached result suits every session
+            movies = self._try_collaborative(liked_movies, settings.MIN_LEGACY_RECOMMENDATIONS, excluded_ids=liked_ids)
+            if movies is not None:
+                self.legacy_cache.set(cache_key, movies.movies)
+                served = self._filter_movies(movies.movies, already_recommended)
+                if len(served) >= settings.MIN_LEGACY_RECOMMENDATIONS:
+                    return Movies(movies=served)
+        
         # Use AI service to create the legacy agent
-        agent = self.ai_service.create_legacy_recommendation_agent(AgentMovies)
+        agent = self.ai_service.create_legacy_recommendation_agent(self._output_type())
         
         # Build the query
         if query:
             user_query = f"Here are the movies I like: {', '.join(liked_movies)}. {query}"
         else:
             user_query = f"Here are the movies I like: {', '.join(liked_movies)}. Can you suggest similar movies?"
+        user_query += self._build_avoid_hint(avoid_titles)
         
-        # Run the agent and retrieve results
-        result = agent.run_sync(user_query)
+        # Run the agent, drop favorites/duplicated movies and backfill
+        seen_before: list[AgentMovie | LeanAgentMovie] = []
+        with self.context_cache_service.scope("legacy_recommendation"):
+            agent_movies, _ = self._run_with_backfill(
+                agent, "legacy_recommendation", user_query, liked_movies, settings.MIN_LEGACY_RECOMMENDATIONS,
+                already_recommended, seen_before=seen_before
+            )
         
-        # Convert and enrich with TMDB posters
-        return self._convert_agent_movies_to_movies(result.output)
+        # Convert and enrich with TMDB posters; the cache also keeps the movies suppressed only by
+        # this session's history (each caller's own history is applied when reading it)
+        movies = self._convert_agent_movies_to_movies(
+            type(agent_movies)(movies=agent_movies.movies + seen_before), liked_ids
+        )
+        self.legacy_cache.set(cache_key, movies.movies)
+        return Movies(movies=self._filter_movies(movies.movies, already_recommended))
+    
+    def _try_legacy_cache(self, cache_key: tuple, already_recommended: Callable[[str], bool] | None = None,
+                          excluded_ids: set[int] | None = None) -> Movies | None:
+        """
+        Serves a legacy result computed earlier for the same favorites set and query
+        
+        Args:
+            cache_key: (canonical favorites set, normalized query)
+            already_recommended: Optional predicate to suppress movies recommended earlier
+            excluded_ids: Optional TMDB ids that must not be recommended
+        
+        Returns:
+            Movies | None: Cached movies still worth serving, or None to compute them
+        """
+        with stage("legacy_cache_lookup") as span:
+            cached = self.legacy_cache.get(cache_key)
+            span.set_attribute("legacy_cache.hit", cached is not None)
+        if cached is None:
+            return None
+        
+        movies = self._filter_movies(cached, already_recommended, excluded_ids)
+        # The session already got most of these movies: compute new ones
+        if len(movies) < settings.MIN_LEGACY_RECOMMENDATIONS:
+            self.legacy_cache_stats["insufficient"] += 1
+            return None
+        
+        self.legacy_cache_stats["served"] += 1
+        logger.info(f"♻️ Legacy cache served {len(movies)} movies")
+        return Movies(movies=movies)
+    
+    def _filter_movies(self, movies: list[Movie], already_recommended: Callable[[str], bool] | None = None,
+                       excluded_ids: set[int] | None = None) -> list[Movie]:
+        """
+        Applies a caller's filters to movies computed for any session
+        
+        Args:
+            movies: Enriched movies
+            already_recommended: Optional predicate for titles recommended earlier in the session
+            excluded_ids: Optional TMDB ids that must not be recommended
+        
+        Returns:
+            list: Movies left, in order
+        """
+        return [
+            movie for movie in movies
+            if not (excluded_ids and movie.tmdb_id in excluded_ids)
+            and not (already_recommended and already_recommended(movie.title))
+        ]
+    
+    def get_legacy_cache_stats(self) -> dict:
+        """
+        Returns statistics of the legacy result cache
+        
+        Returns:
+            dict: LRU statistics (size, hits, misses, hit rate) and served/insufficient counters
+        """
+        stats = {**self.legacy_cache.stats(), **self.legacy_cache_stats}
+        lookups = stats["hits"] + stats["misses"]
+        stats["served_rate"] = round(stats["served"] / lookups, 4) if lookups else 0.0
+        return stats
 
 # Global instance of the recommender
 movie_recommender = MovieRecommender()
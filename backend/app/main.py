@@ -1,24 +1,59 @@
-from fastapi import FastAPI, Query, Request, HTTPException
+from fastapi import Depends, FastAPI, Header, Query, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from starlette.middleware.sessions import SessionMiddleware
 import os
+import functools
+import hmac
+import json
+import queue
 import requests
 import logging
 import time
 import uuid
 from dotenv import load_dotenv
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 
 
 from app.core.recommender import MovieRecommender
 from app.core.profile_creator import ProfileCreator
-from app.models.profile import Profile
-from app.services.profile_service import ProfileService
+from app.core.batch_recommender import batch_recommender
+from app.models.movie import FavoriteMovie, Movie
+from app.models.batch import BatchItem
+from app.models.profile import Profile, ProfileRecord
+from app.services.profile_service import (
+    ProfileService, profile_etags_by_session, profiles_by_session, recommendations_by_session,
+)
+from app.services.conversation_service import conversation_service
+from app.services.usage_service import USAGE_WINDOWS, usage_service
+from app.services.context_cache_service import context_cache_service
+from app.services.output_repair_service import output_repair_service
+from app.services.favorites_store import favorites_store
+from app.services.tmdb_service import tmdb_service
+from app.core.collaborative import collaborative_recommender
+from app.core.precomputed import precomputed_recommender
+from app.core.profile_index import profile_index
+from app.services.ai_service import ai_service
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelRequest, ModelResponse
 from app.utils.session_utils import get_or_create_session_id, get_session_id
 from app.config.settings import settings
+from app.utils.hashing import content_hash
+from app.utils.http_cache import conditional_response, etag_precondition_failed, tagged_response
+from app.utils.ndjson import aiter_lines
+from app.utils.admission import AdmissionMiddleware, admission_controller
+from app.utils.compact_profile import CompactProfile
+from app.utils.memory_diagnostics import GROUP_BY, memory_diagnostics
+from app.utils.telemetry import (
+    TimedRoute, configure_tracing, end_request, get_request_context, stage, start_request, submit_with_context,
+    tracer,
+)
+from opentelemetry.trace import SpanKind
 
 # Configuration du logging pour FastAPI
 logging.basicConfig(
@@ -30,6 +65,11 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 app = FastAPI()
+app.router.route_class = TimedRoute
+configure_tracing()
+
+# Contrôle d'admission (ajouté avant SessionMiddleware pour s'exécuter à l'intérieur et connaître la session)
+app.add_middleware(AdmissionMiddleware)
 
 # Configuration du middleware de session
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
@@ -39,18 +79,46 @@ movie_recommender = MovieRecommender()
 profile_creator = ProfileCreator()
 profile_service = ProfileService()
 
+# Structures mesurées par le diagnostic mémoire (/debug/memory)
+memory_diagnostics.register("profiles_by_session", lambda: profiles_by_session)
+memory_diagnostics.register("profile_etags_by_session", lambda: profile_etags_by_session)
+memory_diagnostics.register("recommendations_by_session", lambda: recommendations_by_session)
+memory_diagnostics.register("conversation_cache", lambda: conversation_service.conversations)
+memory_diagnostics.register("tmdb_caches", lambda: (tmdb_service.search_cache, tmdb_service.details_cache, tmdb_service.id_index))
+memory_diagnostics.register("legacy_cache", lambda: movie_recommender.legacy_cache)
+memory_diagnostics.register("context_cache", lambda: (context_cache_service.handles, context_cache_service.too_small))
+memory_diagnostics.register("profile_index", lambda: profile_index)
+memory_diagnostics.register("collaborative_model", lambda: collaborative_recommender.model)
+memory_diagnostics.register("precomputed", lambda: precomputed_recommender.entries)
+memory_diagnostics.register("usage_buckets", lambda: usage_service.buckets)
+memory_diagnostics.register("agent_model", lambda: ai_service.model)
+
+# Types dont les instances vivantes sont comptées (une croissance continue signale une fuite)
+MEMORY_LIVE_TYPES = (Agent, ModelRequest, ModelResponse, Profile, CompactProfile, Movie)
+
 # Modèles Pydantic pour les requêtes
 class RecommendationRequest(BaseModel):
-    favorites: list[str]
+    favorites: list[str | FavoriteMovie]
     query: Optional[str] = None
 
 class ProfileCreateRequest(BaseModel):
-    favorite_movies: list[str]
+    favorite_movies: list[str | FavoriteMovie]
 
 
 class ProfileRecommendationRequest(BaseModel):
     profile: Profile
     custom_query: Optional[str] = None
+    profile_id: Optional[str] = None
+    page: int = Field(1, ge=1)
+
+class ProfileFavoritesUpdateRequest(BaseModel):
+    added: list[str | FavoriteMovie] = []
+    removed: list[str | FavoriteMovie] = []
+
+class BatchRecommendationRequest(BaseModel):
+    items: list[BatchItem] = Field(..., max_length=settings.BATCH_MAX_ITEMS)
+    # Identifiants déjà reçus lors d'un appel précédent interrompu
+    skip_ids: list[str] = []
 
 # CORS
 origins = [settings.FRONTEND_URL]
@@ -60,8 +128,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After", "ETag"],
 )
 
+@app.middleware("http")
+async def request_timing_middleware(request: Request, call_next):
+    """
+    Trace racine de la requête et en-tête Server-Timing avec le détail des étapes
+    
+    Pas de Server-Timing pour les réponses diffusées : les en-têtes partent avant
+    l'exécution du générateur, les étapes coûteuses n'y figureraient pas. Le flux
+    /profile/create-and-recommend envoie ses mesures dans son événement "done".
+    """
+    context, token = start_request(request.url.path)
+    try:
+        with tracer.start_as_current_span(f"{request.method} {request.url.path}", kind=SpanKind.SERVER) as span:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            if route is not None:
+                span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.status_code", response.status_code)
+    finally:
+        end_request(token)
+    
+    if not context.streaming:
+        response.headers["Server-Timing"] = context.server_timing_header()
+        response.headers["Timing-Allow-Origin"] = settings.FRONTEND_URL
+    return response
+
 # Force le chemin vers le .env
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -69,6 +163,123 @@ load_dotenv(dotenv_path=env_path)
 TMDB_API_KEY = settings.TMDB_API_KEY
 TMDB_BASE_URL = settings.TMDB_BASE_URL
 
+def check_token_budget(session_id: str) -> None:
+    """
+    Refuse la requête si la session a dépassé son budget de tokens LLM
+    
+    Args:
+        session_id: Identifiant de session
+        
+    Raises:
+        HTTPException: 429 si le budget est dépassé
+    """
+    if usage_service.is_over_budget(session_id):
+        logger.warning(f"💸 Token budget exceeded for session {session_id}")
+        raise HTTPException(status_code=429, detail="Token budget exceeded for this session, try again later")
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Réserve un endpoint d'administration aux porteurs du jeton ADMIN_TOKEN (en-tête X-Admin-Token)
+    
+    Raises:
+        HTTPException: 403 si le jeton est absent, invalide ou non configuré
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def split_favorites(favorites: list[str | FavoriteMovie]) -> tuple[list[str], list[int]]:
+    """
+    Sépare les favoris reçus en titres et identifiants TMDB
+    
+    Les favoris peuvent être de simples titres (anciens clients) ou des
+    FavoriteMovie issus de /search avec leur identifiant TMDB.
+    
+    Args:
+        favorites: Favoris de la requête
+        
+    Returns:
+        tuple: (titres, identifiants TMDB connus)
+    """
+    titles, tmdb_ids = [], []
+    for favorite in favorites:
+        if isinstance(favorite, FavoriteMovie):
+            titles.append(favorite.title)
+            if favorite.tmdb_id is not None:
+                tmdb_ids.append(favorite.tmdb_id)
+        else:
+            titles.append(favorite)
+    return titles, tmdb_ids
+
+def create_and_save_profile(session_id: str, favorite_movies: list[str | FavoriteMovie]) -> tuple[str, Profile]:
+    """
+    Crée le profil d'un utilisateur à partir de ses favoris et le range dans sa session
+    
+    Args:
+        session_id: Identifiant de session
+        favorite_movies: Favoris de la requête
+        
+    Returns:
+        tuple: (identifiant du profil, profil)
+    """
+    favorite_titles, _ = split_favorites(favorite_movies)
+    favorites_store.record(favorite_titles, "profile_create", session_id)
+    
+    logger.info(f"🚀 Starting profile creation process...")
+    user_profile = profile_creator.create_user_profile(
+        favorite_movies=favorite_movies,
+    )
+    
+    # Générer un ID unique pour ce profil et le sauvegarder dans la session
+    profile_id = profile_service.generate_profile_id()
+    profile_service.save_profile(session_id, profile_id, user_profile)
+    return profile_id, user_profile
+
+def check_profile_precondition(http_request: Request, session_id: str, profile_id: str) -> None:
+    """
+    Refuse la modification d'un profil changé depuis que le client l'a lu (en-tête If-Match)
+    
+    Raises:
+        HTTPException: 412 si l'ETag envoyé n'est plus celui du profil
+    """
+    etag = f'"{profile_service.get_profile_etag(session_id, profile_id)}"'
+    if etag_precondition_failed(http_request, etag):
+        logger.warning(f"⚠️ Stale If-Match for profile {profile_id}")
+        raise HTTPException(status_code=412, detail="Profile was modified since it was read, reload it and retry")
+
+def build_conversation_key(session_id: str, profile: Profile, profile_id: Optional[str] = None) -> str:
+    """Clé de conversation d'un profil : un profil modifié démarre une nouvelle conversation"""
+    profile_key = content_hash(profile)
+    if profile_id:
+        profile_key = f"{profile_id}:{profile_key}"
+    return conversation_service.build_key(session_id, profile_key)
+
+def parse_profile_fields(fields: Optional[str]) -> Optional[set[str]]:
+    """
+    Lit le paramètre de projection fields= (noms de champs du profil séparés par des virgules)
+    
+    Args:
+        fields: Valeur du paramètre, None pour le profil complet
+        
+    Returns:
+        set: Champs demandés, ou None pour tous
+        
+    Raises:
+        HTTPException: 400 si un champ est inconnu
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(Profile.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown profile fields: {', '.join(sorted(unknown))}")
+    return requested
+
+def project_profile(profile: Profile, fields: Optional[set[str]]) -> Profile | dict:
+    """Restreint le profil aux champs demandés (profil complet si fields vaut None)"""
+    return profile if fields is None else profile.model_dump(include=fields)
+
 @app.get("/ping")
 def ping():
     return {"message": "pong"}
@@ -78,33 +289,24 @@ def search_movies(query: str = Query(..., min_length=1)):
     """Recherche films ou séries via TMDB"""
     logger.info(f"🔍 API CALL - /search: query='{query}'")
     
-    url = f"{TMDB_BASE_URL}/search/multi"
-    params = {
-        "api_key": TMDB_API_KEY,
-        "query": query,
-        "language": "fr-FR"  # ou "en-US"
-    }
-    
-    logger.debug(f"📤 TMDB Request: {url}")
-    logger.debug(f"📤 Params: {params}")
-    
     start_time = time.time()
-    response = requests.get(url, params=params)
+    try:
+        # Passe par le client TMDB : limite de concurrence adaptative et reprise sur 429
+        tmdb_results = tmdb_service.search_multi(query)
+    except requests.RequestException as e:
+        logger.error(f"❌ TMDB API Error: {e}")
+        return {"error": "TMDB API error"}
     end_time = time.time()
     
     logger.info(f"⏱️ TMDB Response Time: {end_time - start_time:.2f}s")
-    logger.debug(f"📥 TMDB Status: {response.status_code}")
+    logger.debug(f"📥 TMDB Raw Results: {len(tmdb_results)} items")
     
-    if response.status_code != 200:
-        logger.error(f"❌ TMDB API Error: {response.status_code}")
-        return {"error": "TMDB API error"}
-    
-    data = response.json()
-    logger.debug(f"📥 TMDB Raw Results: {len(data.get('results', []))} items")
+    # Les films choisis ici seront désignés par leur titre ensuite : indexer leurs identifiants
+    tmdb_service.remember_search_results(tmdb_results)
     
     # On ne garde que les champs utiles
     results = []
-    for item in data.get("results", []):
+    for item in tmdb_results:
         results.append({
             "id": item.get("id"),
             "title": item.get("title") or item.get("name"),
@@ -120,12 +322,13 @@ def search_movies(query: str = Query(..., min_length=1)):
     return results
 
 @app.post("/recommendations")
-def get_recommendations(request: RecommendationRequest):
+def get_recommendations(request: RecommendationRequest, http_request: Request):
     """
     Obtient des recommandations de films basées sur les favoris de l'utilisateur
     
     Args:
         request: Requête contenant les favoris et la requête optionnelle
+        http_request: Requête HTTP pour la gestion de session
     
     Returns:
         Recommandations de films structurées
@@ -137,8 +340,20 @@ def get_recommendations(request: RecommendationRequest):
     start_time = time.time()
     
     try:
+        session_id = get_or_create_session_id(http_request)
+        check_token_budget(session_id)
+        favorite_titles, favorite_ids = split_favorites(request.favorites)
+        favorites_store.record(favorite_titles, "recommendations", session_id)
+        
         logger.info(f"🚀 Starting AI recommendation process...")
-        recommendations = movie_recommender.get_recommendations_legacy(request.favorites, request.query)
+        recommendations = movie_recommender.get_recommendations_legacy(
+            favorite_titles,
+            request.query,
+            already_recommended=lambda title: profile_service.was_recommended(session_id, title),
+            avoid_titles=profile_service.get_recent_recommendations(session_id),
+            liked_movie_ids=favorite_ids
+        )
+        profile_service.record_recommendations(session_id, [movie.title for movie in recommendations.movies])
         
         end_time = time.time()
         logger.info(f"⏱️ Total API Processing Time: {end_time - start_time:.2f}s")
@@ -146,6 +361,8 @@ def get_recommendations(request: RecommendationRequest):
         
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         end_time = time.time()
         logger.error(f"❌ RECOMMENDATIONS API ERROR after {end_time - start_time:.2f}s")
@@ -174,17 +391,8 @@ def create_user_profile_api(request: ProfileCreateRequest, http_request: Request
     try:
         # Récupérer ou créer une session
         session_id = get_or_create_session_id(http_request)
-        
-        logger.info(f"🚀 Starting profile creation process...")
-        user_profile = profile_creator.create_user_profile(
-            favorite_movies=request.favorite_movies,
-        )
-        
-        # Générer un ID unique pour ce profil
-        profile_id = profile_service.generate_profile_id()
-        
-        # Sauvegarder le profil dans la session
-        profile_service.save_profile(session_id, profile_id, user_profile)
+        check_token_budget(session_id)
+        profile_id, user_profile = create_and_save_profile(session_id, request.favorite_movies)
         
         end_time = time.time()
         logger.info(f"⏱️ Profile Creation Time: {end_time - start_time:.2f}s")
@@ -199,6 +407,8 @@ def create_user_profile_api(request: ProfileCreateRequest, http_request: Request
             "profile": user_profile
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         end_time = time.time()
         logger.error(f"❌ PROFILE CREATION ERROR after {end_time - start_time:.2f}s")
@@ -207,13 +417,88 @@ def create_user_profile_api(request: ProfileCreateRequest, http_request: Request
         
         return {"error": f"Erreur lors de la création du profil: {str(e)}"}
 
+@app.post("/profile/create-and-recommend")
+def create_profile_and_recommend(request: ProfileCreateRequest, http_request: Request):
+    """
+    Crée le profil puis enchaîne les recommandations, en un seul appel diffusé en NDJSON
+    
+    Lignes envoyées : {"event": "profile", "profile_id", "profile"} dès que le
+    profil est prêt, puis {"event": "movie", "movie"} pour chaque recommandation et
+    {"event": "done", "count", "timings"} ({"event": "error", "step", "error"} en cas
+    d'échec, step valant "profile" ou "recommendations") ; timings remplace l'en-tête
+    Server-Timing, envoyé avant l'exécution du flux. Chaque film est envoyé dès qu'il
+    est enrichi et filtré, pendant que l'agent écrit les suivants.
+    
+    Args:
+        request: Requête contenant les films favoris
+        http_request: Requête HTTP pour la gestion de session
+    
+    Returns:
+        StreamingResponse NDJSON
+    """
+    logger.info(f"🔗 API CALL - /profile/create-and-recommend")
+    logger.info(f"📝 Favorite movies: {request.favorite_movies}")
+    
+    # Erreurs de session et de budget en HTTP, avant le début du flux
+    session_id = get_or_create_session_id(http_request)
+    check_token_budget(session_id)
+    
+    def stream_events():
+        start_time = time.time()
+        step = "profile"
+        try:
+            profile_id, user_profile = create_and_save_profile(session_id, request.favorite_movies)
+            logger.info(f"⏱️ Profile ready after {time.time() - start_time:.2f}s")
+            yield json.dumps({
+                "event": "profile", "profile_id": profile_id, "profile": user_profile.model_dump(mode="json")
+            }, ensure_ascii=False) + "\n"
+            
+            step = "recommendations"
+            # Les films arrivent du pool d'enrichissement pendant que l'agent écrit les suivants
+            ready: "queue.Queue[Optional[Movie]]" = queue.Queue()
+            recommend = functools.partial(
+                movie_recommender.get_recommendations_from_profile,
+                user_profile,
+                already_recommended=lambda title: profile_service.was_recommended(session_id, title),
+                avoid_titles=profile_service.get_recent_recommendations(session_id),
+                conversation_key=build_conversation_key(session_id, user_profile, profile_id),
+                on_result=ready.put,
+            )
+            sent = set()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                future = submit_with_context(executor, recommend)
+                future.add_done_callback(lambda _: ready.put(None))
+                while (movie := ready.get()) is not None:
+                    sent.add(id(movie))
+                    yield json.dumps({"event": "movie", "movie": movie.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+                recommendations = future.result()
+            
+            profile_service.record_recommendations(session_id, [movie.title for movie in recommendations.movies])
+            # Résultats des chemins rapides, rendus d'un bloc
+            for movie in recommendations.movies:
+                if id(movie) not in sent:
+                    yield json.dumps({"event": "movie", "movie": movie.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+            
+            logger.info(f"⏱️ Profile + Recommendations Time: {time.time() - start_time:.2f}s")
+            logger.info(f"✅ PROFILE AND RECOMMENDATIONS SUCCESS")
+            context = get_request_context()
+            timings = context.as_dict() if context else {}
+            yield json.dumps({"event": "done", "count": len(recommendations.movies), "timings": timings}) + "\n"
+        except Exception as e:
+            logger.error(f"❌ PROFILE AND RECOMMENDATIONS ERROR ({step}) after {time.time() - start_time:.2f}s")
+            logger.exception("Full error traceback:")
+            yield json.dumps({"event": "error", "step": step, "error": str(e)}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
 @app.post("/recommendations/from-profile")
-def get_recommendations_from_profile(request: ProfileRecommendationRequest):
+def get_recommendations_from_profile(request: ProfileRecommendationRequest, http_request: Request):
     """
     Génère des recommandations basées sur un profil utilisateur existant
     
     Args:
         request: Requête contenant le profil utilisateur et une requête personnalisée optionnelle
+        http_request: Requête HTTP pour la gestion de session
     
     Returns:
         Recommandations de films personnalisées basées sur le profil
@@ -221,19 +506,34 @@ def get_recommendations_from_profile(request: ProfileRecommendationRequest):
     logger.info(f"🎯 API CALL - /recommendations/from-profile")
     logger.info(f"🎬 Profile genres: {request.profile.favorite_genres}")
     logger.info(f"💭 Custom query: {request.custom_query}")
+    logger.info(f"📄 Page: {request.page}")
     
     start_time = time.time()
     
     try:
+        session_id = get_or_create_session_id(http_request)
+        check_token_budget(session_id)
+        conversation_key = build_conversation_key(session_id, request.profile, request.profile_id)
+        
         logger.info(f"🚀 Starting profile-based recommendation process...")
 
-        recommendations = movie_recommender.get_recommendations_from_profile(request.profile,request.custom_query)
+        recommendations = movie_recommender.get_recommendations_from_profile(
+            request.profile,
+            request.custom_query,
+            already_recommended=lambda title: profile_service.was_recommended(session_id, title),
+            avoid_titles=profile_service.get_recent_recommendations(session_id),
+            conversation_key=conversation_key,
+            page=request.page
+        )
+        profile_service.record_recommendations(session_id, [movie.title for movie in recommendations.movies])
         end_time = time.time()
         logger.info(f"⏱️ Profile-based Recommendation Time: {end_time - start_time:.2f}s")
         logger.info(f"✅ PROFILE-BASED RECOMMENDATIONS SUCCESS")
         
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         end_time = time.time()
         logger.error(f"❌ PROFILE-BASED RECOMMENDATIONS ERROR after {end_time - start_time:.2f}s")
@@ -242,38 +542,175 @@ def get_recommendations_from_profile(request: ProfileRecommendationRequest):
         
         return {"error": f"Erreur lors de la génération des recommandations basées sur le profil: {str(e)}"}
 
+@app.post("/recommendations/batch", dependencies=[Depends(require_admin_token)])
+def get_recommendations_batch(request: BatchRecommendationRequest):
+    """
+    Génère des recommandations pour de nombreux profils (ex. emails de sélection)
+    
+    Réservé aux administrateurs (un appel déclenche jusqu'à BATCH_MAX_ITEMS runs d'agent) ;
+    les gros volumes passent par app.cli.batch_recommend. Les résultats sont envoyés
+    en NDJSON au fur et à mesure, une ligne par élément ({"id", "status", "movies"|"error"}).
+    Après une interruption, renvoyer la même requête avec skip_ids = identifiants
+    déjà reçus pour reprendre.
+    
+    Args:
+        request: Profils identifiés par l'appelant et identifiants à ignorer
+    
+    Returns:
+        StreamingResponse NDJSON
+    """
+    logger.info(f"📦 API CALL - /recommendations/batch: {len(request.items)} items, {len(request.skip_ids)} skipped")
+    
+    def stream_results():
+        for result in batch_recommender.run(request.items, request.skip_ids):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.get("/profile/export", dependencies=[Depends(require_admin_token)])
+def export_profiles():
+    """
+    Exporte tous les profils stockés en NDJSON (une ligne ProfileRecord par profil)
+    
+    Les profils sont décodés et envoyés au fil de l'eau, par paquets de lignes :
+    la mémoire utilisée ne dépend pas du nombre de profils.
+    
+    Returns:
+        StreamingResponse: Flux NDJSON
+    """
+    logger.info(f"📤 API CALL - /profile/export ({profile_service.get_total_profiles_count()} profiles)")
+    
+    def stream_profiles():
+        lines = []
+        for session_id, profile_id, profile in profile_service.iter_profiles():
+            record = ProfileRecord(session_id=session_id, profile_id=profile_id, profile=profile)
+            lines.append(record.model_dump_json() + "\n")
+            if len(lines) >= settings.PROFILE_EXPORT_CHUNK_SIZE:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+    
+    return StreamingResponse(stream_profiles(), media_type="application/x-ndjson")
+
+def import_profile_lines(lines: list[tuple[int, bytes]], overwrite: bool) -> tuple[int, int, list[str]]:
+    """
+    Valide puis range un paquet de lignes NDJSON
+    
+    Args:
+        lines: (numéro de ligne, contenu)
+        overwrite: Remplacer les profils existants
+        
+    Returns:
+        tuple: (importés, ignorés, erreurs de validation)
+    """
+    records, errors = [], []
+    for line_number, line in lines:
+        try:
+            records.append(ProfileRecord.model_validate_json(line))
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"]) or "json"
+            errors.append(f"line {line_number}: {location}: {error['msg']}")
+    imported, skipped = profile_service.import_profiles(records, overwrite)
+    return imported, skipped, errors
+
+@app.post("/profile/import", dependencies=[Depends(require_admin_token)])
+async def import_profiles(http_request: Request, overwrite: bool = Query(False)):
+    """
+    Importe des profils depuis un corps NDJSON (format de /profile/export)
+    
+    Le corps est lu au fil de l'eau et validé par paquets de
+    PROFILE_IMPORT_CHUNK_SIZE lignes (hors boucle d'événements) ; les lignes
+    invalides sont comptées et ignorées.
+    
+    Args:
+        http_request: Requête HTTP (corps NDJSON)
+        overwrite: Remplacer les profils existants (sinon ils sont conservés)
+    
+    Returns:
+        Nombre de profils importés, ignorés et invalides, premières erreurs
+    """
+    logger.info(f"📥 API CALL - /profile/import (overwrite={overwrite})")
+    
+    counts = {"imported": 0, "skipped": 0, "invalid": 0}
+    errors: list[str] = []
+    
+    async def flush(chunk):
+        imported, skipped, chunk_errors = await run_in_threadpool(import_profile_lines, chunk, overwrite)
+        counts["imported"] += imported
+        counts["skipped"] += skipped
+        counts["invalid"] += len(chunk_errors)
+        errors.extend(chunk_errors[:settings.PROFILE_IMPORT_MAX_ERRORS - len(errors)])
+    
+    chunk = []
+    try:
+        async for line in aiter_lines(http_request.stream(), settings.PROFILE_IMPORT_MAX_LINE_BYTES):
+            chunk.append(line)
+            if len(chunk) >= settings.PROFILE_IMPORT_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+    except ValueError as e:
+        logger.error(f"❌ IMPORT ERROR after {counts['imported']} profiles: {e}")
+        raise HTTPException(status_code=400, detail={"error": str(e), **counts, "errors": errors})
+    
+    logger.info(f"✅ Import done: {counts}")
+    return {**counts, "errors": errors}
+
 @app.get("/profile/list")
-def list_profiles(http_request: Request):
+def list_profiles(
+    http_request: Request,
+    fields: Optional[str] = Query(None, description="Champs du profil à renvoyer, séparés par des virgules"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(settings.PROFILE_LIST_PAGE_SIZE, ge=1, le=settings.PROFILE_LIST_MAX_PAGE_SIZE),
+):
     """
-    Liste tous les profils de la session courante
+    Liste les profils de la session courante, par page
+    
+    Répond 304 sans décoder les profils si le client envoie l'ETag de la
+    même page (If-None-Match).
     
     Args:
         http_request: Requête HTTP pour la gestion de session
+        fields: Projection (ex. "favorite_genres,preferred_decades"), profil complet par défaut
+        offset: Position du premier profil
+        limit: Nombre maximum de profils
     
     Returns:
-        Liste des profils avec leurs IDs
+        Liste des profils avec leurs IDs, le total et la position de la page suivante
     """
-    logger.info(f"📋 API CALL - /profile/list")
+    logger.info(f"📋 API CALL - /profile/list (offset={offset}, limit={limit}, fields={fields})")
+    
+    projection = parse_profile_fields(fields)
     
     try:
         # Use get_or_create_session_id to handle cases where no session exists
         session_id = get_or_create_session_id(http_request)
         
-        # Get all profiles for this session
-        session_profiles = profile_service.get_session_profiles(session_id)
-        
-        # Convert to list format with profile_id and profile data
-        profiles_list = [
-            {
-                "profile_id": profile_id,
-                "profile": profile
-            }
-            for profile_id, profile in session_profiles.items()
-        ]
+        # Page courante, d'après les empreintes (sans décoder les profils)
+        etags = profile_service.get_session_etags(session_id)
+        page = list(etags.items())[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(etags) else None
+        etag = content_hash({
+            "profiles": page, "total": len(etags), "offset": offset,
+            "fields": sorted(projection) if projection is not None else None,
+        })
         
-        logger.info(f"✅ Found {len(profiles_list)} profiles in session {session_id}")
+        def build():
+            session_profiles = profile_service.get_session_profiles(session_id, [profile_id for profile_id, _ in page])
+            profiles_list = [
+                {
+                    "profile_id": profile_id,
+                    "profile": project_profile(profile, projection)
+                }
+                for profile_id, profile in session_profiles.items()
+            ]
+            logger.info(f"✅ Found {len(profiles_list)}/{len(etags)} profiles in session {session_id}")
+            return {"profiles": profiles_list, "total": len(etags), "next_offset": next_offset}
         
-        return {"profiles": profiles_list}
+        return conditional_response(http_request, etag, build)
         
     except Exception as e:
         logger.error(f"❌ LIST PROFILES ERROR: {str(e)}")
@@ -281,32 +718,46 @@ def list_profiles(http_request: Request):
         return {"profiles": []}
 
 @app.get("/profile/{profile_id}")
-def get_profile(profile_id: str, http_request: Request):
+def get_profile(
+    profile_id: str,
+    http_request: Request,
+    fields: Optional[str] = Query(None, description="Champs du profil à renvoyer, séparés par des virgules"),
+):
     """
     Récupère un profil spécifique par son ID
     
+    Répond 304 sans décoder le profil si le client envoie son ETag (If-None-Match).
+    
     Args:
         profile_id: Identifiant du profil
         http_request: Requête HTTP pour la gestion de session
+        fields: Projection (ex. "favorite_genres"), profil complet par défaut
     
     Returns:
         Profile: Le profil demandé
     """
     logger.info(f"👤 API CALL - /profile/{profile_id}")
     
+    projection = parse_profile_fields(fields)
+    
     try:
         # Récupérer la session
         session_id = get_session_id(http_request)
         
-        # Récupérer le profil
-        profile = profile_service.get_profile(session_id, profile_id)
-        
-        if not profile:
+        profile_etag = profile_service.get_profile_etag(session_id, profile_id)
+        if not profile_etag:
             logger.warning(f"❌ Profile not found: {profile_id} in session {session_id}")
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        logger.info(f"✅ Profile retrieved successfully: {profile_id}")
-        return profile
+        etag = profile_etag if projection is None else content_hash({"profile": profile_etag, "fields": sorted(projection)})
+        
+        def build():
+            # Récupérer le profil
+            profile = profile_service.get_profile(session_id, profile_id)
+            logger.info(f"✅ Profile retrieved successfully: {profile_id}")
+            return project_profile(profile, projection)
+        
+        return conditional_response(http_request, etag, build)
         
     except HTTPException:
         raise
@@ -320,6 +771,8 @@ def update_profile(profile_id: str, updated_profile: Profile, http_request: Requ
     """
     Met à jour un profil existant
     
+    Avec If-Match, répond 412 si le profil a changé depuis sa lecture par le client.
+    
     Args:
         profile_id: Identifiant du profil
         updated_profile: Profil mis à jour
@@ -339,14 +792,20 @@ def update_profile(profile_id: str, updated_profile: Profile, http_request: Requ
         session_id = get_or_create_session_id(http_request)
         print("session id recupéré ")
         
-        # Vérifier que le profil existe
-        existing_profile = profile_service.get_profile(session_id, profile_id)
-        if not existing_profile:
-            logger.warning(f"❌ Profile not found for update: {profile_id} in session {session_id}")
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        # Sauvegarder le profil mis à jour
-        profile_service.save_profile(session_id, profile_id, updated_profile)
+        with profile_service.profile_lock(session_id, profile_id):
+            # Vérifier que le profil existe
+            existing_profile = profile_service.get_profile(session_id, profile_id)
+            if not existing_profile:
+                logger.warning(f"❌ Profile not found for update: {profile_id} in session {session_id}")
+                raise HTTPException(status_code=404, detail="Profile not found")
+            check_profile_precondition(http_request, session_id, profile_id)
+            
+            # Les affiches et identifiants TMDB suivent les titres vus, même modifiés ou réordonnés par le client
+            updated_profile.watched_posters = profile_creator.carry_posters(existing_profile, updated_profile)
+            updated_profile.watched_tmdb_ids = profile_creator.carry_tmdb_ids(existing_profile, updated_profile)
+            
+            # Sauvegarder le profil mis à jour
+            profile_service.save_profile(session_id, profile_id, updated_profile)
         
         end_time = time.time()
         logger.info(f"⏱️ Profile Update Time: {end_time - start_time:.2f}s")
@@ -354,11 +813,11 @@ def update_profile(profile_id: str, updated_profile: Profile, http_request: Requ
         logger.info(f"🆔 Profile ID: {profile_id}")
         logger.info(f"🔗 Session ID: {session_id}")
         
-        return {
+        return tagged_response(profile_service.get_profile_etag(session_id, profile_id), {
             "success": True,
             "profile_id": profile_id,
             "profile": updated_profile
-        }
+        })
         
     except HTTPException:
         raise
@@ -369,6 +828,59 @@ def update_profile(profile_id: str, updated_profile: Profile, http_request: Requ
         logger.exception("Full error traceback:")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du profil: {str(e)}")
 
+@app.post("/profile/{profile_id}/favorites")
+def update_profile_favorites(profile_id: str, request: ProfileFavoritesUpdateRequest, http_request: Request):
+    """
+    Met à jour un profil de façon incrémentale après ajout/retrait de favoris
+    
+    Seuls les films ajoutés sont analysés (les retraits seuls ne font pas appel au LLM).
+    Les mises à jour d'un même profil s'exécutent l'une après l'autre, chacune
+    sur le résultat de la précédente ; avec If-Match, répond 412 si le profil a
+    changé depuis sa lecture par le client. La réponse porte le nouvel ETag.
+    
+    Args:
+        profile_id: Identifiant du profil
+        request: Films ajoutés et retirés
+        http_request: Requête HTTP pour la gestion de session
+    
+    Returns:
+        Dict contenant profile_id et le profil mis à jour
+    """
+    logger.info(f"➕ API CALL - /profile/{profile_id}/favorites: +{len(request.added)} -{len(request.removed)}")
+    start_time = time.time()
+    
+    try:
+        session_id = get_or_create_session_id(http_request)
+        with profile_service.profile_lock(session_id, profile_id):
+            existing_profile = profile_service.get_profile(session_id, profile_id)
+            if not existing_profile:
+                logger.warning(f"❌ Profile not found for favorites update: {profile_id} in session {session_id}")
+                raise HTTPException(status_code=404, detail="Profile not found")
+            check_profile_precondition(http_request, session_id, profile_id)
+            if request.added:
+                check_token_budget(session_id)
+            
+            updated_profile = profile_creator.update_user_profile(existing_profile, request.added, request.removed)
+            profile_service.save_profile(session_id, profile_id, updated_profile)
+        
+        end_time = time.time()
+        logger.info(f"⏱️ Profile Favorites Update Time: {end_time - start_time:.2f}s")
+        logger.info(f"✅ PROFILE FAVORITES UPDATE SUCCESS")
+        
+        return tagged_response(profile_service.get_profile_etag(session_id, profile_id), {
+            "profile_id": profile_id,
+            "profile": updated_profile
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        end_time = time.time()
+        logger.error(f"❌ PROFILE FAVORITES UPDATE ERROR after {end_time - start_time:.2f}s")
+        logger.error(f"❌ Error details: {str(e)}")
+        logger.exception("Full error traceback:")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du profil: {str(e)}")
+
 @app.get("/debug/sessions")
 def debug_sessions():
     """
@@ -379,5 +891,211 @@ def debug_sessions():
     """
     return {
         "total_sessions": profile_service.get_session_count(),
-        "total_profiles": profile_service.get_total_profiles_count()
+        "total_profiles": profile_service.get_total_profiles_count(),
+        "storage": profile_service.get_storage_stats()
+    }
+
+@app.get("/debug/usage", dependencies=[Depends(require_admin_token)])
+def debug_usage(window: str = Query("1h", pattern="^(" + "|".join(USAGE_WINDOWS) + ")$")):
+    """
+    Endpoint d'administration : usage LLM (tokens, requêtes, outils, coût) par route, agent et session
+    
+    Réservé aux administrateurs : les sessions les plus coûteuses sont listées par identifiant.
+    
+    Args:
+        window: Fenêtre glissante ("1m", "1h" ou "24h")
+    
+    Returns:
+        Usage agrégé sur la fenêtre
+    """
+    return usage_service.get_summary(window)
+
+@app.get("/debug/context-cache")
+def debug_context_cache():
+    """
+    Endpoint de debug : statistiques du cache de contexte Gemini
+    
+    Returns:
+        Compteurs de hits, créations, rafraîchissements et replis
+    """
+    return context_cache_service.get_stats()
+
+@app.get("/debug/output-repair")
+def debug_output_repair():
+    """
+    Endpoint de debug : réparation des sorties structurées de l'agent
+    
+    Returns:
+        Par type d'agent : nouvelles tentatives, corrections locales, réparations ciblées et tokens économisés
+    """
+    return output_repair_service.get_stats()
+
+@app.get("/debug/cf")
+def debug_collaborative():
+    """
+    Endpoint de debug : état du modèle de filtrage collaboratif
+    
+    Returns:
+        Compteurs du chemin rapide et informations sur le modèle
+    """
+    return collaborative_recommender.get_stats()
+
+@app.get("/debug/precomputed")
+def debug_precomputed():
+    """
+    Endpoint de debug : recommandations précalculées hors ligne
+    
+    Returns:
+        Compteurs servis/manqués/périmés, nombre d'entrées et version attendue
+    """
+    return precomputed_recommender.get_stats()
+
+@app.get("/debug/legacy-cache")
+def debug_legacy_cache():
+    """
+    Endpoint de debug : cache des résultats de /recommendations
+    
+    Returns:
+        Taille, hits/misses, taux de hits et résultats servis ou insuffisants
+    """
+    return movie_recommender.get_legacy_cache_stats()
+
+@app.get("/debug/admission")
+def debug_admission():
+    """
+    Endpoint de debug : contrôle d'admission par classe de routes
+    
+    Returns:
+        Requêtes en cours, profondeur de file et refus par bulkhead
+    """
+    return admission_controller.get_stats()
+
+@app.get("/debug/tmdb")
+def debug_tmdb():
+    """
+    Endpoint de debug : état du client TMDB
+    
+    Returns:
+        Limite de concurrence courante, pauses Retry-After et tailles des caches
+    """
+    return tmdb_service.get_stats()
+
+@app.get("/debug/profile-index")
+def debug_profile_index():
+    """
+    Endpoint de debug : état de l'index des profils similaires
+    
+    Returns:
+        Taille de l'index, paramètres et compteurs servis/amorcés/manqués
+    """
+    return profile_index.get_stats()
+
+@app.get("/debug/memory", dependencies=[Depends(require_admin_token)])
+def debug_memory(subsystems: Optional[str] = Query(None, description="Sous-systèmes à mesurer, séparés par des virgules")):
+    """
+    Endpoint d'administration : mémoire du processus et des structures en mémoire
+    
+    La mesure parcourt les objets de chaque sous-système et le ramasse-miettes :
+    compter quelques centaines de millisecondes, plusieurs secondes si tracemalloc trace.
+    
+    Args:
+        subsystems: Sous-systèmes à mesurer (tous par défaut)
+    
+    Returns:
+        État de tracemalloc, taille approximative de chaque sous-système et instances vivantes
+    """
+    names = [name.strip() for name in subsystems.split(",") if name.strip()] if subsystems else None
+    return {
+        **memory_diagnostics.status(),
+        "subsystems": memory_diagnostics.subsystem_sizes(names),
+        "live_objects": memory_diagnostics.live_objects(MEMORY_LIVE_TYPES),
     }
+
+@app.post("/debug/memory/tracemalloc/start", dependencies=[Depends(require_admin_token)])
+def start_tracemalloc(frames: int = Query(settings.MEMORY_TRACEMALLOC_FRAMES, ge=1, le=100)):
+    """
+    Endpoint d'administration : démarre tracemalloc (ralentit les allocations tant qu'il trace)
+    
+    Args:
+        frames: Profondeur des tracebacks enregistrées
+    
+    Returns:
+        État de tracemalloc
+    """
+    logger.info(f"🧠 tracemalloc started ({frames} frames)")
+    return memory_diagnostics.start(frames)
+
+@app.post("/debug/memory/tracemalloc/stop", dependencies=[Depends(require_admin_token)])
+def stop_tracemalloc():
+    """
+    Endpoint d'administration : arrête tracemalloc (les snapshots pris restent consultables)
+    
+    Returns:
+        État de tracemalloc
+    """
+    logger.info("🧠 tracemalloc stopped")
+    return memory_diagnostics.stop()
+
+@app.post("/debug/memory/snapshots", dependencies=[Depends(require_admin_token)])
+def take_memory_snapshot(label: str = Query("", max_length=100), limit: int = Query(20, ge=1, le=200)):
+    """
+    Endpoint d'administration : prend un snapshot tracemalloc
+    
+    Args:
+        label: Libellé libre du snapshot
+        limit: Nombre de sites d'allocation renvoyés
+    
+    Returns:
+        Identifiant du snapshot et principaux sites d'allocation
+    """
+    try:
+        snapshot_id = memory_diagnostics.take_snapshot(label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"id": snapshot_id, "label": label, "top": memory_diagnostics.top(snapshot_id, limit)}
+
+@app.get("/debug/memory/snapshots/{snapshot_id}", dependencies=[Depends(require_admin_token)])
+def memory_snapshot_top(
+    snapshot_id: int,
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(" + "|".join(GROUP_BY) + ")$"),
+):
+    """
+    Endpoint d'administration : principaux sites d'allocation d'un snapshot
+    
+    Args:
+        snapshot_id: Identifiant du snapshot
+        limit: Nombre de sites renvoyés
+        group_by: Regroupement ("lineno", "filename" ou "traceback")
+    
+    Returns:
+        Sites d'allocation triés par taille
+    """
+    try:
+        return memory_diagnostics.top(snapshot_id, limit, group_by)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+@app.get("/debug/memory/snapshots/{old_id}/diff/{new_id}", dependencies=[Depends(require_admin_token)])
+def memory_snapshot_diff(
+    old_id: int,
+    new_id: int,
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(" + "|".join(GROUP_BY) + ")$"),
+):
+    """
+    Endpoint d'administration : sites d'allocation qui ont le plus grossi entre deux snapshots
+    
+    Args:
+        old_id: Snapshot de référence
+        new_id: Snapshot comparé
+        limit: Nombre de sites renvoyés
+        group_by: Regroupement ("lineno", "filename" ou "traceback")
+    
+    Returns:
+        Variations de taille et de nombre d'allocations par site
+    """
+    try:
+        return memory_diagnostics.diff(old_id, new_id, limit, group_by)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
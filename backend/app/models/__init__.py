@@ -1,4 +1,5 @@
-from .movie import Movie, Movies, AgentMovie, AgentMovies
-from .profile import Profile
+from .movie import Movie, Movies, AgentMovie, AgentMovies, LeanAgentMovie, LeanAgentMovies, FavoriteMovie
+from .profile import Profile, ProfileDelta, ProfileRecord
+from .batch import BatchItem
 
-__all__ = ['Movie', 'Movies', 'AgentMovie', 'AgentMovies', 'Profile']
+__all__ = ['Movie', 'Movies', 'AgentMovie', 'AgentMovies', 'LeanAgentMovie', 'LeanAgentMovies', 'FavoriteMovie', 'Profile', 'ProfileDelta', 'ProfileRecord', 'BatchItem']
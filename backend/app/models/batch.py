@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Optional
+from .profile import Profile
+
+class BatchItem(BaseModel):
+    """Profil à traiter dans un lot de recommandations, identifié par l'appelant"""
+    id: str
+    profile: Profile
+    custom_query: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class AgentMovie(BaseModel):
     """Modèle pour les films retournés par l'agent AI (sans poster)"""
@@ -16,6 +16,16 @@ class AgentMovies(BaseModel):
     """Collection de films retournés par l'agent AI"""
     movies: List[AgentMovie]
 
+class LeanAgentMovie(BaseModel):
+    """Film minimal retourné par l'agent AI (les détails sont complétés via TMDB)"""
+    title: str
+    year: str = ""
+    why_recommended: str
+
+class LeanAgentMovies(BaseModel):
+    """Collection de films minimaux retournés par l'agent AI"""
+    movies: List[LeanAgentMovie]
+
 class Movie(BaseModel):
     """Modèle final pour les films avec poster TMDB"""
     title: str
@@ -27,7 +37,13 @@ class Movie(BaseModel):
     rating: str = ""
     cast: List[str] = []
     poster_path: str = ""
+    tmdb_id: Optional[int] = None
 
 class Movies(BaseModel):
     """Collection de films enrichis avec posters"""
     movies: List[Movie]
+
+class FavoriteMovie(BaseModel):
+    """Film favori choisi via /search, avec son identifiant TMDB"""
+    title: str
+    tmdb_id: Optional[int] = None
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from pydantic.json_schema import SkipJsonSchema
+from typing import List, Optional
 
 class Profile(BaseModel):
     """Modèle pour le profil cinématographique d'un utilisateur"""
@@ -12,4 +13,28 @@ class Profile(BaseModel):
     personality_traits: str 
     cinematic_taste_description: str 
     recommended_genres_to_explore: List[str]
-    viewing_mood_preferences: List[str] 
\ No newline at end of file
+    viewing_mood_preferences: List[str]
+    # Identifiants TMDB des films vus (0 si inconnu), alignés sur movies_watched et renseignés par l'API
+    # (absents du schéma donné à l'agent)
+    watched_tmdb_ids: SkipJsonSchema[List[int]] = []
+    # Affiches des films vus (URL, "" si inconnue), alignées sur movies_watched et résolues par l'API
+    watched_posters: SkipJsonSchema[List[str]] = []
+
+class ProfileDelta(BaseModel):
+    """Changements apportés à un profil par des films ajoutés aux favoris (sortie de l'agent de mise à jour)"""
+    new_genres: List[str] = []
+    new_directors: List[str] = []
+    new_actors: List[str] = []
+    new_decades: List[str] = []
+    new_genres_to_explore: List[str] = []
+    new_mood_preferences: List[str] = []
+    outdated_items: List[str] = []
+    movie_preferences: Optional[str] = None
+    personality_traits: Optional[str] = None
+    cinematic_taste_description: Optional[str] = None
+
+class ProfileRecord(BaseModel):
+    """Profil stocké avec sa session et son identifiant (une ligne d'export/import NDJSON)"""
+    session_id: str
+    profile_id: str
+    profile: Profile
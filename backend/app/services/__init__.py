@@ -1,5 +1,6 @@
 from .search_service import search_service, search_movies_langsearch
 from .tmdb_service import tmdb_service
 from .ai_service import ai_service
+from .conversation_service import conversation_service
 
-__all__ = ['search_service', 'search_movies_langsearch', 'tmdb_service', 'ai_service']
+__all__ = ['search_service', 'search_movies_langsearch', 'tmdb_service', 'ai_service', 'conversation_service']
@@ -1,21 +1,56 @@
-
-from pydantic_ai import Agent
+import logging
+from pydantic_ai import Agent, RunContext, Tool
+from pydantic_ai.tools import ToolDefinition
 from app.config.settings import settings
 from app.services.search_service import search_movies_langsearch
+from app.services.context_cache_service import context_cache_service
+from app.utils.tool_budget import BUDGET_EXHAUSTED_MESSAGE, ToolBudget
+
+logger = logging.getLogger(__name__)
+
+
+def search_movies(ctx: RunContext[ToolBudget | None], query: str, count: int = 5, freshness: str = "noLimit", summary: bool = True):
+    """Searches the web for movie information (cast, release, reviews, themes); several searches can be issued at once"""
+    budget = ctx.deps if isinstance(ctx.deps, ToolBudget) else None
+    if budget is not None:
+        refusal = budget.reserve()
+        if refusal:
+            logger.info(f"🪫 Tool call refused (budget: {budget.calls} calls, {budget.max_seconds:.0f}s): {query}")
+            return refusal
+    
+    results = search_movies_langsearch(query, count, freshness, summary)
+    if budget is not None and budget.exhausted():
+        return f"{results}\n\n{BUDGET_EXHAUSTED_MESSAGE}"
+    return results
+
+
+async def hide_when_budget_exhausted(ctx: RunContext[ToolBudget | None], tool_def: ToolDefinition) -> ToolDefinition | None:
+    """Removes the search tool from the next model requests once the run budget is spent"""
+    if isinstance(ctx.deps, ToolBudget) and ctx.deps.exhausted():
+        return None
+    return tool_def
+
+
+# Search tool with a per-run budget (calls issued in the same turn run concurrently)
+search_tool = Tool(search_movies, name="search_movies_langsearch", prepare=hide_when_budget_exhausted)
 
 
 class AIService:
     """Service for AI agent interactions"""
     
     def __init__(self):
-        self.model = settings.AI_MODEL
+        if settings.CONTEXT_CACHE_ENABLED:
+            self.model = context_cache_service.create_model(settings.AI_MODEL)
+        else:
+            self.model = settings.AI_MODEL
     
     def create_profile_agent(self, output_type):
         """Creates an agent specialized in user profile creation"""
         return Agent(
             self.model,
             output_type=output_type,
-            tools=[search_movies_langsearch],
+            deps_type=ToolBudget,
+            tools=[search_tool],
             system_prompt="""You are an expert in cinematography and psychological analysis of cinematic tastes. 
             
             Your role is to analyze a user's favorite movies to create a detailed profile of their preferences and cinematic personality.
@@ -34,6 +69,35 @@ class AIService:
             Be precise, insightful and creative in your analysis. Create a rich and nuanced profile that truly captures the essence of the user's cinematic tastes."""
         )
     
+    def create_profile_update_agent(self, output_type):
+        """Creates a lightweight agent updating a profile from added/removed favorites (no tools)"""
+        return Agent(
+            self.model,
+            output_type=output_type,
+            system_prompt="""You are an expert in cinematography and psychological analysis of cinematic tastes.
+            
+            You update an existing cinematic profile when the user adds or removes favorite movies.
+            The facts about the added movies are provided: rely on them and on your knowledge.
+            
+            Return only the changes:
+            - New genres, directors, actors, decades, genres to explore and viewing moods brought by the added movies, never items already in the profile
+            - Existing list items that no longer fit after the removals, in outdated_items (exact spelling)
+            - A rewritten movie_preferences, personality_traits or cinematic_taste_description only if the change is significant, otherwise leave them empty
+            
+            Be concise: a single added movie rarely changes more than a few items."""
+        )
+    
+    def create_output_repair_agent(self, output_type):
+        """Creates a tool-less agent correcting only the invalid fields of a previous structured answer"""
+        return Agent(
+            self.model,
+            output_type=output_type,
+            system_prompt="""You correct your previous structured answer.
+            
+            Only the fields listed as invalid must be returned, with values of the expected type and in the same spirit as the rest of your answer.
+            Never change or repeat the valid fields."""
+        )
+    
     def create_recommendation_agent(self, output_type):
         """Creates an agent specialized in movie recommendations"""
         return Agent(
@@ -60,7 +124,8 @@ class AIService:
         return Agent(
             self.model,
             output_type=output_type,
-            tools=[search_movies_langsearch],
+            deps_type=ToolBudget,
+            tools=[search_tool],
             system_prompt="""You are a movie assistant that suggests films based on user preferences. 
 
             For each movie suggestion, you explain why you suggest it. You will provide at least 3 suggestions. 
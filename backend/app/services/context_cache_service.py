@@ -0,0 +1,265 @@
+"""
+Cache de contexte côté fournisseur (Gemini cached content) pour les prompts stables
+
+Les instructions système, les déclarations d'outils et, pour les recommandations,
+le bloc de profil changent rarement pour un même profil. Ils sont placés dans un
+cached content Gemini réutilisé tant qu'il est valide ; les requêtes suivantes
+n'envoient plus que la partie variable. En cas d'indisponibilité, la requête
+complète est envoyée normalement.
+
+Désactivé par défaut (CONTEXT_CACHE_ENABLED) : le fournisseur n'accepte que les
+contenus d'au moins CONTEXT_CACHE_MIN_TOKENS tokens, et les prompts actuels
+(~400 à 700 tokens) n'atteignent ce seuil qu'avec de gros profils.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+from pydantic_ai.models.google import GoogleModel
+from pydantic_ai.providers.google import GoogleProvider
+
+from app.config.settings import settings
+from app.utils.hashing import content_hash
+from app.utils.lru_cache import LRUCache
+from app.utils.telemetry import record_stage, tracer
+
+logger = logging.getLogger(__name__)
+
+# Champs de configuration portés par le cached content (interdits dans la requête)
+_CACHED_CONFIG_FIELDS = ("system_instruction", "tools", "tool_config")
+
+
+@dataclass
+class CacheScope:
+    """Portée de cache d'un run d'agent : type d'agent et préfixe utilisateur stable"""
+    agent_kind: str
+    prefix: Optional[str] = None
+    key: Optional[str] = None
+
+
+@dataclass
+class CachedContextHandle:
+    """Référence à un cached content créé chez le fournisseur"""
+    name: str
+    expires_at: float
+
+
+_current_scope: contextvars.ContextVar[Optional[CacheScope]] = contextvars.ContextVar("cache_scope", default=None)
+_bypass_cache: contextvars.ContextVar[bool] = contextvars.ContextVar("bypass_cache", default=False)
+
+
+class ContextCacheService:
+    """Crée, réutilise et prolonge les cached contents par type d'agent et empreinte de préfixe"""
+
+    def __init__(self):
+        self.handles = LRUCache(maxsize=settings.CONTEXT_CACHE_MAX_ENTRIES)
+        # Clés dont le contenu est trop petit pour être mis en cache
+        self.too_small = LRUCache(maxsize=settings.CONTEXT_CACHE_MAX_ENTRIES)
+        self.unavailable_until = 0.0
+        self.stats = {"hits": 0, "created": 0, "refreshed": 0, "fallbacks": 0, "too_small": 0}
+
+    def create_model(self, model_name: str) -> "ContextCachingGoogleModel":
+        """
+        Crée le modèle Gemini utilisant le cache de contexte
+
+        GEMINI_BASE_URL permet de pointer le client vers un stub local.
+
+        Args:
+            model_name: Nom du modèle Gemini
+
+        Returns:
+            ContextCachingGoogleModel: Modèle à passer aux agents
+        """
+        http_options = genai_types.HttpOptions(base_url=settings.GEMINI_BASE_URL) if settings.GEMINI_BASE_URL else None
+        client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+        return ContextCachingGoogleModel(model_name, provider=GoogleProvider(client=client))
+
+    @contextmanager
+    def scope(self, agent_kind: str, prefix: Optional[str] = None) -> Iterator[CacheScope]:
+        """
+        Définit la portée de cache des runs d'agent exécutés dans le bloc
+
+        Args:
+            agent_kind: Type d'agent
+            prefix: Premier élément du prompt utilisateur, stable (ex. bloc de profil)
+
+        Yields:
+            CacheScope: La portée courante
+        """
+        cache_scope = CacheScope(agent_kind=agent_kind, prefix=prefix)
+        token = _current_scope.set(cache_scope)
+        try:
+            yield cache_scope
+        finally:
+            _current_scope.reset(token)
+
+    def _strip_prefix(self, contents: list, prefix: Optional[str]) -> Optional[list]:
+        """
+        Retire le préfixe du premier message utilisateur
+
+        Returns:
+            Les contenus sans préfixe, None si le préfixe n'est pas en tête
+        """
+        if not prefix:
+            return contents
+        if not contents or not isinstance(contents[0], dict) or contents[0].get("role") != "user":
+            return None
+        parts = contents[0].get("parts") or []
+        if not parts or parts[0].get("text") != prefix:
+            return None
+        rest = parts[1:] or [{"text": ""}]
+        return [{**contents[0], "parts": rest}, *contents[1:]]
+
+    def _estimate_tokens(self, config: dict, prefix: Optional[str]) -> int:
+        """Estimation grossière (4 caractères par token) de la taille du contenu mis en cache"""
+        cached = {field: config.get(field) for field in _CACHED_CONFIG_FIELDS}
+        return (len(json.dumps(cached, default=str)) + len(prefix or "")) // 4
+
+    async def apply(self, client: genai.Client, model_name: str, contents: list, config: dict) -> tuple[list, dict]:
+        """
+        Remplace la partie stable de la requête par un cached content si possible
+
+        Args:
+            client: Client google-genai
+            model_name: Nom du modèle
+            contents: Contenus de la requête
+            config: Configuration de génération
+
+        Returns:
+            tuple: Contenus et configuration, modifiés si le cache est utilisé
+        """
+        cache_scope = _current_scope.get()
+        if cache_scope is None or _bypass_cache.get() or not settings.CONTEXT_CACHE_ENABLED:
+            return contents, config
+
+        stripped = self._strip_prefix(contents, cache_scope.prefix)
+        if stripped is None:
+            return contents, config
+
+        key = content_hash({
+            "agent": cache_scope.agent_kind,
+            "model": model_name,
+            "prefix": cache_scope.prefix or "",
+            **{field: config.get(field) for field in _CACHED_CONFIG_FIELDS},
+        })
+        cache_scope.key = key
+
+        if key in self.too_small:
+            return contents, config
+
+        handle = await self._get_handle(client, model_name, key, cache_scope, config)
+        if handle is None:
+            return contents, config
+
+        cached_config = {name: value for name, value in config.items() if name not in _CACHED_CONFIG_FIELDS}
+        cached_config["cached_content"] = handle.name
+        return stripped, cached_config
+
+    async def _get_handle(self, client: genai.Client, model_name: str, key: str,
+                          cache_scope: CacheScope, config: dict) -> Optional[CachedContextHandle]:
+        """Retourne un cached content valide pour la clé, en le créant ou prolongeant si besoin"""
+        now = time.time()
+        ttl = settings.CONTEXT_CACHE_TTL
+
+        with tracer.start_as_current_span("context cache lookup", attributes={"agent": cache_scope.agent_kind}) as span:
+            handle = self.handles.get(key)
+
+            if handle and handle.expires_at - now < settings.CONTEXT_CACHE_REFRESH_MARGIN:
+                try:
+                    await client.aio.caches.update(name=handle.name, config=genai_types.UpdateCachedContentConfig(ttl=f"{ttl}s"))
+                    handle.expires_at = now + ttl
+                    self.stats["refreshed"] += 1
+                except Exception as e:
+                    logger.warning(f"⚠️ Context cache refresh failed ({handle.name}): {e}")
+                    self.handles.pop(key)
+                    handle = None
+
+            if handle:
+                self.stats["hits"] += 1
+                span.set_attribute("context_cache.hit", True)
+                record_stage("context_cache_hit", 0.0)
+                return handle
+
+            span.set_attribute("context_cache.hit", False)
+
+            if self._estimate_tokens(config, cache_scope.prefix) < settings.CONTEXT_CACHE_MIN_TOKENS:
+                self.too_small.set(key, True)
+                self.stats["too_small"] += 1
+                return None
+
+            if now < self.unavailable_until:
+                self.stats["fallbacks"] += 1
+                return None
+
+            try:
+                cached_content = await client.aio.caches.create(
+                    model=model_name,
+                    config=genai_types.CreateCachedContentConfig(
+                        ttl=f"{ttl}s",
+                        display_name=f"movie-recs-{cache_scope.agent_kind}-{key}",
+                        contents=[{"role": "user", "parts": [{"text": cache_scope.prefix}]}] if cache_scope.prefix else None,
+                        **{field: config[field] for field in _CACHED_CONFIG_FIELDS if config.get(field)},
+                    ),
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Context cache unavailable, sending full prompt: {e}")
+                self.unavailable_until = now + settings.CONTEXT_CACHE_COOLDOWN
+                self.stats["fallbacks"] += 1
+                return None
+
+            handle = CachedContextHandle(name=cached_content.name, expires_at=now + ttl)
+            self.handles.set(key, handle)
+            self.stats["created"] += 1
+            logger.info(f"🗄️ Context cache created for {cache_scope.agent_kind}: {handle.name}")
+            return handle
+
+    def invalidate_current(self) -> None:
+        """Oublie le cached content de la portée courante (expiré ou supprimé chez le fournisseur)"""
+        cache_scope = _current_scope.get()
+        if cache_scope is not None and cache_scope.key:
+            self.handles.pop(cache_scope.key)
+
+    def get_stats(self) -> dict:
+        """
+        Statistiques du cache de contexte
+
+        Returns:
+            dict: Compteurs, nombre de handles actifs, activation et taille minimale cachable
+        """
+        return {
+            **self.stats, "active_handles": len(self.handles), "enabled": settings.CONTEXT_CACHE_ENABLED,
+            "min_tokens": settings.CONTEXT_CACHE_MIN_TOKENS,
+        }
+
+
+class ContextCachingGoogleModel(GoogleModel):
+    """Modèle Gemini qui utilise le cache de contexte et se replie sur la requête complète en cas d'erreur"""
+
+    async def _build_content_and_config(self, messages, model_settings, model_request_parameters):
+        contents, config = await super()._build_content_and_config(messages, model_settings, model_request_parameters)
+        return await context_cache_service.apply(self.client, self.model_name, contents, config)
+
+    async def _generate_content(self, messages, stream, model_settings, model_request_parameters) -> Any:
+        try:
+            return await super()._generate_content(messages, stream, model_settings, model_request_parameters)
+        except genai_errors.ClientError as e:
+            if _bypass_cache.get() or "cache" not in str(e).lower():
+                raise
+            logger.warning(f"⚠️ Cached content rejected, retrying without cache: {e}")
+            context_cache_service.invalidate_current()
+            context_cache_service.stats["fallbacks"] += 1
+            token = _bypass_cache.set(True)
+            try:
+                return await super()._generate_content(messages, stream, model_settings, model_request_parameters)
+            finally:
+                _bypass_cache.reset(token)
+
+# Instance globale du service
+context_cache_service = ContextCacheService()
@@ -0,0 +1,99 @@
+"""
+Service de conservation des conversations d'agent (suite de requêtes, pagination)
+"""
+import logging
+from typing import List, Optional
+
+from pydantic_ai.messages import ModelMessage, ModelRequest, UserPromptPart
+
+from app.config.settings import settings
+from app.utils.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationService:
+    """Stocke l'historique des messages d'agent par session et profil, borné en taille et en durée"""
+    
+    def __init__(self):
+        self.conversations = LRUCache(
+            maxsize=settings.CONVERSATION_MAX_ENTRIES,
+            ttl=settings.CONVERSATION_TTL
+        )
+    
+    def build_key(self, session_id: str, profile_key: str) -> str:
+        """
+        Construit la clé d'une conversation
+        
+        Args:
+            session_id: Identifiant de session
+            profile_key: Identifiant ou empreinte du profil
+            
+        Returns:
+            Clé de conversation
+        """
+        return f"{session_id}:{profile_key}"
+    
+    def get_history(self, key: str) -> Optional[List[ModelMessage]]:
+        """
+        Récupère l'historique d'une conversation
+        
+        Args:
+            key: Clé de conversation
+            
+        Returns:
+            Liste des messages, None si absente ou expirée
+        """
+        return self.conversations.get(key)
+    
+    def save_history(self, key: str, messages: List[ModelMessage]) -> None:
+        """
+        Sauvegarde l'historique d'une conversation (tronqué si trop long)
+        
+        Args:
+            key: Clé de conversation
+            messages: Messages complets de la conversation
+        """
+        self.conversations.set(key, self._truncate(messages))
+    
+    def clear_history(self, key: str) -> None:
+        """Supprime une conversation"""
+        self.conversations.pop(key)
+    
+    def _truncate(self, messages: List[ModelMessage]) -> List[ModelMessage]:
+        """
+        Garde le premier échange (instructions et profil) et les échanges les plus récents
+        
+        La coupe se fait toujours sur un message utilisateur, pour ne jamais
+        séparer un appel d'outil de sa réponse.
+        
+        Args:
+            messages: Messages complets
+            
+        Returns:
+            Messages bornés à CONVERSATION_MAX_MESSAGES
+        """
+        max_messages = settings.CONVERSATION_MAX_MESSAGES
+        if len(messages) <= max_messages:
+            return messages
+        
+        # Fin du premier échange : début du deuxième message utilisateur
+        starts = [
+            i for i, message in enumerate(messages)
+            if isinstance(message, ModelRequest) and any(isinstance(part, UserPromptPart) for part in message.parts)
+        ]
+        if len(starts) < 2:
+            return messages
+        head = messages[:starts[1]]
+        
+        budget = max_messages - len(head)
+        for start in starts[1:]:
+            if len(messages) - start <= budget:
+                logger.debug(f"✂️ Conversation truncated from {len(messages)} to {len(head) + len(messages) - start} messages")
+                return head + messages[start:]
+        
+        # Le dernier échange seul dépasse le budget : on le garde quand même
+        return head + messages[starts[-1]:]
+
+# Instance globale du service
+conversation_service = ConversationService()
@@ -0,0 +1,148 @@
+"""
+Journal des listes de favoris soumises (données d'entraînement du filtrage collaboratif)
+
+Les lignes sont mises en file et écrites par un thread dédié : les requêtes
+n'attendent jamais le disque. Une même liste n'est enregistrée qu'une fois par
+session (création du profil puis recommandations, pages suivantes) pour ne pas
+gonfler les cooccurrences du filtrage collaboratif. Le fichier tourne au-delà de FAVORITES_LOG_MAX_BYTES
+(favorites.jsonl.1, .2, ...) et seules FAVORITES_LOG_BACKUPS archives sont gardées.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Iterator, List
+
+from app.config.settings import settings
+from app.utils.hashing import content_hash
+from app.utils.lru_cache import LRUCache
+from app.utils.title_utils import canonical_title_set
+
+logger = logging.getLogger(__name__)
+
+
+class FavoritesStore:
+    """Ajoute chaque liste de favoris à un fichier JSONL et permet de le relire en flux"""
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path or settings.FAVORITES_LOG_PATH)
+        self.lock = Lock()
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=settings.FAVORITES_LOG_QUEUE_SIZE)
+        self.writer: Thread | None = None
+        self.dropped = 0
+        # Empreintes (session, liste canonique) déjà enregistrées
+        self.recorded = LRUCache(maxsize=settings.FAVORITES_LOG_DEDUP_SIZE, ttl=settings.FAVORITES_LOG_DEDUP_TTL)
+
+    def record(self, titles: List[str], source: str, session_id: str | None = None) -> None:
+        """
+        Enregistre une liste de favoris (sans attendre l'écriture)
+
+        Args:
+            titles: Titres favoris
+            source: Origine ("recommendations", "profile_create", ...)
+            session_id: Session de l'utilisateur : la même liste n'y est enregistrée qu'une fois
+        """
+        titles = [title.strip() for title in titles if title and title.strip()]
+        if len(titles) < 2:
+            return
+        if session_id is not None:
+            key = content_hash([session_id, canonical_title_set(titles)])
+            if key in self.recorded:
+                return
+            self.recorded.set(key, True)
+
+        line = json.dumps({"ts": int(time.time()), "source": source, "titles": titles}, ensure_ascii=False)
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            # Disque trop lent : ces données d'entraînement peuvent être perdues, pas la requête ralentie
+            self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        """Démarre le thread d'écriture au premier enregistrement"""
+        if self.writer is not None:
+            return
+        with self.lock:
+            if self.writer is None:
+                self.writer = Thread(target=self._write_loop, name="favorites-writer", daemon=True)
+                self.writer.start()
+                atexit.register(self.flush)
+
+    def _drain(self, first: str | None = None) -> List[str]:
+        """Retire toutes les lignes en attente"""
+        lines = [first] if first is not None else []
+        while True:
+            try:
+                lines.append(self.queue.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def _write_loop(self) -> None:
+        """Écrit les lignes en attente par paquets"""
+        while True:
+            self._write(self._drain(self.queue.get()))
+
+    def _write(self, lines: List[str]) -> None:
+        """Ajoute des lignes au journal, après rotation si nécessaire"""
+        if not lines:
+            return
+        try:
+            with self.lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._rotate_if_needed()
+                with self.path.open("a", encoding="utf-8") as log_file:
+                    log_file.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ Could not record {len(lines)} favorites lists: {e}")
+
+    def _rotate_if_needed(self) -> None:
+        """Archive le journal s'il dépasse la taille maximale (verrou tenu)"""
+        try:
+            if self.path.stat().st_size < settings.FAVORITES_LOG_MAX_BYTES:
+                return
+        except FileNotFoundError:
+            return
+        backups = settings.FAVORITES_LOG_BACKUPS
+        for index in range(backups - 1, 0, -1):
+            source = self._backup_path(index)
+            if source.exists():
+                os.replace(source, self._backup_path(index + 1))
+        if backups:
+            os.replace(self.path, self._backup_path(1))
+        else:
+            self.path.unlink()
+        logger.info(f"🗃️ Favorites log rotated ({backups} archives kept)")
+
+    def _backup_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def flush(self) -> None:
+        """Écrit immédiatement les lignes en attente (arrêt du processus, outils)"""
+        self._write(self._drain())
+
+    def iter_favorite_sets(self) -> Iterator[List[str]]:
+        """
+        Relit les listes de favoris enregistrées (archives comprises, des plus anciennes
+        au journal courant), sans tout charger en mémoire
+
+        Yields:
+            Liste de titres favoris
+        """
+        paths = [self._backup_path(index) for index in range(settings.FAVORITES_LOG_BACKUPS, 0, -1)]
+        for path in [*paths, self.path]:
+            if not path.exists():
+                continue
+            with path.open(encoding="utf-8") as log_file:
+                for line in log_file:
+                    try:
+                        yield json.loads(line)["titles"]
+                    except (ValueError, KeyError):
+                        continue
+
+# Instance globale du store
+favorites_store = FavoritesStore()
@@ -0,0 +1,335 @@
+"""
+Réparation des sorties structurées invalides de l'agent
+
+Quand la sortie de l'agent (Profile, AgentMovies...) ne passe pas la
+validation, pydantic-ai renvoie les erreurs au modèle qui régénère toute la
+sortie. Ici, la sortie est d'abord corrigée localement (texte séparé par des
+virgules -> liste, liste -> texte, valeurs nulles -> défaut) ; seuls les champs
+encore invalides sont redemandés au modèle, dans un petit run dédié.
+"""
+import json
+import logging
+import types
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple, Union, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict, PrivateAttr, ValidationError, create_model, model_validator
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ModelResponse
+
+from app.config.settings import settings
+from app.services.ai_service import ai_service
+from app.services.usage_service import usage_service
+from app.utils.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_LIST_SEPARATORS = (";", "\n", ",")
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    """Optional[X] -> X"""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _split_text(value: str) -> List[str]:
+    """Découpe un texte énumératif ("a, b; c" ou une liste à puces) en éléments"""
+    for separator in _LIST_SEPARATORS:
+        if separator in value:
+            parts = value.split(separator)
+            break
+    else:
+        parts = [value]
+    return [part.strip().lstrip("-•* ").strip() for part in parts if part.strip().lstrip("-•* ").strip()]
+
+
+def _coerce_value(annotation: Any, value: Any, path: str, fixes: List[str]) -> Any:
+    """Convertit une valeur vers le type attendu quand la conversion est sans ambiguïté"""
+    annotation = _unwrap_optional(annotation)
+    origin = get_origin(annotation)
+
+    if origin in (list, List):
+        item_type = (get_args(annotation) or (Any,))[0]
+        if isinstance(value, str) and item_type is str:
+            fixes.append(f"{path}: text split into a list")
+            return _split_text(value)
+        if isinstance(value, dict) and _is_model(item_type):
+            fixes.append(f"{path}: single object wrapped in a list")
+            value = [value]
+        if isinstance(value, list):
+            return [_coerce_value(item_type, item, f"{path}.{index}", fixes) for index, item in enumerate(value)]
+        return value
+
+    if _is_model(annotation) and isinstance(value, dict):
+        return coerce_data(annotation, value, fixes, f"{path}.")
+
+    if annotation is str:
+        if isinstance(value, list) and all(isinstance(item, (str, int, float)) for item in value):
+            fixes.append(f"{path}: list joined into a text")
+            return ", ".join(str(item) for item in value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            fixes.append(f"{path}: number converted to text")
+            return str(value)
+
+    if annotation is int and isinstance(value, str) and value.strip().isdigit():
+        fixes.append(f"{path}: text converted to a number")
+        return int(value.strip())
+
+    return value
+
+
+def coerce_data(model_class: type[BaseModel], data: Dict[str, Any], fixes: List[str], prefix: str = "") -> Dict[str, Any]:
+    """
+    Corrige localement les données d'un modèle (sans appel au modèle de langage)
+
+    Args:
+        model_class: Modèle attendu
+        data: Données brutes de l'agent
+        fixes: Liste complétée avec la description des corrections
+        prefix: Chemin des données (pour les descriptions)
+
+    Returns:
+        dict: Données corrigées (copie)
+    """
+    coerced = dict(data)
+    for name, field in model_class.model_fields.items():
+        path = f"{prefix}{name}"
+        value = coerced.get(name, _MISSING)
+        if value is _MISSING or value is None:
+            if not field.is_required():
+                if value is None and _unwrap_optional(field.annotation) is field.annotation:
+                    # null pour un champ non optionnel : valeur par défaut
+                    del coerced[name]
+                    fixes.append(f"{path}: null replaced by the default")
+            elif get_origin(_unwrap_optional(field.annotation)) in (list, List):
+                coerced[name] = []
+                fixes.append(f"{path}: missing list filled with []")
+            continue
+        coerced[name] = _coerce_value(field.annotation, value, path, fixes)
+    return coerced
+
+
+class OutputRepairService:
+    """Sorties d'agent tolérantes et réparation ciblée des champs invalides"""
+
+    def __init__(self):
+        # Structure: {modèle: variante tolérante}
+        self.lenient_models: Dict[type, type] = {}
+        # Structure: {type d'agent: compteurs}
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.lock = Lock()
+
+    def lenient(self, model_class: type[BaseModel]) -> type[BaseModel]:
+        """
+        Variante du modèle à donner comme output_type de l'agent
+
+        Même schéma JSON que le modèle, mais la validation ne lève pas
+        d'erreur sur un objet : la sortie est corrigée localement, et si des
+        champs restent invalides, elle est construite sans validation avec les
+        erreurs à réparer (voir finalize).
+
+        Args:
+            model_class: Modèle de sortie attendu
+
+        Returns:
+            type: Sous-classe tolérante (le modèle lui-même si la réparation est désactivée)
+        """
+        if not settings.OUTPUT_REPAIR_ENABLED:
+            return model_class
+        with self.lock:
+            lenient_model = self.lenient_models.get(model_class)
+            if lenient_model is None:
+                lenient_model = self.lenient_models[model_class] = self._build_lenient_model(model_class)
+            return lenient_model
+
+    def _build_lenient_model(self, model_class: type[BaseModel]) -> type[BaseModel]:
+        class LenientOutput(model_class):
+            # Même titre et même description : schéma JSON identique à celui du modèle
+            __doc__ = model_class.__doc__
+            model_config = ConfigDict(title=model_class.__name__)
+            _repair: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+            @model_validator(mode="wrap")
+            @classmethod
+            def _coerce(cls, data, handler):
+                if not isinstance(data, dict):
+                    return handler(data)
+                try:
+                    return handler(data)
+                except ValidationError:
+                    pass
+                fixes: List[str] = []
+                coerced = coerce_data(model_class, data, fixes)
+                try:
+                    output = handler(coerced)
+                    errors = []
+                except ValidationError as e:
+                    output = cls.model_construct(**coerced)
+                    errors = e.errors(include_url=False)
+                output._repair = {"data": coerced, "fixes": fixes, "errors": errors}
+                return output
+
+        LenientOutput.__name__ = LenientOutput.__qualname__ = model_class.__name__
+        LenientOutput.__repair_base__ = model_class
+        return LenientOutput
+
+    def _record(self, agent_kind: str, **counters: int) -> None:
+        with self.lock:
+            totals = self.stats.setdefault(agent_kind, {
+                "outputs": 0, "output_retries": 0, "local_fixes": 0, "repair_calls": 0,
+                "repaired_fields": 0, "repair_failures": 0, "tokens_saved": 0,
+            })
+            for name, value in counters.items():
+                totals[name] += value
+
+    def _estimated_retry_tokens(self, result) -> int:
+        """
+        Coût estimé d'une régénération complète : la conversation est renvoyée
+        avec la sortie invalide, puis toute la sortie est régénérée
+        """
+        response = next(
+            (message for message in reversed(result.new_messages()) if isinstance(message, ModelResponse)), None
+        )
+        if response is None:
+            return 0
+        return response.usage.input_tokens + 2 * response.usage.output_tokens
+
+    def _repair_model(self, model_class: type[BaseModel], errors: List[Dict]) -> Tuple[type[BaseModel], Dict[str, Any]]:
+        """
+        Construit le modèle de réponse ne contenant que les champs invalides
+
+        Les erreurs d'un élément de liste de modèles (ex. movies.3.why_recommended)
+        ne redemandent que les champs fautifs de cet élément, avec son index.
+
+        Returns:
+            tuple: (modèle de réparation, {champ: [index] pour les listes, None sinon})
+        """
+        targets: Dict[str, Any] = {}
+        item_fields: Dict[str, set] = {}
+        for error in errors:
+            loc = error["loc"]
+            name = loc[0] if loc else None
+            if name not in model_class.model_fields:
+                continue
+            item_type = _unwrap_optional(model_class.model_fields[name].annotation)
+            item_type = (get_args(item_type) or (None,))[0] if get_origin(item_type) in (list, List) else None
+            if (len(loc) == 3 and isinstance(loc[1], int) and _is_model(item_type)
+                    and loc[2] in item_type.model_fields and targets.get(name, []) is not None):
+                targets.setdefault(name, []).append(loc[1])
+                item_fields.setdefault(name, set()).add(loc[2])
+            else:
+                targets[name] = None
+
+        fields = {}
+        for name, indexes in targets.items():
+            annotation = model_class.model_fields[name].annotation
+            if indexes is None:
+                fields[name] = (annotation, ...)
+                continue
+            item_type = get_args(_unwrap_optional(annotation))[0]
+            patch = create_model(
+                f"{item_type.__name__}Fix",
+                index=(int, ...),
+                **{field: (item_type.model_fields[field].annotation, ...) for field in sorted(item_fields[name])},
+            )
+            fields[f"{name}_fixes"] = (List[patch], ...)
+        return create_model(f"{model_class.__name__}Repair", **fields), targets
+
+    def finalize(self, result, agent_kind: str) -> Any:
+        """
+        Retourne la sortie validée d'un run, réparée si nécessaire
+
+        Les champs encore invalides après correction locale sont redemandés au
+        modèle, dans la suite de la conversation, avec uniquement ces champs en
+        sortie ; le résultat fusionné est validé avec le modèle d'origine.
+
+        Args:
+            result: Résultat d'un run d'agent dont l'output_type vient de lenient()
+            agent_kind: Type d'agent, pour les statistiques
+
+        Returns:
+            Sortie validée (instance du modèle d'origine)
+
+        Raises:
+            UnexpectedModelBehavior: Si la sortie reste invalide après réparation
+        """
+        output = result.output
+        model_class = getattr(type(output), "__repair_base__", None)
+        retries = usage_service.count_output_retries(result)
+        if model_class is None:
+            self._record(agent_kind, outputs=1, output_retries=retries)
+            return output
+
+        repair = output._repair
+        if repair is None:
+            self._record(agent_kind, outputs=1, output_retries=retries)
+            return model_class.model_construct(
+                _fields_set=output.model_fields_set, **{name: getattr(output, name) for name in model_class.model_fields}
+            )
+
+        estimated = self._estimated_retry_tokens(result)
+        if repair["fixes"]:
+            logger.info(f"🩹 {agent_kind} output fixed locally: {'; '.join(repair['fixes'][:5])}")
+        if not repair["errors"]:
+            self._record(agent_kind, outputs=1, output_retries=retries, local_fixes=1, tokens_saved=estimated)
+            return model_class.model_validate(repair["data"])
+
+        data = repair["data"]
+        repair_model, targets = self._repair_model(model_class, repair["errors"])
+        invalid = {
+            name: data.get(name) if indexes is None else {index: data[name][index] for index in sorted(set(indexes))}
+            for name, indexes in targets.items()
+        }
+        errors = "\n".join(f"- {'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in repair["errors"])
+        prompt = (
+            f"Some fields of your last answer are invalid:\n{errors}\n\n"
+            f"Invalid values (list items by index): {json.dumps(invalid, ensure_ascii=False, default=str)}\n\n"
+            "Return only corrected values for these fields; list item fixes must keep their index."
+        )
+
+        agent = ai_service.create_output_repair_agent(repair_model)
+        try:
+            with stage("output_repair", f"output repair {agent_kind}", fields=len(targets)):
+                repair_result = agent.run_sync(prompt, message_history=result.all_messages())
+            usage_service.record_run("output_repair", repair_result)
+            fixed = repair_result.output
+            for name, indexes in targets.items():
+                if indexes is None:
+                    data[name] = getattr(fixed, name)
+                    continue
+                for item_fix in getattr(fixed, f"{name}_fixes"):
+                    if 0 <= item_fix.index < len(data[name]) and isinstance(data[name][item_fix.index], dict):
+                        data[name][item_fix.index].update(item_fix.model_dump(exclude={"index"}))
+            repaired = model_class.model_validate(data)
+        except (ValidationError, UnexpectedModelBehavior) as e:
+            self._record(agent_kind, outputs=1, output_retries=retries, repair_calls=1, repair_failures=1)
+            raise UnexpectedModelBehavior(f"{model_class.__name__} output still invalid after repair: {e}") from e
+
+        usage = repair_result.usage()
+        saved = max(0, estimated - usage.input_tokens - usage.output_tokens)
+        self._record(agent_kind, outputs=1, output_retries=retries, local_fixes=int(bool(repair["fixes"])),
+                     repair_calls=1, repaired_fields=len(repair["errors"]), tokens_saved=saved)
+        logger.info(f"🩹 {agent_kind} output repaired: {len(repair['errors'])} invalid fields, ~{saved} tokens saved")
+        return repaired
+
+    def get_stats(self) -> Dict:
+        """
+        Retourne les compteurs de réparation par type d'agent
+
+        Returns:
+            dict: Sorties, nouvelles tentatives, corrections locales, réparations et tokens économisés
+        """
+        with self.lock:
+            return {agent_kind: dict(counters) for agent_kind, counters in self.stats.items()}
+
+# Instance globale du service
+output_repair_service = OutputRepairService()
@@ -2,27 +2,141 @@
 Service de gestion des profils utilisateur avec isolation par session
 """
 import uuid
-from typing import Dict, Optional
-from app.models.profile import Profile
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from app.config.settings import settings
+from app.models.profile import Profile, ProfileRecord
+from app.utils.bloom_filter import BloomFilter
+from app.utils.compact_profile import CompactProfile, profile_codec
+from app.utils.hashing import content_hash
+from app.utils.lru_cache import LRUCache
+from app.utils.title_utils import canonicalize_title
 
-# Stockage global des profils par session
-# Structure: {session_id: {profile_id: Profile}}
-profiles_by_session: Dict[str, Dict[str, Profile]] = {}
+# Stockage global des profils par session, encodés (décodés seulement à la lecture)
+# Structure: {session_id: {profile_id: CompactProfile ou Profile si PROFILE_COMPACT_STORAGE=false}}
+profiles_by_session: Dict[str, Dict[str, Union[CompactProfile, Profile]]] = {}
+
+# Empreinte du contenu de chaque profil (ETags), calculée à la sauvegarde
+# Structure: {session_id: {profile_id: empreinte}}
+profile_etags_by_session: Dict[str, Dict[str, str]] = {}
+
+# Verrous des lectures-modifications-écritures de chaque profil (mise à jour des favoris, édition)
+# Structure: {(session_id, profile_id): Lock}
+profile_locks: Dict[Tuple[str, str], Lock] = {}
+
+
+class RecommendationHistory:
+    """
+    Historique compact des films déjà recommandés dans une session
+    
+    Deux générations de filtres de Bloom : quand la courante atteint sa capacité,
+    elle devient la précédente et la plus ancienne est oubliée. Le taux de faux
+    positifs reste borné (au plus ~2x error_rate) et au moins les `capacity`
+    derniers films sont retenus.
+    """
+    
+    def __init__(self):
+        self.current = self._new_filter()
+        self.previous: Optional[BloomFilter] = None
+        # Derniers films recommandés, par titre canonique (titre affiché en valeur)
+        self.recent: "OrderedDict[str, str]" = OrderedDict()
+    
+    @staticmethod
+    def _new_filter() -> BloomFilter:
+        return BloomFilter(
+            capacity=settings.RECOMMENDATION_HISTORY_CAPACITY,
+            error_rate=settings.RECOMMENDATION_HISTORY_ERROR_RATE
+        )
+    
+    def add(self, key: str, title: str) -> None:
+        """
+        Ajoute un film (titre canonique et titre affiché)
+        
+        Args:
+            key: Titre canonique
+            title: Titre tel que recommandé
+        """
+        if key not in self:
+            if len(self.current) >= self.current.capacity:
+                self.previous, self.current = self.current, self._new_filter()
+            self.current.add(key)
+        self.recent.pop(key, None)
+        self.recent[key] = title
+        while len(self.recent) > settings.RECOMMENDATION_HISTORY_RECENT:
+            self.recent.popitem(last=False)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+
+# Historique des recommandations par session, évincé après RECOMMENDATION_HISTORY_TTL
+# d'inactivité ou au-delà de RECOMMENDATION_HISTORY_MAX_SESSIONS sessions
+# Structure: {session_id: RecommendationHistory}
+recommendations_by_session = LRUCache(
+    maxsize=settings.RECOMMENDATION_HISTORY_MAX_SESSIONS,
+    ttl=settings.RECOMMENDATION_HISTORY_TTL
+)
 
 class ProfileService:
     """Service pour gérer les profils utilisateur avec isolation par session"""
     
-    def get_session_profiles(self, session_id: str) -> Dict[str, Profile]:
+    def _decode(self, stored: Union[CompactProfile, Profile]) -> Profile:
+        """Reconstruit le profil stocké (nouvel objet : le modifier n'altère pas le stockage)"""
+        if isinstance(stored, CompactProfile):
+            return profile_codec.decode(stored)
+        # Stockage non compact (PROFILE_COMPACT_STORAGE=false) : copie, l'objet stocké reste intact
+        return stored.model_copy(deep=True)
+    
+    def _store(self, session_id: str, profile_id: str, profile: Profile) -> None:
+        """Encode et range un profil avec son empreinte (sans journalisation)"""
+        stored = profile_codec.encode(profile) if settings.PROFILE_COMPACT_STORAGE else profile
+        profiles_by_session.setdefault(session_id, {})[profile_id] = stored
+        profile_etags_by_session.setdefault(session_id, {})[profile_id] = content_hash(profile)
+    
+    def get_session_profiles(self, session_id: str, profile_ids: Optional[List[str]] = None) -> Dict[str, Profile]:
         """
-        Récupère tous les profils d'une session
+        Récupère les profils d'une session
         
         Args:
             session_id: Identifiant de session
+            profile_ids: Profils à décoder (tous par défaut), dans cet ordre
             
         Returns:
             Dictionnaire des profils de la session
         """
-        return profiles_by_session.get(session_id, {})
+        session_profiles = profiles_by_session.get(session_id, {})
+        if profile_ids is None:
+            profile_ids = list(session_profiles)
+        return {
+            profile_id: self._decode(session_profiles[profile_id])
+            for profile_id in profile_ids if profile_id in session_profiles
+        }
+    
+    def get_session_etags(self, session_id: str) -> Dict[str, str]:
+        """
+        Récupère les empreintes des profils d'une session, sans les décoder
+        
+        Args:
+            session_id: Identifiant de session
+            
+        Returns:
+            Dictionnaire {profile_id: empreinte}, dans l'ordre de création
+        """
+        return profile_etags_by_session.get(session_id, {})
+    
+    def get_profile_etag(self, session_id: str, profile_id: str) -> Optional[str]:
+        """
+        Récupère l'empreinte d'un profil, sans le décoder
+        
+        Args:
+            session_id: Identifiant de session
+            profile_id: Identifiant du profil
+            
+        Returns:
+            L'empreinte si le profil existe, None sinon
+        """
+        return profile_etags_by_session.get(session_id, {}).get(profile_id)
     
     def save_profile(self, session_id: str, profile_id: str, profile: Profile) -> None:
         """
@@ -39,10 +153,9 @@ class ProfileService:
         logger.info(f"🔄 SAVE_PROFILE - session_id: {session_id}, profile_id: {profile_id}")
         
         if session_id not in profiles_by_session:
-            profiles_by_session[session_id] = {}
             logger.info(f"📝 Created new session storage for: {session_id}")
         
-        profiles_by_session[session_id][profile_id] = profile
+        self._store(session_id, profile_id, profile)
         
         # Log current state
         logger.info(f"✅ Profile saved successfully")
@@ -51,6 +164,22 @@ class ProfileService:
         logger.debug(f"🗂️ All session IDs: {list(profiles_by_session.keys())}")
         logger.debug(f"🗂️ Profile IDs in session {session_id}: {list(profiles_by_session[session_id].keys())}")
     
+    def profile_lock(self, session_id: str, profile_id: str) -> Lock:
+        """
+        Verrou à tenir pour lire, modifier puis sauvegarder un profil
+        
+        Une mise à jour qui attend le LLM ne doit pas écraser celle qui s'est
+        terminée pendant ce temps : les écritures d'un même profil se suivent.
+        
+        Args:
+            session_id: Identifiant de session
+            profile_id: Identifiant du profil
+            
+        Returns:
+            Lock: Verrou propre à ce profil
+        """
+        return profile_locks.setdefault((session_id, profile_id), Lock())
+    
     def get_profile(self, session_id: str, profile_id: str) -> Optional[Profile]:
         """
         Récupère un profil spécifique d'une session
@@ -87,7 +216,8 @@ class ProfileService:
             logger.debug(f"🔍 Available profiles in session: {list(session_profiles.keys())}")
             return None
         
-        profile = session_profiles.get(profile_id)
+        stored = session_profiles.get(profile_id)
+        profile = self._decode(stored) if stored is not None else None
         if profile:
             logger.info(f"✅ Profile {profile_id} found and returned")
         else:
@@ -109,9 +239,93 @@ class ProfileService:
         session_profiles = profiles_by_session.get(session_id, {})
         if profile_id in session_profiles:
             del session_profiles[profile_id]
+            profile_etags_by_session.get(session_id, {}).pop(profile_id, None)
+            profile_locks.pop((session_id, profile_id), None)
             return True
         return False
     
+    def iter_profiles(self) -> Iterator[Tuple[str, str, Profile]]:
+        """
+        Parcourt tous les profils stockés, décodés un par un (export)
+        
+        Seuls les identifiants de la session en cours de parcours sont copiés :
+        les profils ajoutés ou supprimés pendant le parcours ne provoquent pas d'erreur.
+        
+        Yields:
+            tuple: (session_id, profile_id, profil)
+        """
+        for session_id in list(profiles_by_session):
+            session_profiles = profiles_by_session.get(session_id, {})
+            for profile_id in list(session_profiles):
+                stored = session_profiles.get(profile_id)
+                if stored is not None:
+                    yield session_id, profile_id, self._decode(stored)
+    
+    def import_profiles(self, records: Iterable[ProfileRecord], overwrite: bool = False) -> Tuple[int, int]:
+        """
+        Range des profils importés
+        
+        Args:
+            records: Profils validés avec leur session et leur identifiant
+            overwrite: Remplacer les profils existants (sinon ils sont conservés)
+            
+        Returns:
+            tuple: (profils importés, profils existants ignorés)
+        """
+        imported = skipped = 0
+        for record in records:
+            if not overwrite and record.profile_id in profiles_by_session.get(record.session_id, {}):
+                skipped += 1
+                continue
+            self._store(record.session_id, record.profile_id, record.profile)
+            imported += 1
+        return imported, skipped
+    
+    def record_recommendations(self, session_id: str, titles: List[str]) -> None:
+        """
+        Enregistre des films recommandés dans l'historique de la session
+        
+        Args:
+            session_id: Identifiant de session
+            titles: Titres des films recommandés
+        """
+        history = recommendations_by_session.get(session_id) or RecommendationHistory()
+        for title in titles:
+            key = canonicalize_title(title)
+            if key:
+                history.add(key, title)
+        # Remis en cache à chaque enregistrement : la durée de vie compte depuis la dernière activité
+        recommendations_by_session.set(session_id, history)
+    
+    def was_recommended(self, session_id: str, title: str) -> bool:
+        """
+        Indique si un film a probablement déjà été recommandé dans la session
+        
+        Args:
+            session_id: Identifiant de session
+            title: Titre du film
+            
+        Returns:
+            True si le film figure (probablement) dans l'historique
+        """
+        history = recommendations_by_session.get(session_id)
+        if history is None:
+            return False
+        return canonicalize_title(title) in history
+    
+    def get_recent_recommendations(self, session_id: str) -> List[str]:
+        """
+        Retourne les derniers films recommandés (liste bornée, pour le prompt)
+        
+        Args:
+            session_id: Identifiant de session
+            
+        Returns:
+            Titres les plus récents, du plus ancien au plus récent
+        """
+        history = recommendations_by_session.get(session_id)
+        return list(history.recent.values()) if history else []
+    
     def generate_profile_id(self) -> str:
         """
         Génère un identifiant unique pour un profil
@@ -138,3 +352,23 @@ class ProfileService:
             Nombre total de profils
         """
         return sum(len(profiles) for profiles in profiles_by_session.values())
+    
+    def get_storage_stats(self) -> Dict:
+        """
+        Retourne l'occupation du stockage compact (pour debug)
+        
+        Returns:
+            Octets encodés par profil et état du codec
+        """
+        compact = [
+            stored for profiles in profiles_by_session.values()
+            for stored in profiles.values() if isinstance(stored, CompactProfile)
+        ]
+        encoded_bytes = sum(stored.nbytes() for stored in compact)
+        return {
+            "compact_storage": settings.PROFILE_COMPACT_STORAGE,
+            "compact_profiles": len(compact),
+            "encoded_bytes": encoded_bytes,
+            "avg_encoded_bytes": round(encoded_bytes / len(compact), 1) if compact else 0,
+            **profile_codec.get_stats(),
+        }
@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 from threading import Lock
@@ -5,23 +6,31 @@ from functools import wraps
 from typing import List, Dict, Any, Callable
 import logging
 from app.config.settings import settings
+from app.utils.search_compaction import compact_search_results, estimate_tokens
+from app.utils.telemetry import stage
 
 logger = logging.getLogger(__name__)
 
 class RateLimiter:
     """
     Rate limiter pour contrôler la fréquence des appels à une API
+    
+    Un appel par intervalle en moyenne, avec une réserve de `burst` appels
+    immédiats : les appels d'outils émis dans un même tour peuvent partir
+    ensemble. L'attente se fait hors du verrou.
     """
     
-    def __init__(self, min_interval: float = 2.0):
+    def __init__(self, min_interval: float = 2.0, burst: int = 1):
         """
         Initialise le rate limiter
         
         Args:
-            min_interval: Intervalle minimum en secondes entre les appels
+            min_interval: Intervalle minimum en secondes entre les appels (en moyenne)
+            burst: Nombre d'appels pouvant partir sans attendre
         """
         self.min_interval = min_interval
-        self.last_call_time = 0
+        self.burst = max(1, burst)
+        self.next_slot = 0.0
         self.lock = Lock()
     
     def wait_if_needed(self) -> float:
@@ -33,34 +42,35 @@ class RateLimiter:
         """
         with self.lock:
             current_time = time.time()
-            time_since_last = current_time - self.last_call_time
-            
-            if time_since_last < self.min_interval:
-                sleep_time = self.min_interval - time_since_last
-                logger.info(f"Rate limiting: attente de {sleep_time:.2f}s")
-                print(f"⏱️ Rate limiting: attente de {sleep_time:.2f}s avant prochain appel")
-                time.sleep(sleep_time)
-                self.last_call_time = time.time()
-                return sleep_time
-            else:
-                self.last_call_time = current_time
-                return 0.0
+            # Créneau réservé : au plus `burst` créneaux d'avance sur l'instant présent
+            slot = max(self.next_slot, current_time - (self.burst - 1) * self.min_interval)
+            self.next_slot = slot + self.min_interval
+        
+        sleep_time = slot - current_time
+        if sleep_time > 0:
+            logger.info(f"Rate limiting: attente de {sleep_time:.2f}s")
+            time.sleep(sleep_time)
+            return sleep_time
+        return 0.0
 
-def rate_limit(min_interval: float = 2.0):
+def rate_limit(min_interval: float = 2.0, burst: int = 1):
     """
     Décorateur pour appliquer un rate limiting à une fonction
     
     Args:
         min_interval: Intervalle minimum en secondes entre les appels
+        burst: Nombre d'appels pouvant partir sans attendre
     """
     # Créer une instance de rate limiter pour cette fonction
-    limiter = RateLimiter(min_interval)
+    limiter = RateLimiter(min_interval, burst)
     
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             # Attendre si nécessaire
-            wait_time = limiter.wait_if_needed()
+            with stage("rate_limit_wait", f"rate limit {func.__name__}") as span:
+                wait_time = limiter.wait_if_needed()
+                span.set_attribute("rate_limit.wait_s", wait_time)
             
             if wait_time > 0:
                 logger.debug(f"Rate limiter a attendu {wait_time:.2f}s pour {func.__name__}")
@@ -81,7 +91,7 @@ class SearchService:
         self.endpoint = settings.LANGSEARCH_ENDPOINT
         self.api_key = settings.LANGSEARCH_API_KEY
     
-    @rate_limit(2.0)
+    @rate_limit(settings.LANGSEARCH_MIN_INTERVAL, burst=settings.LANGSEARCH_BURST)
     def search_movies(self, query: str, count: int | None = None, freshness: str | None = None, summary: bool = True) -> List[Dict[str, Any]]|str:
         """
         Recherche des informations sur les films et le cinéma
@@ -145,5 +155,16 @@ search_service = SearchService()
 
 # Fonction pour compatibilité avec l'ancien code
 def search_movies_langsearch(query: str, count: int = 5, freshness: str = "noLimit", summary: bool = True):
-    """Fonction de compatibilité pour l'ancien code"""
-    return search_service.search_movies(query, count, freshness, summary)
+    """Recherche pour les agents : résultats compactés (sans URL ni doublons) et bornés en tokens"""
+    with stage("tool_call", "tool search_movies_langsearch", **{"gen_ai.tool.name": "search_movies_langsearch"}) as span:
+        results = search_service.search_movies(query, count, freshness, summary)
+        if isinstance(results, str):
+            return results
+        
+        compact = compact_search_results(results, settings.SEARCH_TOOL_MAX_TOKENS, settings.SEARCH_DUPLICATE_THRESHOLD)
+        raw_tokens = estimate_tokens(json.dumps(results, ensure_ascii=False))
+        compact_tokens = estimate_tokens(compact)
+        span.set_attribute("search.raw_tokens", raw_tokens)
+        span.set_attribute("search.compact_tokens", compact_tokens)
+        logger.info(f"✂️ LangSearch '{query}': {len(results)} résultats, ~{raw_tokens} -> ~{compact_tokens} tokens")
+        return compact
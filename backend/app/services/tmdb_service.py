@@ -1,54 +1,341 @@
+import logging
+import time
+from email.utils import parsedate_to_datetime
 import requests
+from typing import Any, Dict, List, Optional
 from app.config.settings import settings
+from app.utils.adaptive_limiter import AdaptiveConcurrencyLimiter
+from app.utils.lru_cache import LRUCache, MISSING
+from app.utils.telemetry import record_stage, stage
+from app.utils.title_utils import canonicalize_title
+
+logger = logging.getLogger(__name__)
+
+# Statuts par lesquels TMDB signale une surcharge (quota dépassé, service saturé)
+OVERLOAD_STATUSES = (429, 503)
+
 
 class TMDBService:
     """Service pour les interactions avec l'API TMDB"""
-    
+
     def __init__(self):
         self.api_key = settings.TMDB_API_KEY
         self.base_url = settings.TMDB_BASE_URL
         self.image_base_url = settings.TMDB_IMAGE_BASE_URL
-    
-    def search_movie_poster(self, title: str, year: str = "") -> str:
+        # Caches: (titre, année) -> résultat de recherche, id -> détails
+        self.search_cache = LRUCache(maxsize=settings.TMDB_CACHE_SIZE, ttl=settings.TMDB_CACHE_TTL)
+        self.details_cache = LRUCache(maxsize=settings.TMDB_CACHE_SIZE, ttl=settings.TMDB_CACHE_TTL)
+        # Index (titre canonique, année ou "") -> identifiant TMDB, titres localisés et originaux
+        self.id_index = LRUCache(maxsize=settings.TMDB_ID_INDEX_SIZE)
+        # Limite globale et adaptative des appels simultanés (requêtes concurrentes, traitements par lots)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=settings.TMDB_INITIAL_CONCURRENCY,
+            min_limit=settings.TMDB_MIN_CONCURRENCY,
+            max_limit=settings.TMDB_MAX_CONCURRENCY,
+            latency_tolerance=settings.TMDB_LATENCY_TOLERANCE,
+        )
+
+    def _retry_after(self, response: requests.Response) -> float:
+        """Délai demandé par l'en-tête Retry-After (secondes ou date HTTP), borné"""
+        value = response.headers.get("Retry-After", "")
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = settings.TMDB_DEFAULT_RETRY_AFTER
+        return min(max(delay, 0.0), settings.TMDB_MAX_RETRY_AFTER)
+
+    def _get(self, url: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        Appelle l'API TMDB en respectant la limite de concurrence adaptative
+
+        Une réponse 429/503 réduit la limite, suspend les appels pendant le
+        Retry-After puis l'appel est réessayé (TMDB_MAX_RETRIES fois au plus) ;
+        après le dernier échec, l'erreur est levée sans pause.
+
+        Raises:
+            requests.RequestException: En cas d'erreur réseau/HTTP
+        """
+        for attempt in range(settings.TMDB_MAX_RETRIES + 1):
+            self.limiter.acquire()
+            start = time.perf_counter()
+            overloaded = False
+            try:
+                response = requests.get(url, params=params, timeout=settings.API_TIMEOUT)
+                overloaded = response.status_code in OVERLOAD_STATUSES
+            except requests.Timeout:
+                # Un timeout traduit une saturation : réduire la limite aussi
+                overloaded = True
+                raise
+            finally:
+                self.limiter.release(time.perf_counter() - start, overloaded)
+
+            if not overloaded:
+                break
+            # Après la dernière tentative, l'erreur remonte sans attendre : la limite a déjà été réduite
+            if attempt < settings.TMDB_MAX_RETRIES:
+                delay = self._retry_after(response)
+                self.limiter.pause(delay)
+                logger.warning(f"🔁 TMDB {response.status_code}, retry {attempt + 1}/{settings.TMDB_MAX_RETRIES} in {delay:.1f}s")
+
+        response.raise_for_status()
+        return response
+
+    def _search_movie(self, title: str, year: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Recherche un film par titre (premier résultat), avec cache
+
+        Args:
+            title: Titre du film
+            year: Année du film (optionnel)
+
+        Returns:
+            dict: Premier résultat TMDB ou None si non trouvé
+
+        Raises:
+            requests.RequestException: En cas d'erreur réseau/HTTP (non mise en cache)
+        """
+        cache_key = (title.strip().lower(), year)
+        cached = self.search_cache.get(cache_key, MISSING)
+        if cached is not MISSING:
+            record_stage("tmdb_cache_hit", 0.0)
+            return cached
+
+        search_url = f"{self.base_url}/search/movie"
+        params = {
+            "api_key": self.api_key,
+            "query": title,
+            "language": settings.TMDB_LANGUAGE
+        }
+
+        if year:
+            params["year"] = year
+
+        with stage("tmdb_call", "tmdb search/movie", **{"tmdb.cache_hit": False}):
+            response = self._get(search_url, params)
+
+        results = response.json().get("results", [])
+        movie = results[0] if results else None
+
+        # L'année donnée par l'agent est parfois décalée : réessayer sans
+        if movie is None and year:
+            movie = self._search_movie(title)
+
+        self.search_cache.set(cache_key, movie)
+        return movie
+
+    def find_movie(self, title: str, year: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Recherche un film par titre (premier résultat), sans lever d'exception
+
+        Args:
+            title: Titre du film
+            year: Année du film (optionnel)
+
+        Returns:
+            dict: Premier résultat TMDB (avec "id" et "poster_path") ou None
+        """
+        try:
+            return self._search_movie(title, year)
+        except Exception as e:
+            logger.warning(f"⚠️ TMDB search failed for '{title}': {e}")
+            return None
+
+    def search_multi(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Recherche films et séries (search/multi), sans cache
+
+        Args:
+            query: Texte recherché
+
+        Returns:
+            list: Résultats TMDB bruts
+
+        Raises:
+            requests.RequestException: En cas d'erreur réseau/HTTP
+        """
+        params = {
+            "api_key": self.api_key,
+            "query": query,
+            "language": settings.TMDB_LANGUAGE
+        }
+        with stage("tmdb_call", "tmdb search/multi", **{"tmdb.cache_hit": False}):
+            response = self._get(f"{self.base_url}/search/multi", params)
+        return response.json().get("results", [])
+
+    def remember_movie_ids(self, items: List[Dict[str, Any]]) -> None:
+        """
+        Indexe les identifiants de films déjà obtenus (résultats de /search, détails)
+
+        Chaque film est indexé sous son titre localisé (TMDB_LANGUAGE) et sous
+        son titre original, celui qu'écrivent en général l'agent et les
+        utilisateurs : ces titres se résolvent ensuite sans recherche TMDB.
+
+        Args:
+            items: Films TMDB bruts (search/movie, search/multi ou détails)
+        """
+        for item in items:
+            if item.get("media_type", "movie") != "movie" or not item.get("id"):
+                continue
+            year = (item.get("release_date") or "")[:4]
+            for title in {item.get("title"), item.get("original_title")} - {None, ""}:
+                key = canonicalize_title(title)
+                if not key:
+                    continue
+                # Sans année, le premier film indexé garde le titre (les remakes ont leur année)
+                if (key, "") not in self.id_index:
+                    self.id_index.set((key, ""), item["id"])
+                if year:
+                    self.id_index.set((key, year), item["id"])
+
+    def remember_search_results(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Indexe les films renvoyés par /search
+
+        Un film choisi dans /search puis désigné par son titre (favoris,
+        recommandations de l'agent) est ensuite lu directement par son identifiant.
+
+        Args:
+            results: Résultats TMDB bruts (search/movie ou search/multi)
+        """
+        self.remember_movie_ids(results)
+
+    def resolve_movie_id(self, title: str, year: str = "") -> Optional[int]:
+        """
+        Identifiant TMDB d'un film désigné par son titre
+
+        L'index des titres connus est consulté d'abord ; la recherche TMDB n'a
+        lieu qu'une fois par titre inconnu, son résultat est indexé.
+
+        Args:
+            title: Titre du film
+            year: Année du film (optionnel)
+
+        Returns:
+            int: Identifiant TMDB, ou None si le film est introuvable
+        """
+        key = (canonicalize_title(title), year)
+        tmdb_id = self.id_index.get(key)
+        if tmdb_id is not None:
+            record_stage("tmdb_cache_hit", 0.0)
+            return tmdb_id
+
+        movie = self.find_movie(title, year)
+        if not movie:
+            return None
+        self.remember_movie_ids([movie])
+        if key[0]:
+            self.id_index.set(key, movie["id"])
+        return movie["id"]
+
+    def search_movie_poster(self, title: str, year: str = "", tmdb_id: Optional[int] = None) -> str:
         """
         Recherche le poster d'un film via l'API TMDB
-        
+
         Args:
             title: Titre du film
             year: Année du film (optionnel)
-        
+            tmdb_id: Identifiant TMDB, s'il est connu (lecture directe au lieu d'une recherche)
+
         Returns:
             str: URL complète du poster ou chaîne vide si non trouvé
         """
+        tmdb_id = tmdb_id or self.resolve_movie_id(title, year)
+        movie = self.get_movie_details(tmdb_id) if tmdb_id else None
+        poster_path = movie.get("poster_path") if movie else None
+        return f"{self.image_base_url}{poster_path}" if poster_path else ""
+
+    def get_movie_details(self, movie_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupère les détails d'un film avec son casting en un seul appel
+
+        Args:
+            movie_id: Identifiant TMDB du film
+
+        Returns:
+            dict: Détails TMDB (avec "credits") ou None en cas d'erreur
+        """
+        cached = self.details_cache.get(movie_id)
+        if cached is not None:
+            record_stage("tmdb_cache_hit", 0.0)
+            return cached
+
         try:
-            search_url = f"{self.base_url}/search/movie"
+            details_url = f"{self.base_url}/movie/{movie_id}"
             params = {
                 "api_key": self.api_key,
-                "query": title,
-                "language": "fr-FR"
+                "language": settings.TMDB_LANGUAGE,
+                "append_to_response": "credits"
             }
-            
-            if year:
-                params["year"] = year
-            
-            response = requests.get(search_url, params=params, timeout=settings.API_TIMEOUT)
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("results", [])
-            
-            if results:
-                movie = results[0]
-                poster_path = movie.get("poster_path")
-                
-                if poster_path:
-                    return f"{self.image_base_url}{poster_path}"
-            
-        except Exception:
-            # En cas d'erreur, retourner une chaîne vide
-            pass
-        
-        return ""
+
+            with stage("tmdb_call", "tmdb movie details", **{"tmdb.cache_hit": False}):
+                response = self._get(details_url, params)
+
+            details = response.json()
+            self.details_cache.set(movie_id, details)
+            self.remember_movie_ids([details])
+            return details
+
+        except Exception as e:
+            logger.warning(f"⚠️ TMDB details failed for {movie_id}: {e}")
+            return None
+
+    def get_movie_details_by_title(self, title: str, year: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Résout l'identifiant d'un film (index des titres, sinon recherche) puis récupère ses détails
+
+        Args:
+            title: Titre du film
+            year: Année du film (optionnel)
+
+        Returns:
+            dict: Détails TMDB ou None si non trouvé
+        """
+        tmdb_id = self.resolve_movie_id(title, year)
+        return self.get_movie_details(tmdb_id) if tmdb_id else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du client TMDB
+
+        Returns:
+            dict: Limiteur de concurrence et tailles des caches et de l'index des identifiants
+        """
+        return {
+            "limiter": self.limiter.get_stats(),
+            "search_cache_size": len(self.search_cache),
+            "details_cache_size": len(self.details_cache),
+            "id_index_size": len(self.id_index),
+        }
+
+    def extract_movie_fields(self, details: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extrait de détails TMDB les champs du modèle Movie
+
+        Args:
+            details: Détails TMDB obtenus avec append_to_response=credits
+
+        Returns:
+            dict: year, genre, director, rating, cast, description, poster_path, tmdb_id
+        """
+        credits = details.get("credits") or {}
+        directors = [member["name"] for member in credits.get("crew", []) if member.get("job") == "Director"]
+        cast = [member["name"] for member in credits.get("cast", [])[:settings.TMDB_CAST_SIZE]]
+        vote_average = details.get("vote_average")
+        poster_path = details.get("poster_path")
+
+        return {
+            "year": (details.get("release_date") or "")[:4],
+            "genre": ", ".join(genre["name"] for genre in details.get("genres", [])),
+            "director": ", ".join(directors),
+            "rating": f"{vote_average:.1f}/10" if vote_average else "",
+            "cast": cast,
+            "description": details.get("overview") or "",
+            "poster_path": f"{self.image_base_url}{poster_path}" if poster_path else "",
+            "tmdb_id": details.get("id")
+        }
 
 # Instance globale du service
 tmdb_service = TMDBService()
@@ -0,0 +1,261 @@
+"""
+Comptabilisation de l'usage LLM (tokens, requêtes, appels d'outils, coût)
+par route, type d'agent et session, sur des fenêtres glissantes
+"""
+import logging
+import time
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Dict, Optional
+
+from pydantic_ai.messages import ModelRequest, ModelResponse, RetryPromptPart, ToolCallPart
+
+from app.config.settings import settings
+from app.utils.telemetry import get_request_context
+
+logger = logging.getLogger(__name__)
+
+# Fenêtres glissantes exposées, en secondes
+USAGE_WINDOWS = {"1m": 60, "1h": 3600, "24h": 24 * 3600}
+
+_COUNTERS = ("runs", "model_requests", "input_tokens", "output_tokens", "tool_calls", "output_retries")
+
+
+def _empty_counters() -> Dict[str, float]:
+    return {name: 0 for name in _COUNTERS}
+
+
+class UsageService:
+    """Agrège l'usage des runs d'agent par minute, conservé sur la plus grande fenêtre"""
+
+    def __init__(self):
+        # Structure: {minute: {(dimension, clé): compteurs}}
+        self.buckets: Dict[int, Dict[tuple, Dict[str, float]]] = {}
+        # Total glissant par session sur SESSION_TOKEN_BUDGET_WINDOW, pour le budget vérifié à chaque requête
+        # Structure: {session_id: deque([minute, tokens])} et {session_id: tokens}
+        self.session_minutes: Dict[str, deque] = {}
+        self.session_totals: Dict[str, int] = {}
+        self._swept_minute = 0
+        self.lock = Lock()
+
+    def count_tool_calls(self, result) -> int:
+        """
+        Compte les appels d'outils d'un run (hors outil de sortie structurée)
+
+        Args:
+            result: Résultat d'un run d'agent
+
+        Returns:
+            Nombre d'appels d'outils
+        """
+        return sum(
+            1
+            for message in result.new_messages()
+            if isinstance(message, ModelResponse)
+            for part in message.parts
+            if isinstance(part, ToolCallPart) and not part.tool_name.startswith("final_result")
+        )
+
+    def final_prompt_tokens(self, result) -> int:
+        """
+        Taille (tokens d'entrée) de la dernière requête au modèle d'un run
+
+        C'est le prompt le plus long : il contient les résultats de tous les outils.
+
+        Args:
+            result: Résultat d'un run d'agent
+
+        Returns:
+            Tokens d'entrée de la dernière réponse du modèle (0 si inconnus)
+        """
+        responses = [message for message in result.new_messages() if isinstance(message, ModelResponse)]
+        return responses[-1].usage.input_tokens if responses else 0
+
+    def count_output_retries(self, result) -> int:
+        """
+        Compte les sorties structurées rejetées et redemandées au modèle pendant un run
+
+        Args:
+            result: Résultat d'un run d'agent
+
+        Returns:
+            Nombre de nouvelles tentatives de sortie
+        """
+        return sum(
+            1
+            for message in result.new_messages()
+            if isinstance(message, ModelRequest)
+            for part in message.parts
+            if isinstance(part, RetryPromptPart) and (part.tool_name or "").startswith("final_result")
+        )
+
+    def record_run(self, agent_kind: str, result) -> None:
+        """
+        Enregistre l'usage d'un run d'agent pour la route et la session courantes
+
+        Args:
+            agent_kind: Type d'agent ("profile", "recommendation", ...)
+            result: Résultat d'un run d'agent
+        """
+        usage = result.usage()
+        counters = {
+            "runs": 1,
+            "model_requests": usage.requests,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "tool_calls": self.count_tool_calls(result),
+            "output_retries": self.count_output_retries(result),
+        }
+
+        context = get_request_context()
+        route = context.route if context else "offline"
+        session_id = context.session_id if context and context.session_id else None
+
+        keys = [("route", route), ("agent", agent_kind)]
+        if session_id:
+            keys.append(("session", session_id))
+
+        minute = int(time.time() // 60)
+        with self.lock:
+            bucket = self.buckets.setdefault(minute, {})
+            for key in keys:
+                totals = bucket.setdefault(key, _empty_counters())
+                for name, value in counters.items():
+                    totals[name] += value
+            if session_id:
+                self._add_session_tokens(session_id, minute, usage.input_tokens + usage.output_tokens)
+            self._prune(minute)
+
+        logger.info(
+            f"🧮 LLM usage - agent: {agent_kind}, route: {route}, "
+            f"in: {usage.input_tokens} (final prompt: {self.final_prompt_tokens(result)}), out: {usage.output_tokens}, "
+            f"requests: {usage.requests}, tools: {counters['tool_calls']}, output retries: {counters['output_retries']}"
+        )
+
+    def _prune(self, current_minute: int) -> None:
+        """Supprime les buckets plus vieux que la plus grande fenêtre et, une fois par minute, les totaux expirés (verrou tenu)"""
+        oldest = current_minute - max(USAGE_WINDOWS.values()) // 60
+        for minute in [m for m in self.buckets if m <= oldest]:
+            del self.buckets[minute]
+        if current_minute != self._swept_minute:
+            self._swept_minute = current_minute
+            for session_id in list(self.session_minutes):
+                self._expire_session(session_id, current_minute)
+
+    def _add_session_tokens(self, session_id: str, minute: int, tokens: int) -> None:
+        """Ajoute des tokens au total glissant d'une session (verrou tenu)"""
+        minutes = self.session_minutes.setdefault(session_id, deque())
+        if minutes and minutes[-1][0] == minute:
+            minutes[-1][1] += tokens
+        else:
+            minutes.append([minute, tokens])
+        self.session_totals[session_id] = self.session_totals.get(session_id, 0) + tokens
+
+    def _expire_session(self, session_id: str, current_minute: int) -> None:
+        """Retire du total d'une session les minutes sorties de la fenêtre du budget (verrou tenu)"""
+        minutes = self.session_minutes.get(session_id)
+        if minutes is None:
+            return
+        oldest = current_minute - settings.SESSION_TOKEN_BUDGET_WINDOW // 60
+        while minutes and minutes[0][0] <= oldest:
+            self.session_totals[session_id] -= minutes.popleft()[1]
+        if not minutes:
+            del self.session_minutes[session_id]
+            del self.session_totals[session_id]
+
+    def _aggregate(self, window_seconds: int) -> Dict[tuple, Dict[str, float]]:
+        """Somme les compteurs des buckets de la fenêtre"""
+        since = int(time.time() // 60) - window_seconds // 60
+        totals: Dict[tuple, Dict[str, float]] = defaultdict(_empty_counters)
+        with self.lock:
+            for minute, bucket in self.buckets.items():
+                if minute <= since:
+                    continue
+                for key, counters in bucket.items():
+                    for name, value in counters.items():
+                        totals[key][name] += value
+        return totals
+
+    def estimate_cost(self, counters: Dict[str, float]) -> float:
+        """
+        Estime le coût en USD à partir des tokens
+
+        Args:
+            counters: Compteurs d'usage
+
+        Returns:
+            Coût estimé en USD
+        """
+        return round(
+            counters["input_tokens"] * settings.AI_INPUT_COST_PER_MTOK / 1_000_000
+            + counters["output_tokens"] * settings.AI_OUTPUT_COST_PER_MTOK / 1_000_000,
+            6
+        )
+
+    def get_session_tokens(self, session_id: str, window_seconds: Optional[int] = None) -> int:
+        """
+        Retourne les tokens consommés par une session sur une fenêtre
+
+        Args:
+            session_id: Identifiant de session
+            window_seconds: Fenêtre en secondes (défaut : SESSION_TOKEN_BUDGET_WINDOW, total glissant sans agrégation)
+
+        Returns:
+            Tokens d'entrée + de sortie
+        """
+        if window_seconds is None or window_seconds == settings.SESSION_TOKEN_BUDGET_WINDOW:
+            with self.lock:
+                self._expire_session(session_id, int(time.time() // 60))
+                return self.session_totals.get(session_id, 0)
+        counters = self._aggregate(window_seconds).get(("session", session_id))
+        if not counters:
+            return 0
+        return int(counters["input_tokens"] + counters["output_tokens"])
+
+    def is_over_budget(self, session_id: str) -> bool:
+        """
+        Indique si une session a dépassé son budget de tokens
+
+        Args:
+            session_id: Identifiant de session
+
+        Returns:
+            True si un budget est configuré et dépassé
+        """
+        budget = settings.SESSION_TOKEN_BUDGET
+        return bool(budget) and self.get_session_tokens(session_id) >= budget
+
+    def get_summary(self, window: str = "1h", top_sessions: int = 10) -> Dict:
+        """
+        Résumé de l'usage sur une fenêtre, par route, agent et sessions les plus coûteuses
+
+        Args:
+            window: Nom de la fenêtre ("1m", "1h", "24h")
+            top_sessions: Nombre de sessions à lister
+
+        Returns:
+            dict: Compteurs et coûts estimés par dimension
+        """
+        totals = self._aggregate(USAGE_WINDOWS[window])
+        summary = {"window": window, "routes": {}, "agents": {}, "top_sessions": {}}
+
+        def with_cost(counters):
+            return {**counters, "cost_usd": self.estimate_cost(counters)}
+
+        for (dimension, key), counters in totals.items():
+            if dimension == "route":
+                summary["routes"][key] = with_cost(counters)
+            elif dimension == "agent":
+                summary["agents"][key] = with_cost(counters)
+
+        sessions = sorted(
+            ((key, counters) for (dimension, key), counters in totals.items() if dimension == "session"),
+            key=lambda item: item[1]["input_tokens"] + item[1]["output_tokens"],
+            reverse=True
+        )
+        summary["top_sessions"] = {key: with_cost(counters) for key, counters in sessions[:top_sessions]}
+        summary["session_count"] = len(sessions)
+        return summary
+
+# Instance globale du service
+usage_service = UsageService()
@@ -0,0 +1,159 @@
+"""
+Limiteur de concurrence adaptatif (AIMD) pour les API externes soumises à des quotas
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Ajuste le nombre d'appels simultanés selon les réponses de l'API
+
+    - Augmentation additive : +1 appel simultané par "fenêtre" de `limit` succès
+      tant que la latence récente reste proche de la latence de référence
+    - Diminution multiplicative : limite réduite en cas de 429/503 (forte
+      baisse) ou de latence dégradée (baisse légère), au plus une fois par période
+    - Pause globale : un Retry-After suspend tous les nouveaux appels
+    """
+
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int,
+                 latency_tolerance: float = 2.0, decrease_interval: float = 1.0):
+        """
+        Initialise le limiteur
+
+        Args:
+            initial_limit: Nombre d'appels simultanés au démarrage
+            min_limit: Limite minimale
+            max_limit: Limite maximale
+            latency_tolerance: Latence récente tolérée, en multiple de la latence de référence
+            decrease_interval: Délai minimum entre deux diminutions, en secondes
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.baseline_latency: Optional[float] = None
+        self.recent_latency: Optional[float] = None
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+        self.stats = {"calls": 0, "overloaded": 0, "latency_decreases": 0, "pauses": 0, "wait_time": 0.0}
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Attend une place libre (et la fin d'une éventuelle pause)
+
+        Args:
+            timeout: Attente maximale en secondes
+
+        Returns:
+            float: Temps d'attente en secondes
+
+        Raises:
+            TimeoutError: Si aucune place ne s'est libérée à temps
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self.condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now >= self.paused_until and self.in_flight < int(self.limit):
+                        break
+                    if deadline is not None and now >= deadline:
+                        raise TimeoutError("No concurrency slot available")
+                    wake_at = self.paused_until if now < self.paused_until else None
+                    if deadline is not None:
+                        wake_at = min(wake_at, deadline) if wake_at else deadline
+                    self.condition.wait(wake_at - now if wake_at else None)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.stats["calls"] += 1
+            waited = time.monotonic() - start
+            self.stats["wait_time"] += waited
+            return waited
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """
+        Libère une place et ajuste la limite selon le résultat de l'appel
+
+        Args:
+            latency: Durée de l'appel en secondes
+            overloaded: True si l'API a signalé une surcharge (429/503)
+        """
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if overloaded:
+                self.stats["overloaded"] += 1
+                self._decrease(now, 0.5)
+            else:
+                if self.baseline_latency is None:
+                    self.baseline_latency = self.recent_latency = latency
+                # Référence : minimum qui remonte lentement (suit un changement durable de latence)
+                self.baseline_latency = min(latency, self.baseline_latency + 0.01 * (latency - self.baseline_latency))
+                self.recent_latency = 0.8 * self.recent_latency + 0.2 * latency
+
+                if self.recent_latency > self.baseline_latency * self.latency_tolerance:
+                    if self._decrease(now, 0.9):
+                        self.stats["latency_decreases"] += 1
+                elif self.in_flight + 1 >= int(self.limit):
+                    # N'augmenter que si la limite est réellement atteinte
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self.condition.notify_all()
+
+    def _decrease(self, now: float, factor: float) -> bool:
+        """Réduit la limite (verrou tenu), au plus une fois par decrease_interval"""
+        if now - self.last_decrease < self.decrease_interval:
+            return False
+        self.last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * factor)
+        if int(self.limit) != previous:
+            logger.info(f"🐢 Concurrency limit lowered {previous} -> {int(self.limit)}")
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """
+        Suspend les nouveaux appels (Retry-After)
+
+        Args:
+            seconds: Durée de la pause
+        """
+        with self.condition:
+            until = time.monotonic() + seconds
+            if until > self.paused_until:
+                self.paused_until = until
+                self.stats["pauses"] += 1
+                logger.warning(f"⏸️ Calls paused for {seconds:.1f}s (Retry-After)")
+            self.condition.notify_all()
+
+    def get_stats(self) -> Dict:
+        """
+        Retourne l'état du limiteur
+
+        Returns:
+            dict: Limite courante, appels en cours/en attente, latences et compteurs
+        """
+        with self.condition:
+            return {
+                **self.stats,
+                "wait_time": round(self.stats["wait_time"], 3),
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency else None,
+                "recent_latency_ms": round(self.recent_latency * 1000, 1) if self.recent_latency else None,
+            }
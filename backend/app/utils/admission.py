@@ -0,0 +1,220 @@
+"""
+Contrôle d'admission des routes coûteuses (bulkheads, file d'attente bornée, délestage)
+
+Chaque classe de routes (LLM, lot, recherche TMDB) dispose d'un nombre limité de
+requêtes simultanées et d'une file d'attente bornée. Quand la file est pleine ou
+l'attente trop longue, la requête est refusée immédiatement (503 + Retry-After)
+au lieu de s'accumuler jusqu'au timeout du worker ; les routes légères ne sont
+jamais bloquées. Le nombre de requêtes LLM en cours par session est aussi limité.
+"""
+import asyncio
+import json
+import logging
+import math
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from app.config.settings import settings
+from app.utils.telemetry import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Bulkhead:
+    """Limite de concurrence d'une classe de routes, avec file d'attente bornée"""
+    name: str
+    limit: int
+    max_queue: int
+    timeout: float
+    session_limit: int = 0
+    in_flight: int = 0
+    waiters: deque = field(default_factory=deque)
+    # Durée moyenne de traitement (moyenne mobile exponentielle), pour Retry-After
+    avg_service_time: float = 1.0
+    stats: Dict[str, float] = field(default_factory=lambda: {
+        "admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+        "rejected_session": 0, "total_wait": 0.0,
+    })
+
+    async def acquire(self) -> bool:
+        """
+        Réserve une place, en attendant au plus `timeout` secondes dans la file
+
+        Returns:
+            bool: True si la requête est admise
+        """
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+
+        if len(self.waiters) >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.stats["queued"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # La place a été cédée au moment de l'expiration : la rendre
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                # Client déconnecté pendant l'attente
+                raise
+            self.stats["rejected_timeout"] += 1
+            return False
+        finally:
+            wait = time.perf_counter() - start
+            self.stats["total_wait"] += wait
+            record_stage("admission_wait", wait)
+
+        self.stats["admitted"] += 1
+        return True
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """
+        Libère une place, en la cédant directement à la première requête en attente
+
+        Args:
+            service_time: Durée de traitement de la requête, pour la moyenne
+        """
+        if service_time is not None:
+            self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """Délai conseillé avant de réessayer : temps estimé pour écouler la file"""
+        estimate = self.avg_service_time * (len(self.waiters) + 1) / self.limit
+        return max(1, min(60, math.ceil(estimate)))
+
+    def snapshot(self) -> Dict:
+        """Compteurs et profondeur de file courants"""
+        admitted = self.stats["admitted"]
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "max_queue": self.max_queue,
+            "session_limit": self.session_limit,
+            "avg_service_time": round(self.avg_service_time, 3),
+            **{name: value for name, value in self.stats.items() if name != "total_wait"},
+            "avg_wait": round(self.stats["total_wait"] / admitted, 3) if admitted else 0.0,
+        }
+
+
+class AdmissionController:
+    """Associe les routes à leur bulkhead et suit les requêtes en cours par session"""
+
+    def __init__(self, config: Optional[Dict[str, Dict]] = None):
+        config = config or settings.ADMISSION_BULKHEADS
+        self.routes = []
+        self.bulkheads: Dict[str, Bulkhead] = {}
+        for name, options in config.items():
+            self.bulkheads[name] = Bulkhead(
+                name=name,
+                limit=options["limit"],
+                max_queue=options["max_queue"],
+                timeout=options.get("timeout", settings.ADMISSION_QUEUE_TIMEOUT),
+                session_limit=options.get("session_limit", 0),
+            )
+            self.routes.extend((re.compile(pattern), name) for pattern in options["paths"])
+        # Structure: {(bulkhead, session_id): requêtes en cours}
+        self.session_in_flight: Dict[tuple, int] = {}
+
+    def match(self, path: str) -> Optional[Bulkhead]:
+        """Retourne le bulkhead de la route, None pour les routes non limitées"""
+        for pattern, name in self.routes:
+            if pattern.match(path):
+                return self.bulkheads[name]
+        return None
+
+    def get_stats(self) -> Dict:
+        """
+        Statistiques d'admission par classe de routes
+
+        Returns:
+            dict: Profondeur de file, requêtes en cours et refus par bulkhead
+        """
+        return {
+            "bulkheads": {name: bulkhead.snapshot() for name, bulkhead in self.bulkheads.items()},
+            "sessions_in_flight": len(self.session_in_flight),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI appliquant le contrôle d'admission
+
+    À placer à l'intérieur de SessionMiddleware (ajouté avant lui) pour connaître
+    la session. La place est gardée jusqu'à la fin de la réponse, y compris en streaming.
+    """
+
+    def __init__(self, app, controller: Optional["AdmissionController"] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def _reject(self, send, status: int, detail: str, retry_after: int) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        bulkhead = self.controller.match(scope["path"])
+        if bulkhead is None:
+            return await self.app(scope, receive, send)
+
+        session_key = None
+        if bulkhead.session_limit:
+            session_id = (scope.get("session") or {}).get("session_id")
+            session_key = (bulkhead.name, session_id) if session_id else None
+            in_flight = self.controller.session_in_flight
+            if session_key and in_flight.get(session_key, 0) >= bulkhead.session_limit:
+                bulkhead.stats["rejected_session"] += 1
+                logger.warning(f"🚦 Session {session_id} has too many {bulkhead.name} requests in flight")
+                return await self._reject(send, 429, "Too many requests in progress for this session", bulkhead.retry_after())
+
+        if not await bulkhead.acquire():
+            logger.warning(f"🚦 Load shedding on {bulkhead.name}: {bulkhead.in_flight} in flight, {len(bulkhead.waiters)} queued")
+            return await self._reject(send, 503, "Server busy, please retry later", bulkhead.retry_after())
+
+        if session_key:
+            in_flight[session_key] = in_flight.get(session_key, 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release(time.perf_counter() - start)
+            if session_key:
+                in_flight[session_key] -= 1
+                if not in_flight[session_key]:
+                    del in_flight[session_key]
+
+# Instance globale du contrôleur d'admission
+admission_controller = AdmissionController()
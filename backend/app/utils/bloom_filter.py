@@ -0,0 +1,60 @@
+"""
+Filtre de Bloom compact pour les tests d'appartenance approximatifs
+"""
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Ensemble probabiliste : pas de faux négatifs, faux positifs bornés par error_rate
+    """
+
+    def __init__(self, capacity: int = 1000, error_rate: float = 0.01):
+        """
+        Initialise le filtre
+
+        Args:
+            capacity: Nombre d'éléments attendus
+            error_rate: Taux de faux positifs visé à pleine capacité
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        """Calcule les positions des bits (double hachage)"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        """
+        Ajoute un élément au filtre
+
+        Args:
+            item: Élément à ajouter
+        """
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,270 @@
+"""
+Représentation compacte des profils stockés en mémoire
+
+Les champs listes (genres, réalisateurs, décennies...) sont remplacés par des
+identifiants d'un vocabulaire partagé entre tous les profils, rangés dans un
+seul tableau d'entiers ; les textes libres sont regroupés en un bloc compressé
+avec zstd (avec un dictionnaire entraîné sur les premiers profils, les textes
+courts se compressant mal sans). Le profil pydantic n'est reconstruit qu'à la
+lecture.
+
+Le vocabulaire est borné (PROFILE_VOCABULARY_MAX_ITEMS) : une fois plein, les
+nouveaux éléments (titres rares, URLs d'affiches) sont rangés tels quels dans le
+bloc de textes. Les textes sont délimités par leurs longueurs, jamais par un
+séparateur : tout caractère est conservé.
+"""
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+import zstandard
+
+from app.config.settings import settings
+from app.models.profile import Profile
+
+logger = logging.getLogger(__name__)
+
+LIST_FIELDS = (
+    "favorite_genres", "favorite_directors", "favorite_actors", "preferred_decades",
+    "movies_watched", "recommended_genres_to_explore", "viewing_mood_preferences", "watched_posters",
+)
+TEXT_FIELDS = ("movie_preferences", "personality_traits", "cinematic_taste_description")
+
+# Premier octet du bloc de textes : mode d'encodage
+_RAW, _ZSTD, _ZSTD_DICT = 0, 1, 2
+
+# Code d'un élément de liste hors vocabulaire (rangé dans le bloc de textes)
+_INLINE = 0xFFFFFFFF
+
+# En-tête de `numbers` : longueurs des listes, nombre d'identifiants TMDB,
+# longueurs des textes en octets, nombre d'éléments hors vocabulaire
+_HEADER_SIZE = len(LIST_FIELDS) + 1 + len(TEXT_FIELDS) + 1
+
+
+class Vocabulary:
+    """Table chaîne <-> identifiant, partagée par tous les profils, bornée à max_items entrées"""
+
+    def __init__(self, max_items: Optional[int] = None):
+        self.max_items = max_items or settings.PROFILE_VOCABULARY_MAX_ITEMS
+        self.ids: Dict[str, int] = {}
+        self.items: List[str] = []
+
+    def encode(self, item: str) -> Optional[int]:
+        """Identifiant de l'élément, None s'il est inconnu et que le vocabulaire est plein"""
+        item_id = self.ids.get(item)
+        if item_id is None:
+            if len(self.items) >= self.max_items:
+                return None
+            item_id = self.ids[item] = len(self.items)
+            self.items.append(item)
+        return item_id
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class CompactProfile:
+    """
+    Profil encodé
+
+    `numbers` contient l'en-tête (longueur de chaque champ liste, nombre
+    d'identifiants TMDB, longueur en octets de chaque texte, nombre d'éléments
+    hors vocabulaire), puis les codes des éléments (identifiant de vocabulaire
+    ou _INLINE), les identifiants TMDB et la longueur de chaque élément hors
+    vocabulaire ; `text_blob` contient les textes puis ces éléments (mode + données).
+    """
+    __slots__ = ("numbers", "text_blob")
+
+    def __init__(self, numbers: array, text_blob: bytes):
+        self.numbers = numbers
+        self.text_blob = text_blob
+
+    def nbytes(self) -> int:
+        """Taille des données encodées (hors en-têtes des objets Python)"""
+        return len(self.numbers) * self.numbers.itemsize + len(self.text_blob)
+
+
+class ProfileCodec:
+    """Encode/décode les profils ; le vocabulaire et le dictionnaire zstd sont partagés"""
+
+    def __init__(self, level: Optional[int] = None, dict_samples: Optional[int] = None,
+                 dict_size: Optional[int] = None, vocabulary_size: Optional[int] = None):
+        """
+        Initialise le codec
+
+        Args:
+            level: Niveau de compression zstd
+            dict_samples: Nombre de profils servant à entraîner le dictionnaire (0 : pas de dictionnaire)
+            dict_size: Taille du dictionnaire en octets
+            vocabulary_size: Nombre maximum d'éléments du vocabulaire partagé
+        """
+        self.level = level if level is not None else settings.PROFILE_ZSTD_LEVEL
+        self.dict_samples = dict_samples if dict_samples is not None else settings.PROFILE_ZSTD_DICT_SAMPLES
+        self.dict_size = dict_size or settings.PROFILE_ZSTD_DICT_SIZE
+        self.vocabulary = Vocabulary(vocabulary_size)
+        self.samples: Optional[List[bytes]] = [] if self.dict_samples else None
+        self.dictionary: Optional[zstandard.ZstdCompressionDict] = None
+        self.compressor = zstandard.ZstdCompressor(level=self.level, write_content_size=True, write_checksum=False)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.dict_compressor: Optional[zstandard.ZstdCompressor] = None
+        self.dict_decompressor: Optional[zstandard.ZstdDecompressor] = None
+        # Les objets zstd et le vocabulaire ne sont pas sûrs entre threads
+        self.lock = threading.Lock()
+
+    def _train_dictionary(self) -> None:
+        """Entraîne le dictionnaire sur les textes collectés (verrou tenu)"""
+        samples, self.samples = self.samples, None
+        try:
+            self.dictionary = zstandard.train_dictionary(self.dict_size, samples, level=self.level)
+        except zstandard.ZstdError as e:
+            logger.warning(f"⚠️ Profile text dictionary training failed, keeping plain zstd: {e}")
+            return
+        self.dict_compressor = zstandard.ZstdCompressor(
+            level=self.level, dict_data=self.dictionary, write_content_size=True, write_checksum=False, write_dict_id=False
+        )
+        self.dict_decompressor = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+        logger.info(f"🗜️ Profile text dictionary trained on {len(samples)} profiles ({len(self.dictionary.as_bytes())} bytes)")
+
+    def _compress_texts(self, text: bytes) -> bytes:
+        """Compresse les textes (verrou tenu), en brut si la compression ne gagne rien"""
+        if self.samples is not None:
+            self.samples.append(text)
+            if len(self.samples) >= self.dict_samples:
+                self._train_dictionary()
+
+        if self.dict_compressor is not None:
+            mode, compressed = _ZSTD_DICT, self.dict_compressor.compress(text)
+        else:
+            mode, compressed = _ZSTD, self.compressor.compress(text)
+        if len(compressed) >= len(text):
+            mode, compressed = _RAW, text
+        return bytes((mode,)) + compressed
+
+    def encode(self, profile: Profile) -> CompactProfile:
+        """
+        Encode un profil
+
+        Args:
+            profile: Profil à stocker
+
+        Returns:
+            CompactProfile: Profil encodé
+        """
+        lists = [getattr(profile, field_name) for field_name in LIST_FIELDS]
+        texts = [getattr(profile, field_name).encode("utf-8") for field_name in TEXT_FIELDS]
+        with self.lock:
+            item_codes, inline_items = [], []
+            for items in lists:
+                for item in items:
+                    item_id = self.vocabulary.encode(item)
+                    if item_id is None:
+                        item_codes.append(_INLINE)
+                        inline_items.append(item.encode("utf-8"))
+                    else:
+                        item_codes.append(item_id)
+            text_blob = self._compress_texts(b"".join(texts + inline_items))
+        numbers = array("I", [len(items) for items in lists])
+        numbers.append(len(profile.watched_tmdb_ids))
+        numbers.extend(len(text) for text in texts)
+        numbers.append(len(inline_items))
+        numbers.extend(item_codes)
+        numbers.extend(profile.watched_tmdb_ids)
+        numbers.extend(len(item) for item in inline_items)
+        return CompactProfile(numbers, text_blob)
+
+    def _decompress(self, compact: CompactProfile) -> bytes:
+        """Bloc de textes décompressé"""
+        mode, data = compact.text_blob[0], compact.text_blob[1:]
+        if mode != _RAW:
+            with self.lock:
+                decompressor = self.dict_decompressor if mode == _ZSTD_DICT else self.decompressor
+                data = decompressor.decompress(data)
+        return data
+
+    def decode_texts(self, compact: CompactProfile, data: Optional[bytes] = None) -> Dict[str, str]:
+        """
+        Décode uniquement les champs texte
+
+        Args:
+            compact: Profil encodé
+            data: Bloc de textes déjà décompressé (optionnel)
+
+        Returns:
+            dict: {champ: texte}
+        """
+        data = self._decompress(compact) if data is None else data
+        lengths = compact.numbers[len(LIST_FIELDS) + 1:_HEADER_SIZE - 1]
+        texts, position = {}, 0
+        for field_name, length in zip(TEXT_FIELDS, lengths):
+            texts[field_name] = data[position:position + length].decode("utf-8")
+            position += length
+        return texts
+
+    def decode_lists(self, compact: CompactProfile, data: Optional[bytes] = None) -> Dict[str, list]:
+        """
+        Décode uniquement les champs listes (décompression seulement s'il y a des éléments hors vocabulaire)
+
+        Args:
+            compact: Profil encodé
+            data: Bloc de textes déjà décompressé (optionnel)
+
+        Returns:
+            dict: {champ: liste}, avec watched_tmdb_ids
+        """
+        numbers, items = compact.numbers, self.vocabulary.items
+        item_count = sum(numbers[:len(LIST_FIELDS)])
+        tmdb_count = numbers[len(LIST_FIELDS)]
+        inline_count = numbers[_HEADER_SIZE - 1]
+        codes_end = _HEADER_SIZE + item_count
+
+        inline_items = iter(())
+        if inline_count:
+            data = self._decompress(compact) if data is None else data
+            position = sum(numbers[len(LIST_FIELDS) + 1:_HEADER_SIZE - 1])
+            decoded_inline = []
+            for length in numbers[codes_end + tmdb_count:]:
+                decoded_inline.append(data[position:position + length].decode("utf-8"))
+                position += length
+            inline_items = iter(decoded_inline)
+
+        decoded, position = {}, _HEADER_SIZE
+        for index, field_name in enumerate(LIST_FIELDS):
+            end = position + numbers[index]
+            decoded[field_name] = [
+                next(inline_items) if item_id == _INLINE else items[item_id] for item_id in numbers[position:end]
+            ]
+            position = end
+        decoded["watched_tmdb_ids"] = numbers[codes_end:codes_end + tmdb_count].tolist()
+        return decoded
+
+    def decode(self, compact: CompactProfile) -> Profile:
+        """
+        Reconstruit le profil pydantic
+
+        Args:
+            compact: Profil encodé
+
+        Returns:
+            Profile: Profil décodé (nouvel objet à chaque appel)
+        """
+        data = self._decompress(compact)
+        return Profile.model_construct(**self.decode_lists(compact, data), **self.decode_texts(compact, data))
+
+    def get_stats(self) -> Dict:
+        """
+        Retourne l'état du codec
+
+        Returns:
+            dict: Taille (et borne) du vocabulaire et état du dictionnaire zstd
+        """
+        return {
+            "vocabulary_size": len(self.vocabulary),
+            "vocabulary_max_items": self.vocabulary.max_items,
+            "dictionary_bytes": len(self.dictionary.as_bytes()) if self.dictionary else 0,
+            "dictionary_samples": len(self.samples) if self.samples is not None else None,
+            "level": self.level,
+        }
+
+# Instance globale du codec de profils
+profile_codec = ProfileCodec()
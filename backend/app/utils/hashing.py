@@ -0,0 +1,25 @@
+"""
+Empreintes de contenu stables pour les clés de cache et les ETags
+"""
+import hashlib
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+
+def content_hash(value: Any, length: int = 16) -> str:
+    """
+    Calcule une empreinte stable d'un modèle pydantic ou d'une valeur JSON
+
+    Args:
+        value: Modèle pydantic ou valeur sérialisable en JSON
+        length: Nombre de caractères hexadécimaux conservés
+
+    Returns:
+        str: Empreinte hexadécimale
+    """
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json")
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:length]
@@ -0,0 +1,80 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match, If-Match) pour les réponses JSON
+"""
+from typing import Any, Callable
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+# Le client garde la réponse mais doit la revalider à chaque fois (réponse 304 si inchangée)
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Indique si le client possède déjà la représentation (en-tête If-None-Match)
+
+    Args:
+        request: Requête HTTP
+        etag: ETag courant, entre guillemets
+
+    Returns:
+        bool: True si l'un des ETags envoyés correspond (comparaison faible)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def etag_precondition_failed(request: Request, etag: str) -> bool:
+    """
+    Indique si la modification doit être refusée (en-tête If-Match, réponse 412)
+
+    Args:
+        request: Requête HTTP
+        etag: ETag courant, entre guillemets
+
+    Returns:
+        bool: True si le client a envoyé des ETags dont aucun ne correspond (comparaison forte)
+    """
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return False
+    return all(candidate.strip() != etag for candidate in header.split(","))
+
+
+def tagged_response(etag_source: Any, body: Any) -> JSONResponse:
+    """
+    Réponse JSON portant son ETag
+
+    Args:
+        etag_source: Empreinte (ou valeur) identifiant la représentation
+        body: Corps de la réponse
+
+    Returns:
+        JSONResponse: Réponse 200 avec ETag
+    """
+    headers = {"ETag": f'"{etag_source}"', "Cache-Control": CACHE_CONTROL}
+    return JSONResponse(jsonable_encoder(body), headers=headers)
+
+
+def conditional_response(request: Request, etag_source: Any, build: Callable[[], Any]) -> Response:
+    """
+    Répond 304 sans construire le corps si le client est à jour, sinon 200 avec ETag
+
+    Args:
+        request: Requête HTTP
+        etag_source: Empreinte (ou valeur) identifiant la représentation
+        build: Construit le corps de la réponse, appelé seulement si nécessaire
+
+    Returns:
+        Response: 304 vide ou réponse JSON
+    """
+    etag = f'"{etag_source}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return tagged_response(etag_source, build())
@@ -0,0 +1,106 @@
+"""
+Cache LRU borné, thread-safe, avec expiration optionnelle
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+# Sentinelle pour distinguer "absent" d'une valeur None mise en cache
+MISSING = object()
+
+
+class LRUCache:
+    """Cache LRU borné en taille avec TTL optionnel et compteurs de hits/misses"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Initialise le cache
+
+        Args:
+            maxsize: Nombre maximum d'entrées
+            ttl: Durée de vie des entrées en secondes (None = pas d'expiration)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Récupère une valeur et la marque comme récemment utilisée
+
+        Args:
+            key: Clé recherchée
+            default: Valeur retournée si absente ou expirée
+
+        Returns:
+            La valeur en cache ou default
+        """
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Ajoute ou remplace une valeur, en évinçant la plus ancienne si plein
+
+        Args:
+            key: Clé
+            value: Valeur
+            ttl: TTL spécifique à cette entrée (défaut : TTL du cache)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Supprime une entrée et retourne sa valeur"""
+        with self._lock:
+            entry = self._data.pop(key, MISSING)
+        return default if entry is MISSING else entry[1]
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            return entry is not MISSING and not (entry[0] and entry[0] < time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        Statistiques du cache
+
+        Returns:
+            dict: Taille, hits, misses et taux de hit
+        """
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
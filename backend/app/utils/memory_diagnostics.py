@@ -0,0 +1,286 @@
+"""
+Diagnostic mémoire du processus : tracemalloc et taille des structures en mémoire
+
+tracemalloc se démarre et s'arrête à chaud (il ralentit les allocations tant
+qu'il trace) ; les snapshots sont gardés en nombre borné pour comparer deux
+instants. Les sous-systèmes (stockage des profils, caches, index, agents)
+sont enregistrés par nom et mesurés par parcours de leurs objets : les tailles
+sont approximatives (objets partagés comptés une seule fois par sous-système).
+"""
+import gc
+import resource
+import sys
+import time
+import tracemalloc
+import types
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.config.settings import settings
+
+# Regroupements acceptés par tracemalloc.Snapshot.statistics()
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Types dont les références ne sont pas suivies (valeurs simples, code et modules partagés)
+_NOT_FOLLOWED = (
+    str, bytes, bytearray, int, float, complex, bool, type(None), type,
+    types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+)
+
+
+def deep_sizeof(root: Any, max_objects: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Estime la mémoire retenue par un objet et tout ce qu'il référence
+
+    Parcourt dictionnaires, séquences, ensembles, objets (__dict__ et __slots__)
+    et tableaux numpy ; les modules, classes et fonctions ne sont pas suivis.
+
+    Args:
+        root: Objet à mesurer
+        max_objects: Nombre maximum d'objets parcourus (MEMORY_SIZEOF_MAX_OBJECTS par défaut)
+
+    Returns:
+        dict: Octets estimés, nombre d'objets parcourus et indicateur de parcours tronqué
+    """
+    max_objects = max_objects or settings.MEMORY_SIZEOF_MAX_OBJECTS
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        if len(seen) >= max_objects:
+            return {"bytes": total, "objects": len(seen), "truncated": True}
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, np.ndarray):
+            # Les vues partagent le tampon de leur base
+            total += sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+            continue
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        if isinstance(obj, _NOT_FOLLOWED):
+            continue
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+            stack.extend(obj)
+        if hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        for slot in getattr(type(obj), "__slots__", ()):
+            value = getattr(obj, slot, None)
+            if value is not None:
+                stack.append(value)
+    return {"bytes": total, "objects": len(seen), "truncated": False}
+
+
+def _format_statistic(stat) -> Dict[str, Any]:
+    """Site d'allocation (fichier:ligne) d'une statistique tracemalloc"""
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+
+
+def _format_difference(stat) -> Dict[str, Any]:
+    """Variation d'un site d'allocation entre deux snapshots"""
+    return {
+        **_format_statistic(stat),
+        "size_diff_kb": round(stat.size_diff / 1024, 1),
+        "count_diff": stat.count_diff,
+    }
+
+
+class MemoryDiagnostics:
+    """Pilote tracemalloc, garde les snapshots et mesure les sous-systèmes enregistrés"""
+
+    def __init__(self):
+        self.subsystems: Dict[str, Callable[[], Any]] = {}
+        self.snapshots: "OrderedDict[int, tuple[float, str, tracemalloc.Snapshot]]" = OrderedDict()
+        self.next_snapshot_id = 1
+        self.lock = Lock()
+
+    def register(self, name: str, getter: Callable[[], Any]) -> None:
+        """
+        Enregistre un sous-système à mesurer
+
+        Args:
+            name: Nom affiché
+            getter: Fonction renvoyant l'objet racine (appelée à chaque mesure : suit les remplacements)
+        """
+        self.subsystems[name] = getter
+
+    def start(self, frames: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Démarre tracemalloc (sans effet s'il trace déjà)
+
+        Args:
+            frames: Profondeur des tracebacks enregistrées (MEMORY_TRACEMALLOC_FRAMES par défaut)
+
+        Returns:
+            dict: État de tracemalloc
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or settings.MEMORY_TRACEMALLOC_FRAMES)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Arrête tracemalloc et libère ses traces (les snapshots pris restent disponibles)
+
+        Returns:
+            dict: État de tracemalloc
+        """
+        tracemalloc.stop()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        État du traçage et mémoire du processus
+
+        Returns:
+            dict: Traçage actif, mémoire tracée (courante, pic), surcoût de tracemalloc,
+            pic RSS du processus et snapshots disponibles
+        """
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        # ru_maxrss est en kilo-octets sous Linux
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_current_mb": round(current / 1024 ** 2, 2),
+            "traced_peak_mb": round(peak / 1024 ** 2, 2),
+            "tracemalloc_overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 1024 ** 2, 2),
+            "max_rss_mb": round(max_rss_kb / 1024, 1),
+            "snapshots": [
+                {"id": snapshot_id, "label": label, "taken_at": taken_at}
+                for snapshot_id, (taken_at, label, _) in self.snapshots.items()
+            ],
+        }
+
+    def take_snapshot(self, label: str = "") -> int:
+        """
+        Prend un snapshot des allocations (les plus anciens sont évincés au-delà de MEMORY_MAX_SNAPSHOTS)
+
+        Args:
+            label: Libellé libre (ex: "avant batch")
+
+        Returns:
+            int: Identifiant du snapshot
+
+        Raises:
+            RuntimeError: Si tracemalloc ne trace pas
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing: start it first")
+        # Les allocations de tracemalloc lui-même ne sont pas des fuites de l'application
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        with self.lock:
+            snapshot_id = self.next_snapshot_id
+            self.next_snapshot_id += 1
+            self.snapshots[snapshot_id] = (time.time(), label, snapshot)
+            while len(self.snapshots) > settings.MEMORY_MAX_SNAPSHOTS:
+                self.snapshots.popitem(last=False)
+        return snapshot_id
+
+    def _snapshot(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        """Snapshot par identifiant (KeyError s'il n'existe pas ou a été évincé)"""
+        return self.snapshots[snapshot_id][2]
+
+    def top(self, snapshot_id: int, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """
+        Principaux sites d'allocation d'un snapshot
+
+        Args:
+            snapshot_id: Identifiant du snapshot
+            limit: Nombre de sites renvoyés
+            group_by: Regroupement ("lineno", "filename" ou "traceback")
+
+        Returns:
+            list: Sites triés par taille décroissante
+        """
+        stats = self._snapshot(snapshot_id).statistics(group_by)[:limit]
+        if group_by != "traceback":
+            return [_format_statistic(stat) for stat in stats]
+        return [{**_format_statistic(stat), "traceback": stat.traceback.format()} for stat in stats]
+
+    def diff(self, old_id: int, new_id: int, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """
+        Sites d'allocation qui ont le plus grossi entre deux snapshots
+
+        Args:
+            old_id: Snapshot de référence
+            new_id: Snapshot comparé
+            limit: Nombre de sites renvoyés
+            group_by: Regroupement ("lineno", "filename" ou "traceback")
+
+        Returns:
+            list: Sites triés par variation de taille décroissante (en valeur absolue)
+        """
+        stats = self._snapshot(new_id).compare_to(self._snapshot(old_id), group_by)[:limit]
+        return [_format_difference(stat) for stat in stats]
+
+    def subsystem_sizes(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Mesure les sous-systèmes enregistrés
+
+        Args:
+            names: Sous-systèmes à mesurer (tous par défaut)
+
+        Returns:
+            dict: {nom: {bytes, mb, objects, truncated}} ou {nom: {error}} si la mesure échoue
+        """
+        sizes = {}
+        for name in names or self.subsystems:
+            getter = self.subsystems.get(name)
+            if getter is None:
+                sizes[name] = {"error": "unknown subsystem"}
+                continue
+            try:
+                size = deep_sizeof(getter())
+            except Exception as e:
+                sizes[name] = {"error": str(e)}
+                continue
+            sizes[name] = {**size, "mb": round(size["bytes"] / 1024 ** 2, 3)}
+        return sizes
+
+    def live_objects(self, classes: Iterable[type]) -> Dict[str, int]:
+        """
+        Compte les instances vivantes de quelques types suivis par le ramasse-miettes
+
+        Un nombre d'agents ou de messages qui croît d'une requête à l'autre signale une fuite.
+
+        Args:
+            classes: Types à compter
+
+        Returns:
+            dict: {nom du type: nombre d'instances}
+        """
+        classes = tuple(classes)
+        counts = {cls.__name__: 0 for cls in classes}
+        for obj in gc.get_objects():
+            if not isinstance(obj, classes):
+                continue
+            for cls in classes:
+                if isinstance(obj, cls):
+                    counts[cls.__name__] += 1
+        return counts
+
+
+# Instance globale du service
+memory_diagnostics = MemoryDiagnostics()
@@ -0,0 +1,33 @@
+"""
+Lecture de flux NDJSON par morceaux (mémoire bornée par la taille d'une ligne)
+"""
+from typing import AsyncIterator, Tuple
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Découpe un flux d'octets en lignes non vides
+
+    Args:
+        chunks: Morceaux du corps de la requête
+        max_line_bytes: Taille maximale d'une ligne
+
+    Yields:
+        tuple: (numéro de ligne, contenu sans le saut de ligne)
+
+    Raises:
+        ValueError: Si une ligne dépasse max_line_bytes
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line {line_number + 1} exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield line_number + 1, buffer
@@ -0,0 +1,126 @@
+"""
+Compactage des résultats de recherche web avant leur envoi au LLM
+
+Chaque résultat LangSearch (titre, URL, extrait, résumé de page) devient une
+ligne courte : le texte est nettoyé du bruit des pages (cookies, navigation,
+liens), les phrases déjà vues sont retirées, les résultats quasi identiques
+sont écartés et l'ensemble tient dans un budget de tokens par appel.
+"""
+import re
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+# Estimation grossière : ~4 caractères par token
+CHARS_PER_TOKEN = 4
+
+_WHITESPACE = re.compile(r"\s+")
+_LINKS = re.compile(r"!?\[([^\]]*)\]\([^)]*\)|https?://\S+|www\.\S+")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+_WORDS = re.compile(r"\w+")
+
+# Phrases typiques du décor des pages, sans information sur les films
+_BOILERPLATE = re.compile(
+    r"cookie|privacy policy|terms of (use|service)|all rights reserved|©|copyright|"
+    r"sign (in|up)|log ?in|subscribe|newsletter|advertis|skip to (main )?content|"
+    r"javascript|click here|read more|share (this|on)|follow us|"
+    r"politique de confidentialité|tous droits réservés|abonnez-vous|se connecter|publicité|lire la suite",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estime le nombre de tokens d'un texte"""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _clean_sentences(text: Optional[str]) -> List[str]:
+    """Découpe un texte en phrases, sans liens ni phrases de décor"""
+    if not text:
+        return []
+    text = _WHITESPACE.sub(" ", _LINKS.sub(r"\1", text)).strip()
+    return [
+        sentence for sentence in _SENTENCES.split(text)
+        if len(sentence) > 2 and not _BOILERPLATE.search(sentence)
+    ]
+
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    """Ensemble des n-grammes de mots d'un texte (pour la similarité de Jaccard)"""
+    words = _WORDS.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Tronque à une fin de phrase, sinon à une fin de mot"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > max_chars // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+def _source(url: Optional[str]) -> str:
+    """Nom de domaine d'une URL (sans www.)"""
+    if not url:
+        return ""
+    return urlparse(url).netloc.removeprefix("www.")
+
+
+def compact_search_results(
+    results: List[Dict[str, Any]],
+    max_tokens: int,
+    duplicate_threshold: float = 0.6,
+) -> str:
+    """
+    Compacte des résultats de recherche en texte court pour l'agent
+
+    Args:
+        results: Résultats (title, url, snippet, summary) dans l'ordre de pertinence
+        max_tokens: Budget de tokens de la sortie
+        duplicate_threshold: Similarité de Jaccard au-delà de laquelle un résultat est écarté
+
+    Returns:
+        str: Une ligne par résultat retenu ("- titre (domaine): texte")
+    """
+    seen_sentences: Set[str] = set()
+    kept_shingles: List[Set[tuple]] = []
+    entries = []
+    for item in results:
+        sentences = []
+        # Le résumé de page contient généralement l'extrait : l'extrait ne sert que s'il manque
+        for sentence in _clean_sentences(item.get("summary")) or _clean_sentences(item.get("snippet")):
+            key = " ".join(_WORDS.findall(sentence.lower()))
+            if key and key not in seen_sentences:
+                seen_sentences.add(key)
+                sentences.append(sentence)
+        text = " ".join(sentences)
+        if not text:
+            continue
+
+        shingles = _shingles(text)
+        if any(len(shingles & other) / max(1, len(shingles | other)) >= duplicate_threshold for other in kept_shingles):
+            continue
+        kept_shingles.append(shingles)
+
+        source = _source(item.get("url"))
+        header = f"- {item.get('title') or source or 'Untitled'}" + (f" ({source})" if source else "")
+        entries.append((header, text))
+
+    if not entries:
+        return "No relevant results."
+
+    # Budget réparti entre les résultats ; la part inutilisée des textes courts profite aux suivants
+    remaining = max_tokens * CHARS_PER_TOKEN
+    lines = []
+    for index, (header, text) in enumerate(entries):
+        share = remaining // (len(entries) - index) - len(header) - 2
+        if share < 40:
+            break
+        line = f"{header}: {_truncate(text, share)}"
+        remaining -= len(line) + 1
+        lines.append(line)
+    return "\n".join(lines)
@@ -4,6 +4,7 @@ Utilitaires pour la gestion des sessions
 import uuid
 import logging
 from fastapi import Request, HTTPException
+from app.utils.telemetry import get_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,7 @@ def get_or_create_session_id(request: Request) -> str:
     else:
         logger.info(f"🆔 EXISTING SESSION FOUND: {session_id}")
         logger.debug(f"🔧 Current session data: {dict(request.session)}")
+    _attach_session(session_id)
     return session_id
 
 def get_session_id(request: Request) -> str:
@@ -50,4 +52,11 @@ def get_session_id(request: Request) -> str:
         raise HTTPException(status_code=400, detail="No active session found")
     
     logger.info(f"🆔 SESSION FOUND: {session_id}")
+    _attach_session(session_id)
     return session_id
+
+def _attach_session(session_id: str) -> None:
+    """Associe la session au contexte de mesure de la requête courante"""
+    context = get_request_context()
+    if context is not None:
+        context.session_id = session_id
@@ -0,0 +1,318 @@
+"""
+Mesure des étapes d'une requête (Server-Timing) et traces OpenTelemetry
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from opentelemetry import trace
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("movie-recs")
+
+
+@dataclass
+class RequestContext:
+    """Données de mesure collectées pendant le traitement d'une requête"""
+    route: str
+    session_id: Optional[str] = None
+    # Réponse diffusée (StreamingResponse) : ses étapes s'exécutent après l'envoi des en-têtes
+    streaming: bool = False
+    # Structure: {stage: [durée totale en secondes, nombre d'occurrences]}
+    stages: Dict[str, list] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def record(self, name: str, duration: float, count: int = 1) -> None:
+        """
+        Ajoute une mesure à une étape
+
+        Args:
+            name: Nom de l'étape
+            duration: Durée en secondes
+            count: Nombre d'occurrences à ajouter
+        """
+        with self._lock:
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += duration
+            totals[1] += count
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Retourne les mesures en millisecondes
+
+        Returns:
+            dict: {stage: {"ms": durée, "count": occurrences}} plus le total
+        """
+        with self._lock:
+            timings = {
+                name: {"ms": round(duration * 1000, 1), "count": count}
+                for name, (duration, count) in self.stages.items()
+            }
+        timings["total"] = {"ms": round((time.perf_counter() - self.started_at) * 1000, 1), "count": 1}
+        return timings
+
+    def server_timing_header(self) -> str:
+        """
+        Formate les mesures pour l'en-tête HTTP Server-Timing
+
+        Returns:
+            str: Valeur de l'en-tête, ex. 'agent_run;dur=1200.0;desc="1x"'
+        """
+        return ", ".join(
+            f'{name};dur={values["ms"]};desc="{values["count"]}x"'
+            for name, values in self.as_dict().items()
+        )
+
+
+_request_context: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "request_context", default=None
+)
+
+
+def start_request(route: str) -> tuple[RequestContext, contextvars.Token]:
+    """
+    Démarre la mesure d'une requête
+
+    Args:
+        route: Chemin de la requête (remplacé par le modèle de la route par TimedRoute)
+
+    Returns:
+        tuple: Le contexte créé et le jeton pour end_request
+    """
+    context = RequestContext(route=route)
+    return context, _request_context.set(context)
+
+
+def end_request(token: contextvars.Token) -> None:
+    """Termine la mesure d'une requête"""
+    _request_context.reset(token)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Retourne le contexte de la requête courante, None hors requête"""
+    return _request_context.get()
+
+
+def record_stage(name: str, duration: float, count: int = 1) -> None:
+    """
+    Ajoute une mesure à la requête courante (sans effet hors requête)
+
+    Args:
+        name: Nom de l'étape
+        duration: Durée en secondes
+        count: Nombre d'occurrences
+    """
+    context = _request_context.get()
+    if context is not None:
+        context.record(name, duration, count)
+
+
+@contextmanager
+def stage(name: str, span_name: Optional[str] = None, **attributes: Any) -> Iterator[trace.Span]:
+    """
+    Mesure une étape de la requête courante et ouvre le span correspondant
+
+    Args:
+        name: Nom de l'étape (Server-Timing)
+        span_name: Nom du span OpenTelemetry (défaut : name)
+        **attributes: Attributs du span
+
+    Yields:
+        Le span courant, pour ajouter des attributs (tokens, cache...)
+    """
+    start = time.perf_counter()
+    with tracer.start_as_current_span(span_name or name, attributes=attributes) as span:
+        try:
+            yield span
+        finally:
+            record_stage(name, time.perf_counter() - start)
+
+
+def submit_with_context(executor, fn: Callable, *args: Any):
+    """
+    Soumet une tâche à un pool de threads en propageant le contexte courant
+
+    Les ThreadPoolExecutor ne copient pas les contextvars : sans cela, les
+    mesures et les spans des tâches seraient perdus.
+
+    Args:
+        executor: Pool de threads
+        fn: Fonction à exécuter
+        *args: Arguments de la fonction
+
+    Returns:
+        Future: Résultat de la tâche
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Enveloppe un endpoint (sync ou async) pour mesurer sa durée propre"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                record_stage("endpoint", time.perf_counter() - start)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            record_stage("endpoint", time.perf_counter() - start)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route FastAPI qui mesure la sérialisation et peut ajouter debug_timings
+
+    La durée de sérialisation est le temps de traitement de la route moins
+    celui de l'endpoint (validation de la requête + sérialisation de la réponse).
+    Avec ?debug_timings=true, les mesures sont ajoutées aux réponses JSON objet.
+    Les réponses diffusées sont marquées : leurs étapes (agents, TMDB) s'exécutent
+    pendant l'envoi du corps, après les en-têtes, donc sans Server-Timing.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            start = time.perf_counter()
+            context = get_request_context()
+            if context is not None:
+                # Modèle de la route ("/profile/{profile_id}") plutôt que le chemin brut, avant l'endpoint :
+                # l'usage LLM est agrégé par route
+                context.route = self.path
+            response = await handler(request)
+
+            if context is None:
+                return response
+            context.streaming = isinstance(response, StreamingResponse)
+
+            endpoint_duration = context.stages.get("endpoint", [0.0])[0]
+            context.record("serialization", max(0.0, time.perf_counter() - start - endpoint_duration))
+
+            if request.query_params.get("debug_timings", "").lower() in ("1", "true") and isinstance(response, JSONResponse):
+                content = json.loads(response.body)
+                if isinstance(content, dict):
+                    content["debug_timings"] = context.as_dict()
+                    headers = {key: value for key, value in response.headers.items() if key.lower() != "content-length"}
+                    response = JSONResponse(content, status_code=response.status_code, headers=headers)
+
+            return response
+
+        return timed_handler
+
+
+def configure_tracing() -> None:
+    """
+    Configure l'export des traces selon settings.OTEL_EXPORTER
+
+    - "" : pas d'export (les spans restent des no-ops)
+    - "console" : arbre des spans de chaque requête sur la sortie standard
+    - "file" : spans en JSON (une ligne par span) dans settings.OTEL_FILE_PATH
+
+    Les runs d'agent, les tours de modèle (avec les tokens) et les appels
+    d'outils sont instrumentés par pydantic-ai.
+    """
+    exporter_kind = settings.OTEL_EXPORTER
+    if not exporter_kind:
+        return
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+    except ImportError:
+        logger.warning("⚠️ opentelemetry-sdk is not installed, tracing export disabled")
+        return
+
+    from pydantic_ai import Agent
+    from pydantic_ai.models.instrumented import InstrumentationSettings
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "movie-recs-api"}))
+
+    if exporter_kind == "console":
+        provider.add_span_processor(SimpleSpanProcessor(_TreeSpanExporter(sys.stdout)))
+    elif exporter_kind == "file":
+        output = open(settings.OTEL_FILE_PATH, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=output, formatter=lambda span: span.to_json(indent=None) + "\n")
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+    else:
+        logger.warning(f"⚠️ Unknown OTEL_EXPORTER '{exporter_kind}', tracing export disabled")
+        return
+
+    trace.set_tracer_provider(provider)
+    Agent.instrument_all(InstrumentationSettings(tracer_provider=provider, include_content=False))
+    logger.info(f"🔭 OpenTelemetry tracing enabled ({exporter_kind})")
+
+
+try:
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class _TreeSpanExporter(SpanExporter):
+        """Affiche chaque trace terminée sous forme d'arbre indenté avec les durées"""
+
+        _ATTRIBUTES = ("gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens", "tmdb.cache_hit", "gen_ai.tool.name")
+
+        def __init__(self, out):
+            self.out = out
+            self.pending: Dict[int, list] = {}
+
+        def export(self, spans) -> SpanExportResult:
+            for span in spans:
+                trace_spans = self.pending.setdefault(span.context.trace_id, [])
+                trace_spans.append(span)
+                if span.parent is None:
+                    self.out.write(self._format(self.pending.pop(span.context.trace_id)))
+                    self.out.flush()
+            return SpanExportResult.SUCCESS
+
+        def _format(self, spans) -> str:
+            children: Dict[Optional[int], list] = {}
+            for span in spans:
+                parent_id = span.parent.span_id if span.parent else None
+                children.setdefault(parent_id, []).append(span)
+
+            root = next(span for span in spans if span.parent is None)
+            lines = []
+
+            def walk(span, depth):
+                duration_ms = (span.end_time - span.start_time) / 1e6
+                offset_ms = (span.start_time - root.start_time) / 1e6
+                extras = " ".join(
+                    f"{key.split('.')[-1]}={span.attributes[key]}"
+                    for key in self._ATTRIBUTES if key in span.attributes
+                )
+                lines.append(f"{'  ' * depth}{span.name:<{50 - 2 * depth}} +{offset_ms:8.1f}ms {duration_ms:9.1f}ms {extras}".rstrip())
+                for child in sorted(children.get(span.context.span_id, []), key=lambda s: s.start_time):
+                    walk(child, depth + 1)
+
+            walk(root, 0)
+            return "🔭 " + "\n   ".join(lines) + "\n"
+
+except ImportError:
+    _TreeSpanExporter = None
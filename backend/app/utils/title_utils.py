@@ -0,0 +1,95 @@
+"""
+Utilitaires de normalisation des titres de films
+"""
+import re
+import unicodedata
+
+# Articles ignorés en début de titre ("The Matrix" == "Matrix")
+_LEADING_ARTICLES = ("the ", "a ", "an ", "le ", "la ", "les ", "l'", "un ", "une ")
+
+_YEAR_SUFFIX = re.compile(r"\s*[\(\[]\s*(18|19|20)\d{2}\s*[\)\]]\s*$")
+_NON_ALNUM = re.compile(r"[^a-z0-9' ]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def canonicalize_title(title: str) -> str:
+    """
+    Normalise un titre de film pour les comparaisons (doublons, déjà vus)
+
+    Met en minuscules, supprime les accents, la ponctuation, l'année
+    éventuelle en suffixe ("Heat (1995)") et l'article initial.
+
+    Args:
+        title: Titre brut (saisi par l'utilisateur ou produit par l'agent)
+
+    Returns:
+        str: Forme canonique du titre, chaîne vide si le titre est vide
+    """
+    if not title:
+        return ""
+
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = text.replace("’", "'").replace("&", " and ")
+
+    stripped = _YEAR_SUFFIX.sub("", text)
+    if stripped.strip():
+        text = stripped
+
+    text = _WHITESPACE.sub(" ", _NON_ALNUM.sub(" ", text)).strip()
+
+    for article in _LEADING_ARTICLES:
+        if text.startswith(article) and len(text) > len(article):
+            text = text[len(article):].lstrip()
+            break
+
+    return text
+
+
+def canonical_title_set(titles) -> tuple:
+    """
+    Forme canonique d'une liste de titres, indépendante de l'ordre et des doublons
+
+    Args:
+        titles: Titres bruts
+
+    Returns:
+        tuple: Titres canoniques distincts et triés (titres vides ignorés)
+    """
+    return tuple(sorted({canonicalize_title(title) for title in titles} - {""}))
+
+
+def dedupe_titles(titles) -> list:
+    """
+    Supprime les doublons d'une liste de titres ("Inception", "inception (2010)")
+
+    Args:
+        titles: Titres bruts
+
+    Returns:
+        list: Premier titre de chaque forme canonique, sans espaces superflus, dans l'ordre d'origine
+    """
+    seen, kept = set(), []
+    for title in titles:
+        key = canonicalize_title(title)
+        if key and key not in seen:
+            seen.add(key)
+            kept.append(_WHITESPACE.sub(" ", title).strip())
+    return kept
+
+
+def normalize_query(query) -> str:
+    """
+    Normalise une requête libre pour les clés de cache (casse, accents, ponctuation, espaces)
+
+    Args:
+        query: Requête de l'utilisateur, éventuellement None
+
+    Returns:
+        str: Requête normalisée, chaîne vide si absente
+    """
+    if not query:
+        return ""
+    text = unicodedata.normalize("NFKD", query)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return _WHITESPACE.sub(" ", _NON_ALNUM.sub(" ", text)).strip()
@@ -0,0 +1,57 @@
+"""
+Budget d'appels d'outils et de temps par run d'agent
+"""
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Optional
+
+from app.config.settings import settings
+
+BUDGET_EXHAUSTED_MESSAGE = (
+    "Search budget exhausted for this request: do not call tools again, "
+    "answer now with the information you already have."
+)
+
+
+@dataclass
+class ToolBudget:
+    """
+    Budget d'un run, passé à l'agent comme deps
+
+    Les outils d'un même tour s'exécutent en parallèle : les réservations
+    sont protégées par un verrou.
+    """
+    max_calls: int
+    max_seconds: float
+    started: float = field(default_factory=time.monotonic)
+    calls: int = 0
+    refused: int = 0
+    lock: Lock = field(default_factory=Lock, repr=False)
+
+    @classmethod
+    def from_settings(cls) -> "ToolBudget":
+        """Budget par défaut (AGENT_TOOL_CALL_BUDGET appels, AGENT_TOOL_TIME_BUDGET secondes)"""
+        return cls(max_calls=settings.AGENT_TOOL_CALL_BUDGET, max_seconds=settings.AGENT_TOOL_TIME_BUDGET)
+
+    def remaining_seconds(self) -> float:
+        """Temps restant avant épuisement du budget"""
+        return self.max_seconds - (time.monotonic() - self.started)
+
+    def exhausted(self) -> bool:
+        """Indique si plus aucun appel n'est permis"""
+        return self.calls >= self.max_calls or self.remaining_seconds() <= 0
+
+    def reserve(self) -> Optional[str]:
+        """
+        Réserve un appel d'outil
+
+        Returns:
+            None si l'appel est permis, sinon le message à renvoyer à l'agent
+        """
+        with self.lock:
+            if self.exhausted():
+                self.refused += 1
+                return BUDGET_EXHAUSTED_MESSAGE
+            self.calls += 1
+            return None
@@ -0,0 +1,83 @@
+"""
+Stub local minimal de l'API Gemini (generateContent + cachedContents)
+
+Permet de vérifier le cache de contexte sans clé ni réseau : les requêtes
+sont affichées (avec/sans cachedContent, instructions système, outils) et
+l'outil de sortie structurée reçoit une réponse factice.
+
+Depuis backend/ :
+    python -m benchmarks.gemini_stub --port 8089
+    CONTEXT_CACHE_ENABLED=true GEMINI_BASE_URL=http://127.0.0.1:8089 uvicorn app.main:app
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+FAKE_MOVIES = [
+    {"title": title, "year": year, "why_recommended": "Stub recommendation"}
+    for title, year in [("Heat", "1995"), ("Zodiac", "2007"), ("Memento", "2000"),
+                        ("Prisoners", "2013"), ("The Prestige", "2006")]
+]
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    """Répond aux appels generateContent et cachedContents du client google-genai"""
+
+    cache_counter = 0
+
+    def _send_json(self, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if "cachedContents" in self.path:
+            if self.command == "POST":
+                GeminiStubHandler.cache_counter += 1
+            name = f"cachedContents/stub-{GeminiStubHandler.cache_counter}"
+            print(f"🗄️ {self.command} {self.path} -> {name}")
+            return self._send_json({"name": name, "model": request.get("model"), "expireTime": "2099-01-01T00:00:00Z"})
+
+        cached = request.get("cachedContent")
+        print(
+            f"💬 {self.path} cachedContent={cached} "
+            f"systemInstruction={'yes' if request.get('systemInstruction') else 'no'} "
+            f"tools={'yes' if request.get('tools') else 'no'} contents={len(request.get('contents', []))}"
+        )
+        prompt_tokens = len(json.dumps(request)) // 4
+        self._send_json({
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"functionCall": {"name": "final_result", "args": {"movies": FAKE_MOVIES}}}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": 60,
+                "cachedContentTokenCount": 1024 if cached else 0,
+            },
+        })
+
+    do_PATCH = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    server = HTTPServer(("127.0.0.1", args.port), GeminiStubHandler)
+    print(f"🧪 Gemini stub listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark : sortie complète de l'agent vs sortie minimale + détails TMDB
+
+Compare, pour un même profil, le temps de génération de l'agent et le nombre
+de tokens de sortie entre AgentMovies (tous les champs générés par le LLM)
+et LeanAgentMovies (titre, année, explication ; le reste vient de TMDB).
+
+Nécessite les clés API réelles (.env). Depuis backend/ :
+    python -m benchmarks.lean_output_benchmark --runs 3
+"""
+import argparse
+import statistics
+import time
+
+from app.core.recommender import MovieRecommender
+from app.models.movie import AgentMovies, LeanAgentMovies
+from app.models.profile import Profile
+
+SAMPLE_PROFILE = Profile(
+    favorite_genres=["Thriller", "Science-Fiction", "Crime"],
+    favorite_directors=["Christopher Nolan", "David Fincher"],
+    favorite_actors=["Leonardo DiCaprio", "Brad Pitt"],
+    preferred_decades=["1990s", "2000s", "2010s"],
+    movies_watched=["Inception", "Fight Club", "Shutter Island", "Se7en"],
+    movie_preferences="Mind-bending plots, unreliable narrators and dark atmospheres.",
+    personality_traits="Analytical, curious, enjoys puzzles and ambiguity.",
+    cinematic_taste_description="Drawn to cerebral thrillers that reward repeat viewings.",
+    recommended_genres_to_explore=["Neo-noir", "Psychological drama"],
+    viewing_mood_preferences=["Focused evening viewing"],
+)
+
+
+def run_mode(recommender: MovieRecommender, output_type, runs: int) -> dict:
+    """Exécute l'agent `runs` fois avec le type de sortie donné et mesure les étapes"""
+    agent_times, enrich_times, output_tokens = [], [], []
+    query = (
+        f"Profile: genres {', '.join(SAMPLE_PROFILE.favorite_genres)}; "
+        f"directors {', '.join(SAMPLE_PROFILE.favorite_directors)}; "
+        f"watched {', '.join(SAMPLE_PROFILE.movies_watched)}. "
+        f"{SAMPLE_PROFILE.cinematic_taste_description}\n\nRecommend movies for this user."
+    )
+
+    for _ in range(runs):
+        agent = recommender.ai_service.create_recommendation_agent(output_type)
+
+        start = time.perf_counter()
+        result = agent.run_sync(query)
+        agent_times.append(time.perf_counter() - start)
+        output_tokens.append(result.usage().output_tokens)
+
+        start = time.perf_counter()
+        recommender._convert_agent_movies_to_movies(result.output)
+        enrich_times.append(time.perf_counter() - start)
+
+    return {
+        "agent_s": statistics.median(agent_times),
+        "enrich_s": statistics.median(enrich_times),
+        "output_tokens": statistics.median(output_tokens),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Nombre d'exécutions par mode")
+    args = parser.parse_args()
+
+    recommender = MovieRecommender()
+    full = run_mode(recommender, AgentMovies, args.runs)
+    # Vider les caches TMDB pour ne pas avantager le second mode
+    recommender.tmdb_service.search_cache.clear()
+    recommender.tmdb_service.details_cache.clear()
+    recommender.tmdb_service.id_index.clear()
+    lean = run_mode(recommender, LeanAgentMovies, args.runs)
+
+    print(f"{'mode':<8}{'agent (s)':>12}{'TMDB (s)':>12}{'total (s)':>12}{'out tokens':>12}")
+    for name, stats in (("full", full), ("lean", lean)):
+        total = stats["agent_s"] + stats["enrich_s"]
+        print(f"{name:<8}{stats['agent_s']:>12.2f}{stats['enrich_s']:>12.2f}{total:>12.2f}{stats['output_tokens']:>12.0f}")
+
+    saved = full["agent_s"] - lean["agent_s"]
+    print(f"\nLLM latency saved: {saved:.2f}s ({saved / full['agent_s']:.0%}), "
+          f"output tokens saved: {full['output_tokens'] - lean['output_tokens']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
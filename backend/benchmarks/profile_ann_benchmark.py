@@ -0,0 +1,152 @@
+"""
+Benchmark : réutilisation des recommandations entre profils similaires
+
+Génère des profils synthétiques à partir d'archétypes (genres, réalisateurs,
+films vus tirés au hasard dans le vivier de l'archétype), indexe une partie
+d'entre eux avec les recommandations de leur archétype, puis interroge l'index
+avec les autres. Pour chaque configuration LSH (tables x bits) et chaque seuil :
+
+- latence de recherche (LSH vs recherche exacte)
+- rappel : part des requêtes où le LSH trouve le même voisin que la recherche exacte
+- taux servi : part des requêtes au-dessus du seuil
+- précision : part des films servis appartenant à l'archétype de la requête
+
+Aucune clé API nécessaire. Depuis backend/ :
+    python -m benchmarks.profile_ann_benchmark --indexed 3000 --queries 300
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.core.profile_index import ProfileANNIndex, vectorize_profile
+from app.models.movie import Movie
+from app.models.profile import Profile
+
+GENRES = ["Thriller", "Science-Fiction", "Crime", "Drama", "Comedy", "Horror", "Romance",
+          "Animation", "Western", "War", "Documentary", "Fantasy", "Musical", "Mystery"]
+DECADES = ["1960s", "1970s", "1980s", "1990s", "2000s", "2010s", "2020s"]
+MOODS = ["Focused evening viewing", "Relaxed weekend", "With friends", "Late night", "Family time"]
+WORDS = ["dark", "twisty", "emotional", "funny", "slow", "visual", "epic", "intimate",
+         "cerebral", "nostalgic", "violent", "poetic", "realistic", "surreal"]
+
+
+def make_archetypes(count: int, rng: random.Random, family_size: int = 4) -> list[dict]:
+    """
+    Crée des archétypes de goûts avec leurs viviers de films et de recommandations
+
+    Les archétypes d'une même famille partagent genres, une partie des
+    réalisateurs et des films vus : ce sont les voisins proches mais distincts
+    qui font baisser la précision quand le seuil est trop bas.
+    """
+    archetypes = []
+    for i in range(count):
+        family = i // family_size
+        family_rng = random.Random(family)
+        archetypes.append({
+            "genres": family_rng.sample(GENRES, 3) + rng.sample(GENRES, 1),
+            "directors": [f"Director {i}-{j}" for j in range(2)] + [f"Director family {family}-{j}" for j in range(2)],
+            "actors": [f"Actor {i}-{j}" for j in range(4)] + [f"Actor family {family}-{j}" for j in range(3)],
+            "decades": family_rng.sample(DECADES, 2) + rng.sample(DECADES, 1),
+            "watched": [f"Movie {i}-{j}" for j in range(5)] + [f"Movie family {family}-{j}" for j in range(5)],
+            "recommended": [f"Pick {i}-{j}" for j in range(12)],
+            "words": family_rng.sample(WORDS, 3) + rng.sample(WORDS, 2),
+        })
+    return archetypes
+
+
+def make_profile(archetype: dict, rng: random.Random) -> Profile:
+    """Tire un profil bruité autour d'un archétype"""
+    return Profile(
+        favorite_genres=rng.sample(archetype["genres"], rng.randint(3, 4)),
+        favorite_directors=rng.sample(archetype["directors"], rng.randint(2, 4)),
+        favorite_actors=rng.sample(archetype["actors"], rng.randint(3, 5)),
+        preferred_decades=rng.sample(archetype["decades"], rng.randint(2, 3)),
+        movies_watched=rng.sample(archetype["watched"], rng.randint(6, 9)),
+        movie_preferences=" ".join(rng.sample(archetype["words"], 4)),
+        personality_traits=" ".join(rng.sample(WORDS, 2)),
+        cinematic_taste_description=" ".join(rng.sample(archetype["words"], 4)),
+        recommended_genres_to_explore=rng.sample(GENRES, 1),
+        viewing_mood_preferences=rng.sample(MOODS, 1),
+    )
+
+
+def run(indexed: int, queries: int, archetype_count: int, thresholds: list[float], configs: list[tuple[int, int]]) -> None:
+    rng = random.Random(7)
+    archetypes = make_archetypes(archetype_count, rng)
+
+    def sample(n):
+        labels = [rng.randrange(archetype_count) for _ in range(n)]
+        vectors = np.stack([vectorize_profile(make_profile(archetypes[label], rng)) for label in labels])
+        return labels, vectors
+
+    start = time.perf_counter()
+    index_labels, index_vectors = sample(indexed)
+    query_labels, query_vectors = sample(queries)
+    print(f"Vectorisation : {(time.perf_counter() - start) * 1000 / (indexed + queries):.3f} ms/profil")
+
+    rec_sets = [
+        [Movie(title=title, why_recommended="") for title in rng.sample(archetypes[label]["recommended"], 6)]
+        for label in index_labels
+    ]
+
+    # Recherche exacte (référence)
+    exact_times, exact_best = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        similarities = index_vectors @ vector
+        exact_best.append(int(np.argmax(similarities)))
+        exact_times.append(time.perf_counter() - start)
+    print(f"Recherche exacte : {statistics.median(exact_times) * 1e6:.0f} µs médiane "
+          f"({indexed} profils indexés, {archetype_count} archétypes)\n")
+
+    print(f"{'tables':>6} {'bits':>4} {'µs/req':>8} {'rappel':>7} {'cand.':>6}  "
+          + "  ".join(f"servi@{t:.2f} préc.@{t:.2f}" for t in thresholds))
+    for tables, bits in configs:
+        index = ProfileANNIndex(dim=index_vectors.shape[1], tables=tables, bits=bits, max_entries=indexed, ttl=0)
+        for vector, movies in zip(index_vectors, rec_sets):
+            index.add(vector, movies)
+
+        times, found, candidates = [], [], []
+        for vector, best in zip(query_vectors, exact_best):
+            start = time.perf_counter()
+            neighbour = index.query(vector)
+            times.append(time.perf_counter() - start)
+            found.append(neighbour)
+            signatures = index._signatures(vector)
+            candidates.append(len(set().union(*(index.buckets[t].get(int(s), set()) for t, s in enumerate(signatures)))))
+
+        recall = sum(
+            1 for neighbour, best in zip(found, exact_best)
+            if neighbour is not None and neighbour.movies is rec_sets[best]
+        ) / queries
+
+        columns = []
+        for threshold in thresholds:
+            served = [(n, label) for n, label in zip(found, query_labels) if n is not None and n.similarity >= threshold]
+            pools = [set(archetypes[label]["recommended"]) for _, label in served]
+            precision = statistics.mean(
+                sum(movie.title in pool for movie in n.movies) / len(n.movies) for (n, _), pool in zip(served, pools)
+            ) if served else 0.0
+            columns.append(f"{len(served) / queries:>11.1%} {precision:>11.1%}")
+
+        print(f"{tables:>6} {bits:>4} {statistics.median(times) * 1e6:>8.0f} {recall:>7.1%} "
+              f"{statistics.mean(candidates):>6.0f}  " + "  ".join(columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark qualité/latence de l'index de profils similaires")
+    parser.add_argument("--indexed", type=int, default=3000, help="Nombre de profils indexés")
+    parser.add_argument("--queries", type=int, default=300, help="Nombre de requêtes")
+    parser.add_argument("--archetypes", type=int, default=2000, help="Nombre d'archétypes de goûts")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8])
+    args = parser.parse_args()
+
+    configs = [(4, 8), (8, 8), (8, 10), (16, 10), (8, 12), (16, 12)]
+    run(args.indexed, args.queries, args.archetypes, args.thresholds, configs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark : mémoire du stockage des profils (pydantic vs représentation compacte)
+
+Stocke N profils synthétiques réalistes (listes tirées de vocabulaires de
+taille réaliste, textes de plusieurs phrases comme ceux générés par l'agent)
+sous forme d'objets Profile, puis encodés avec ProfileCodec, et mesure avec
+tracemalloc la mémoire retenue par profil dans chaque cas, ainsi que le temps
+d'encodage et de décodage.
+
+Aucune clé API nécessaire. Depuis backend/ :
+    python -m benchmarks.profile_storage_benchmark --profiles 100000
+"""
+import argparse
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.models.profile import Profile
+from app.utils.compact_profile import ProfileCodec
+
+GENRES = ["Thriller", "Science-Fiction", "Crime", "Drama", "Comedy", "Horror", "Romance", "Animation",
+          "Western", "War", "Documentary", "Fantasy", "Musical", "Mystery", "Neo-noir", "Film noir",
+          "Psychological drama", "Coming-of-age", "Satire", "Heist", "Space opera", "Slasher"]
+DECADES = ["1950s", "1960s", "1970s", "1980s", "1990s", "2000s", "2010s", "2020s"]
+MOODS = ["Focused evening viewing", "Relaxed weekend afternoons", "Movie nights with friends",
+         "Late-night solo sessions", "Family time", "Rainy Sunday comfort viewing", "Date night"]
+ADJECTIVES = ["dark", "twisty", "emotional", "witty", "slow-burning", "visually striking", "epic", "intimate",
+              "cerebral", "nostalgic", "gritty", "poetic", "grounded", "surreal", "atmospheric", "character-driven"]
+THEMES = ["moral ambiguity", "identity", "memory and loss", "power and corruption", "family ties",
+          "isolation", "obsession", "redemption", "the passage of time", "class conflict", "friendship"]
+TRAITS = ["analytical", "curious", "empathetic", "adventurous", "reflective", "detail-oriented",
+          "romantic", "skeptical", "playful", "introspective", "open-minded", "nostalgic"]
+
+
+def make_text(rng: random.Random, sentences: int) -> str:
+    """Texte de quelques phrases dans le style des descriptions de l'agent"""
+    templates = [
+        "You are drawn to {a} and {b} stories that explore {t}.",
+        "You appreciate films where {t} and {u} drive the narrative.",
+        "Your choices suggest a preference for {a} pacing and {b} atmospheres.",
+        "You value strong performances and {a} direction over spectacle.",
+        "Stories about {t} resonate with you, especially when they are {a}.",
+        "You enjoy being challenged by {b} plots that reward repeat viewings.",
+    ]
+    return " ".join(
+        rng.choice(templates).format(a=rng.choice(ADJECTIVES), b=rng.choice(ADJECTIVES),
+                                     t=rng.choice(THEMES), u=rng.choice(THEMES))
+        for _ in range(sentences)
+    )
+
+
+def make_profile(rng: random.Random) -> Profile:
+    """Profil synthétique (réalisateurs, acteurs et films tirés de vocabulaires à longue traîne)"""
+    def names(prefix: str, size: int, count: int) -> list[str]:
+        # Distribution de popularité asymétrique : quelques noms très fréquents
+        return [f"{prefix} {int(rng.paretovariate(1.2)) % size}" for _ in range(count)]
+
+    movies_watched = names("Movie title", 50000, rng.randint(5, 15))
+    return Profile(
+        favorite_genres=rng.sample(GENRES, rng.randint(3, 5)),
+        favorite_directors=names("Director", 3000, rng.randint(2, 5)),
+        favorite_actors=names("Actor", 20000, rng.randint(3, 6)),
+        preferred_decades=rng.sample(DECADES, rng.randint(2, 3)),
+        movies_watched=movies_watched,
+        movie_preferences=make_text(rng, 3),
+        personality_traits=f"{', '.join(rng.sample(TRAITS, 3)).capitalize()}. " + make_text(rng, 1),
+        cinematic_taste_description=make_text(rng, 4),
+        recommended_genres_to_explore=rng.sample(GENRES, 2),
+        viewing_mood_preferences=rng.sample(MOODS, 2),
+        # Alignés sur movies_watched, 0 pour les séries et titres sans identifiant
+        watched_tmdb_ids=[rng.randrange(1, 1_200_000) if rng.random() < 0.8 else 0 for _ in movies_watched],
+    )
+
+
+def measure(count: int, store) -> tuple[float, list]:
+    """Mémoire retenue (octets par profil) en stockant `count` profils avec `store`"""
+    rng = random.Random(42)
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    stored = [store(make_profile(rng)) for _ in range(count)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return retained / count, stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=100_000)
+    parser.add_argument("--level", type=int, default=3, help="Niveau de compression zstd")
+    parser.add_argument("--dict-samples", type=int, default=1000, help="Profils pour entraîner le dictionnaire (0 : aucun)")
+    args = parser.parse_args()
+
+    before, profiles = measure(args.profiles, lambda profile: profile)
+    del profiles
+    print(f"Profile pydantic     : {before:8.0f} octets/profil ({before * args.profiles / 2**20:.0f} Mo pour {args.profiles})")
+
+    codec = ProfileCodec(level=args.level, dict_samples=args.dict_samples)
+    after, compact = measure(args.profiles, codec.encode)
+    encoded = statistics.mean(item.nbytes() for item in compact)
+    print(f"Représentation compacte : {after:5.0f} octets/profil ({after * args.profiles / 2**20:.0f} Mo, "
+          f"dont {encoded:.0f} octets de données encodées) -> x{before / after:.1f}")
+    print(f"Codec : {codec.get_stats()}")
+
+    # Coûts d'encodage/décodage, hors génération des profils
+    rng = random.Random(1)
+    samples = [make_profile(rng) for _ in range(2000)]
+    start = time.perf_counter()
+    encoded_samples = [codec.encode(profile) for profile in samples]
+    encode_time = (time.perf_counter() - start) / len(samples)
+    start = time.perf_counter()
+    decoded = [codec.decode(item) for item in encoded_samples]
+    decode_time = (time.perf_counter() - start) / len(samples)
+    assert [profile.model_dump() for profile in decoded] == [profile.model_dump() for profile in samples]
+    print(f"Encodage : {encode_time * 1e6:.0f} µs/profil, décodage : {decode_time * 1e6:.0f} µs/profil (aller-retour vérifié)")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,21 +22,88 @@ function App() {
   const recommendationsRef = useRef(null);
   const profileRef = useRef(null);
 
-  // Effect to detect changes in the favorites list
-  // and reset the profile to make the "Create my profile" button reappear
-  useEffect(() => {
-    // If a profile exists and the favorites list changes, reset the profile
-    if (userProfile) {
-      setUserProfile(null);
-      setRecommendations([]); // Also clear previous recommendations
+  // Favorites changes not sent yet, whether an update call is running, and the ETag of
+  // the profile as last returned by the backend (sent as If-Match)
+  const pendingDelta = useRef({ added: new Map(), removed: new Map() });
+  const flushTimer = useRef(null);
+  const updateInFlight = useRef(false);
+  const profileEtag = useRef(null);
+
+  const toFavorite = (movie) => ({
+    title: movie.title || movie.name,
+    tmdb_id: movie.media_type === 'movie' ? movie.id : null
+  });
+
+  const hasPendingDelta = () => pendingDelta.current.added.size > 0 || pendingDelta.current.removed.size > 0;
+
+  const postFavoritesDelta = (delta) => axios.post(config.getApiUrl(`profile/${profileId}/favorites`), delta, {
+    headers: profileEtag.current ? { 'If-Match': profileEtag.current } : {}
+  });
+
+  // Send the accumulated changes in one call, one call at a time
+  // (only the added/removed movies are analyzed by the backend)
+  const flushFavoritesUpdate = async () => {
+    if (updateInFlight.current || !hasPendingDelta()) return;
+
+    const { added, removed } = pendingDelta.current;
+    pendingDelta.current = { added: new Map(), removed: new Map() };
+    const delta = { added: [...added.values()].map(toFavorite), removed: [...removed.values()].map(toFavorite) };
+
+    updateInFlight.current = true;
+    setProfileLoading(true);
+    try {
+      let res;
+      try {
+        res = await postFavoritesDelta(delta);
+      } catch (err) {
+        if (err.response?.status !== 412) throw err;
+        // Changed elsewhere (another tab): reload its ETag and apply the same changes on top
+        const latest = await axios.get(config.getApiUrl(`profile/${profileId}`));
+        profileEtag.current = latest.headers.etag || null;
+        res = await postFavoritesDelta(delta);
+      }
+      profileEtag.current = res.headers.etag || null;
+      setUserProfile(res.data.profile);
+      setRecommendations([]); // Previous recommendations no longer match the profile
+    } catch (err) {
+      console.error("Error updating profile:", err);
+    } finally {
+      updateInFlight.current = false;
+      setProfileLoading(false);
+      // Changes made during the call go out in the next one
+      if (hasPendingDelta()) flushFavoritesUpdate();
     }
-  }, [favorites.length]); // Triggers when the number of favorites changes
+  };
+
+  // Queue favorites changes for the existing profile: quick clicks are debounced into
+  // one update, and adding then removing the same movie cancels out
+  const updateProfileFavorites = (added, removed) => {
+    if (!profileId || !userProfile) return;
+
+    const pending = pendingDelta.current;
+    added.forEach((movie) => {
+      if (!pending.removed.delete(movie.id)) pending.added.set(movie.id, movie);
+    });
+    removed.forEach((movie) => {
+      if (!pending.added.delete(movie.id)) pending.removed.set(movie.id, movie);
+    });
+
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flushFavoritesUpdate, config.FAVORITES_UPDATE_DEBOUNCE_MS);
+  };
 
   // Effect to check if profiles exist in the session when the page loads
   useEffect(() => {
     const checkForExistingProfiles = async () => {
       try {
-        const res = await axios.get(config.getApiUrl('profile/list'));
+        let res = await axios.get(config.getApiUrl('profile/list'));
+        
+        // The list is paginated: the most recent profile is the last one of the last page
+        if (res.data.next_offset != null) {
+          res = await axios.get(config.getApiUrl('profile/list'), {
+            params: { offset: res.data.total - 1, limit: 1 }
+          });
+        }
         
         if (res.data.profiles && res.data.profiles.length > 0) {
           // Get the most recent profile (last in the list)
@@ -45,6 +112,7 @@ function App() {
           // Set the profile and profile ID
           setUserProfile(latestProfileData.profile);
           setProfileId(latestProfileData.profile_id);
+          profileEtag.current = null;
           
           console.log("Profile restored from session:", latestProfileData.profile_id);
         }
@@ -73,11 +141,14 @@ function App() {
   const addToFavorites = (movie) => {
     if (!favorites.find((f) => f.id === movie.id)) {
       setFavorites([...favorites, movie]);
+      updateProfileFavorites([movie], []);
     }
   };
 
   const removeFromFavorites = (movieId) => {
+    const removed = favorites.filter(f => f.id === movieId);
     setFavorites(favorites.filter(f => f.id !== movieId));
+    updateProfileFavorites([], removed);
   };
 
   // Utility function to check if a movie is in favorites
@@ -117,31 +188,69 @@ function App() {
 
     setProfileLoading(true);
     try {
-      const favoriteTitles = favorites.map(f => f.title || f.name);
-      const res = await axios.post(config.getApiUrl('profile/create'), {
-        favorite_movies: favoriteTitles
+      // Send TMDB ids with titles so the backend can skip title searches (TV shows keep only their title)
+      const favoriteMovies = favorites.map(f => ({
+        title: f.title || f.name,
+        tmdb_id: f.media_type === 'movie' ? f.id : null
+      }));
+      // One streamed call: the profile arrives first, then the recommendations (NDJSON lines)
+      const res = await fetch(config.getApiUrl('profile/create-and-recommend'), {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ favorite_movies: favoriteMovies })
       });
-      
-      // The backend now returns {profile_id, profile}
-      setProfileId(res.data.profile_id);
-      setUserProfile(res.data.profile);
-      
-      // Clear previous search results and search field
-      setResults([]);
-      setQuery("");
-      
-      // Automatic scroll to profile after a short delay
-      setTimeout(() => {
-        profileRef.current?.scrollIntoView({ 
-          behavior: 'smooth',
-          block: 'start'
-        });
-      }, 100);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      const movies = [];
+      let buffer = "";
+      const handleEvent = (event) => {
+        if (event.event === 'profile') {
+          setProfileId(event.profile_id);
+          setUserProfile(event.profile);
+          profileEtag.current = null;
+          setRecommendations([]);
+          setProfileLoading(false);
+          setLoading(true);
+
+          // Clear previous search results and search field
+          setResults([]);
+          setQuery("");
+
+          // Automatic scroll to profile after a short delay
+          setTimeout(() => {
+            profileRef.current?.scrollIntoView({ 
+              behavior: 'smooth',
+              block: 'start'
+            });
+          }, 100);
+        } else if (event.event === 'movie') {
+          movies.push(event.movie);
+          setRecommendations([...movies]);
+        } else if (event.event === 'error') {
+          if (event.step !== 'recommendations') throw new Error(event.error);
+          // The profile was saved and is shown: only the recommendations failed
+          console.error("Error generating recommendations:", event.error);
+          alert("Profile created, but generating recommendations failed. Please try again.");
+          setLoading(false);
+        }
+      };
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+      }
     } catch (err) {
       console.error("Error creating profile:", err);
       alert("Error creating profile");
     } finally {
       setProfileLoading(false);
+      setLoading(false);
     }
   };
 
@@ -155,6 +264,7 @@ function App() {
     try {
       const res = await axios.post(config.getApiUrl('recommendations/from-profile'), {
         profile: userProfile,
+        profile_id: profileId,
         custom_query: null
       });
       
@@ -200,9 +310,12 @@ function App() {
 
     setSaveLoading(true);
     try {
-      const res = await axios.put(config.getApiUrl(`profile/${profileId}`), editedProfile);
+      const res = await axios.put(config.getApiUrl(`profile/${profileId}`), editedProfile, {
+        headers: profileEtag.current ? { 'If-Match': profileEtag.current } : {}
+      });
       
       if (res.data.success) {
+        profileEtag.current = res.headers.etag || null;
         setUserProfile(editedProfile);
         setIsEditing(false);
         setEditedProfile(null);
@@ -441,7 +554,28 @@ function App() {
                   💡 <strong>Tip:</strong> You can edit your profile to make it more accurate. This will be used to find movies for you.
                 </p>
               </div>
-              
+
+              {/* Movies watched - posters are resolved by the backend when the profile is created */}
+              {userProfile.movies_watched?.length > 0 && (
+                <div className="mb-6 flex gap-4 overflow-x-auto pb-2">
+                  {userProfile.movies_watched.map((title, index) => (
+                    <div key={index} className="w-24 flex-shrink-0">
+                      {userProfile.watched_posters?.[index] ? (
+                        <img
+                          src={userProfile.watched_posters[index]}
+                          alt={title}
+                          loading="lazy"
+                          className="w-24 h-36 object-cover rounded-xl"
+                        />
+                      ) : (
+                        <div className="w-24 h-36 bg-gray-700 rounded-xl flex items-center justify-center text-2xl">🎬</div>
+                      )}
+                      <p className="text-gray-300 text-xs mt-1 line-clamp-2">{title}</p>
+                    </div>
+                  ))}
+                </div>
+              )}
+
               <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
                 {/* Favorite genres */}
                 <div className="bg-gray-800 rounded-xl p-4">
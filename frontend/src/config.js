@@ -3,6 +3,9 @@ const config = {
   // API Configuration
   API_BASE_URL: import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000',
   
+  // Delay before favorites changes are sent to the profile (quick clicks become one update)
+  FAVORITES_UPDATE_DEBOUNCE_MS: 800,
+  
   // Environment
   NODE_ENV: import.meta.env.VITE_NODE_ENV || 'development',
   